@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+
+"""
+flood-guard.py - Run a command, spilling its output to a side file when it floods the pane
+Commands printing tens of thousands of lines per second overrun tmux's
+scrollback: early errors and even the completion marker scroll away before
+anyone captures the pane. The guard writes every byte of the command's
+stdout and stderr to a side file. It passes the output through to the pane
+until the rate goes over a threshold, then prints one progress line per
+interval and, at the end, a short tail.
+
+    flood-guard.py <spill_file> '<shell command>'
+
+Exits with the command's status, so the tagged marker's `$?` is unchanged.
+The command runs under `bash -c`, which sees exported variables and the
+current directory but not shell functions or aliases. A summary is written
+next to the spill file as <spill_file>.status (JSON).
+
+When the guard's own stdout is a terminal (the pane), the command's output
+goes through a pseudo-terminal sized like it, so the command still sees a
+TTY: line buffering, colours and progress bars behave as without the guard.
+Only the ESC sequences and carriage returns it prints end up in the spill.
+
+Starting a spill prunes the oldest ones (and their .status files) in the same
+directory beyond $AI_WORKFLOW_SPILL_KEEP files or $AI_WORKFLOW_SPILL_LIMIT
+bytes.
+
+Phi3Simulator.build_pane_command(..., flood_guard=True) types commands
+wrapped in the guard, and clean_tmux_output reads the spill file for them.
+"""
+
+import collections
+import fcntl
+import json
+import os
+import pty
+import signal
+import subprocess
+import sys
+import termios
+import time
+
+FLOOD_RATE = int(os.environ.get('AI_WORKFLOW_FLOOD_RATE', 2000))          # lines/s before throttling
+THROTTLE_INTERVAL = float(os.environ.get('AI_WORKFLOW_FLOOD_INTERVAL', 1.0))  # seconds between progress lines
+TAIL_LINES = 20        # lines shown in the pane when a flooded command ends
+LINE_PREVIEW = 120     # characters of the latest line in a progress line
+SPILL_KEEP = int(os.environ.get('AI_WORKFLOW_SPILL_KEEP', 20))             # spill files kept per directory
+SPILL_LIMIT = int(os.environ.get('AI_WORKFLOW_SPILL_LIMIT', 1 << 30))      # bytes kept per directory
+
+
+def last_line(data: bytes) -> str:
+    """Last complete, non-empty line of a chunk, shortened for a progress line"""
+    for line in reversed(data.splitlines()):
+        text = line.decode('utf-8', 'replace').strip()
+        if text:
+            return text[:LINE_PREVIEW]
+    return ''
+
+
+def prune_spills(spill_dir: str, keep: int = SPILL_KEEP, limit: int = SPILL_LIMIT):
+    """Delete the oldest spill files beyond `keep` files or `limit` bytes, with their .status"""
+    spills = []
+    try:
+        names = os.listdir(spill_dir)
+    except FileNotFoundError:
+        return
+    for name in names:
+        if name.endswith('.log'):
+            try:
+                stat = os.stat(os.path.join(spill_dir, name))
+            except FileNotFoundError:
+                continue
+            spills.append((stat.st_mtime, stat.st_size, name))
+    spills.sort(reverse=True)
+    total = 0
+    for count, (_, size, name) in enumerate(spills):
+        total += size
+        if count >= keep or total > limit:
+            for path in (name, name + '.status'):
+                try:
+                    os.unlink(os.path.join(spill_dir, path))
+                except FileNotFoundError:
+                    pass
+
+
+def open_pty(like_fd: int):
+    """(master, slave) pseudo-terminal with like_fd's window size and "\n" line ends"""
+    master, slave = pty.openpty()
+    attrs = termios.tcgetattr(slave)
+    attrs[1] &= ~termios.ONLCR    # keep the spill's line ends as the command wrote them
+    termios.tcsetattr(slave, termios.TCSANOW, attrs)
+    try:
+        fcntl.ioctl(slave, termios.TIOCSWINSZ, fcntl.ioctl(like_fd, termios.TIOCGWINSZ, b'\0' * 8))
+    except OSError:
+        pass
+    return master, slave
+
+
+def guard(spill_path: str, command: str, out=None, tty: bool = None) -> int:
+    """Run command, spill its output and throttle it on `out`; returns its exit status
+
+    tty=None gives the command a pseudo-terminal when `out` is the terminal.
+    """
+    if tty is None:
+        tty = out is None and sys.stdout.isatty()
+    out = out or sys.stdout.buffer
+    spill_dir = os.path.dirname(os.path.abspath(spill_path))
+    os.makedirs(spill_dir, exist_ok=True)
+    prune_spills(spill_dir, keep=max(SPILL_KEEP - 1, 0))
+    start = time.monotonic()
+    if tty:
+        fd, slave = open_pty(sys.stdout.fileno())
+        process = subprocess.Popen(['bash', '-c', command], stdout=slave, stderr=slave)
+        os.close(slave)
+    else:
+        process = subprocess.Popen(['bash', '-c', command], stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+        fd = process.stdout.fileno()
+    # Ctrl-C reaches the command through the terminal; keep draining until it exits
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    total_lines = total_bytes = 0
+    window_start, window_lines = start, 0
+    flooded = False
+    next_report = 0.0
+    tail = collections.deque(maxlen=TAIL_LINES)
+    partial = b''
+    latest = ''
+    with open(spill_path, 'wb') as spill:
+        while True:
+            try:
+                data = os.read(fd, 65536)
+            except OSError:
+                data = b''    # EIO: every writer has closed the pty
+            if not data:
+                break
+            spill.write(data)
+            lines = data.count(b'\n')
+            total_lines += lines
+            total_bytes += len(data)
+
+            now = time.monotonic()
+            if now - window_start >= 1.0:
+                window_start, window_lines = now, 0
+            window_lines += lines
+            if not flooded and window_lines > FLOOD_RATE:
+                flooded = True
+                out.write(f'\n[flood-guard] over {FLOOD_RATE} lines/s, full output in {spill_path}\n'.encode())
+                next_report = now + THROTTLE_INTERVAL
+
+            if flooded:
+                # Keep the last lines for the closing tail, without holding the output
+                chunk_lines = (partial + data).split(b'\n')
+                partial = chunk_lines.pop()
+                tail.extend(chunk_lines[-TAIL_LINES:])
+                latest = last_line(data) or latest
+                if now >= next_report:
+                    out.write(f'[flood-guard] {total_lines} lines, {total_bytes / 1048576:.1f} MB: '
+                              f'{latest}\n'.encode())
+                    out.flush()
+                    next_report = now + THROTTLE_INTERVAL
+            else:
+                out.write(data)
+                out.flush()
+
+    exit_code = process.wait()
+    if tty:
+        os.close(fd)
+    if exit_code < 0:
+        exit_code = 128 - exit_code    # killed by a signal, as the shell reports it
+    elapsed = time.monotonic() - start
+    if flooded:
+        if partial:
+            tail.append(partial)
+        out.write(f'[flood-guard] last {len(tail)} lines:\n'.encode())
+        out.write(b'\n'.join(tail) + b'\n')
+        out.write(f'[flood-guard] {total_lines} lines ({total_bytes / 1048576:.1f} MB) in {elapsed:.1f}s, '
+                  f'full output in {spill_path}\n'.encode())
+        out.flush()
+
+    with open(spill_path + '.status', 'w') as status:
+        json.dump({'exit_code': exit_code, 'lines': total_lines, 'bytes': total_bytes,
+                   'seconds': round(elapsed, 3), 'flooded': flooded}, status)
+    return exit_code
+
+
+def main():
+    if len(sys.argv) != 3 or sys.argv[1] in ('-h', '--help'):
+        print("Usage: ./flood-guard.py <spill_file> '<shell command>'")
+        print()
+        print(f"Throttles pane output above $AI_WORKFLOW_FLOOD_RATE lines/s (default {FLOOD_RATE}),")
+        print(f"printing progress every $AI_WORKFLOW_FLOOD_INTERVAL seconds (default {THROTTLE_INTERVAL}).")
+        sys.exit(2)
+    sys.exit(guard(sys.argv[1], sys.argv[2]))
+
+
+if __name__ == '__main__':
+    main()
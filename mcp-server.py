@@ -0,0 +1,489 @@
+#!/usr/bin/env python3
+
+"""
+mcp-server.py - Async MCP service exposing ai-workflow panes as tools
+Serves the MCP HTTP+SSE transport from a single asyncio event loop:
+
+    GET  /sse                       open an event stream (first event: endpoint)
+    POST /messages?session_id=<id>  send a JSON-RPC message; replies arrive on the stream
+
+Every client shares one tmux control-mode connection per workflow session
+(`tmux -C attach`), so tool calls cost a line on that connection instead of a
+tmux process. Command output is streamed to the caller as progress
+notifications while it arrives (from control-mode %output).
+
+Tools: run_in_pane, capture_pane, clean_output, recover_pane
+"""
+
+import asyncio
+import json
+import os
+import re
+import secrets
+import sys
+import time
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT_DIR)
+from workflow_common import ANSI_ESCAPE, load_phi3_module
+
+PROTOCOL_VERSION = '2024-11-05'
+PANES = ('left', 'top', 'bottom')
+QUIET_INTERVAL = 0.5    # seconds without %output before checking the pane directly
+
+
+phi3 = load_phi3_module()
+
+
+def decode_control_output(data: bytes) -> bytes:
+    """Undo control-mode escaping (\\ooo octal for control chars and backslash)"""
+    return re.sub(rb'\\([0-7]{3})', lambda match: bytes([int(match.group(1), 8)]), data)
+
+
+class TmuxControlClient:
+    """One shared `tmux -C` connection to a workflow session
+
+    Commands are answered strictly in order, so each one waits on a future
+    resolved by its %begin/%end block. %output notifications are fanned out
+    to per-pane subscriber queues.
+    """
+
+    def __init__(self, session: str, socket: Optional[str] = None):
+        self.session = session
+        self.socket = socket
+        self.process = None
+        self.reader_task = None
+        self.pending = []        # futures for commands awaiting their block
+        self.subscribers = {}    # pane id (%N) -> set of asyncio.Queue
+        self.pane_ids = {}       # target -> pane id
+        self.write_lock = asyncio.Lock()
+        self.attached = None     # resolved once tmux reports the session attached
+        self.attach_timeout = 5.0
+
+    async def start(self):
+        argv = ['tmux'] + (['-L', self.socket] if self.socket else [])
+        argv += ['-C', 'attach-session', '-t', self.session]
+        self.process = await asyncio.create_subprocess_exec(
+            *argv, stdin=asyncio.subprocess.PIPE, stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.DEVNULL)
+        self.attached = asyncio.get_running_loop().create_future()
+        self.reader_task = asyncio.ensure_future(self._read_loop())
+        # Pane output is only forwarded once the client is attached
+        await asyncio.wait_for(asyncio.shield(self.attached), self.attach_timeout)
+
+    @property
+    def connected(self) -> bool:
+        """False once the tmux -C process or its reader is gone (e.g. the server was restarted)"""
+        return (self.process is not None and self.process.returncode is None and
+                self.reader_task is not None and not self.reader_task.done())
+
+    async def close(self):
+        if self.process and self.process.returncode is None:
+            self.process.stdin.close()
+            try:
+                await asyncio.wait_for(self.process.wait(), 2)
+            except asyncio.TimeoutError:
+                # Not waited on: the tmux server holds the client's pipes,
+                # so close them on our side instead
+                self.process.kill()
+                self.process._transport.close()
+        if self.reader_task:
+            self.reader_task.cancel()
+            await asyncio.gather(self.reader_task, return_exceptions=True)
+
+    async def _read_loop(self):
+        block = None
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                break
+            line = line.rstrip(b'\n')
+            if block is not None:
+                if line.startswith((b'%end ', b'%error ')) and line.split()[1:3] == block['key']:
+                    if block['client'] and self.pending:
+                        future = self.pending.pop(0)
+                        if not future.done():
+                            lines = [item.decode('utf-8', 'replace') for item in block['lines']]
+                            if line.startswith(b'%error'):
+                                future.set_exception(RuntimeError('\n'.join(lines)))
+                            else:
+                                future.set_result(lines)
+                    block = None
+                else:
+                    block['lines'].append(line)
+            elif line.startswith(b'%begin '):
+                fields = line.split()
+                # flags bit 1 marks blocks answering commands we sent
+                block = {'key': fields[1:3], 'client': fields[3:4] == [b'1'], 'lines': []}
+            elif line.startswith(b'%output '):
+                _, pane_id, data = (line.split(b' ', 2) + [b''])[:3]
+                for queue in self.subscribers.get(pane_id.decode(), ()):
+                    queue.put_nowait(decode_control_output(data))
+            elif line.startswith(b'%session-changed') and not self.attached.done():
+                self.attached.set_result(True)
+            elif line.startswith(b'%exit'):
+                break
+        if not self.attached.done():
+            self.attached.set_exception(ConnectionError(f'cannot attach to tmux session {self.session}'))
+        for future in self.pending:
+            if not future.done():
+                future.set_exception(ConnectionError('tmux control connection closed'))
+        self.pending.clear()
+
+    async def command(self, command: str, timeout: float = 10.0) -> List[str]:
+        """Run one tmux command over the shared connection"""
+        async with self.write_lock:
+            future = asyncio.get_running_loop().create_future()
+            self.pending.append(future)
+            self.process.stdin.write(command.encode() + b'\n')
+            await self.process.stdin.drain()
+        return await asyncio.wait_for(future, timeout)
+
+    async def pane_id(self, target: str) -> str:
+        if target not in self.pane_ids:
+            lines = await self.command(f"display-message -p -t {target} '#{{pane_id}}'")
+            self.pane_ids[target] = lines[0].strip()
+        return self.pane_ids[target]
+
+    def subscribe(self, pane_id: str) -> asyncio.Queue:
+        queue = asyncio.Queue()
+        self.subscribers.setdefault(pane_id, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, pane_id: str, queue: asyncio.Queue):
+        self.subscribers.get(pane_id, set()).discard(queue)
+
+    async def send_line(self, target: str, text: str):
+        """Type text plus Enter; hex keys sidestep tmux command quoting"""
+        keys = ' '.join(f'{byte:02x}' for byte in text.encode()) + ' 0d'
+        await self.command(f'send-keys -t {target} -H {keys}')
+
+    async def capture(self, target: str, lines: Optional[int] = None) -> str:
+        start = f'-S -{lines}' if lines else '-S -'
+        return '\n'.join(await self.command(f'capture-pane -p -J {start} -t {target}'))
+
+
+class WorkflowMcpServer:
+    """MCP tool dispatch over shared tmux connections"""
+
+    def __init__(self, session: str = 'ai-workflow', socket: Optional[str] = None):
+        self.default_session = session
+        self.default_socket = socket
+        self.controls = {}       # (socket, session) -> TmuxControlClient
+        self.pane_locks = {}     # (socket, target) -> asyncio.Lock, one command per pane at a time
+        self.clients = {}        # SSE session id -> asyncio.Queue of outgoing messages
+        self.tasks = set()       # running dispatches; the loop only holds weak references
+        self.controls_lock = asyncio.Lock()
+        self.simulator = phi3.Phi3Simulator()
+
+    async def control(self, session: Optional[str], socket: Optional[str]) -> TmuxControlClient:
+        key = (socket or self.default_socket, session or self.default_session)
+        async with self.controls_lock:
+            if key in self.controls and not self.controls[key].connected:
+                # The session's server went away (--cold-start, recovery); reattach
+                await self.controls.pop(key).close()
+            if key not in self.controls:
+                client = TmuxControlClient(key[1], key[0])
+                try:
+                    await client.start()
+                except BaseException:
+                    # Don't leak the tmux -C process or its reader task
+                    await client.close()
+                    raise
+                self.controls[key] = client
+        return self.controls[key]
+
+    async def close(self):
+        for client in self.controls.values():
+            await client.close()
+
+    def target(self, arguments: Dict) -> str:
+        pane = arguments.get('pane', 'left')
+        if pane not in PANES:
+            raise ValueError(f"Unknown pane: {pane}")
+        return f"{arguments.get('session') or self.default_session}:0.{PANES.index(pane)}"
+
+    # ---- tools ----
+
+    def tool_definitions(self) -> List[Dict]:
+        pane_property = {'type': 'string', 'enum': list(PANES), 'default': 'left'}
+        session_properties = {
+            'session': {'type': 'string', 'description': 'Workflow session name'},
+            'socket': {'type': 'string', 'description': 'tmux -L socket of the session'},
+        }
+        return [
+            {
+                'name': 'run_in_pane',
+                'description': 'Run a shell command in a pane and return the cleaned result. '
+                               'Output is streamed as progress notifications.',
+                'inputSchema': {'type': 'object', 'required': ['command'], 'properties': dict(
+                    pane=pane_property,
+                    command={'type': 'string'},
+                    timeout_category={'type': 'string', 'enum': ['quick', 'build', 'test', 'long']},
+                    flood_guard={'type': 'boolean',
+                                 'description': 'Spill output to a side file and throttle the pane '
+                                                '(for commands printing thousands of lines)'},
+                    **session_properties)},
+            },
+            {
+                'name': 'capture_pane',
+                'description': 'Capture the current contents of a pane',
+                'inputSchema': {'type': 'object', 'properties': dict(
+                    pane=pane_property, lines={'type': 'integer'}, **session_properties)},
+            },
+            {
+                'name': 'clean_output',
+                'description': 'Clean raw pane output into a structured result',
+                'inputSchema': {'type': 'object', 'required': ['raw_output'], 'properties': {
+                    'raw_output': {'type': 'string'}, 'marker_id': {'type': 'string'}}},
+            },
+            {
+                'name': 'recover_pane',
+                'description': 'Interrupt whatever runs in a pane and restore its prompt',
+                'inputSchema': {'type': 'object', 'properties': dict(
+                    pane=pane_property, **session_properties)},
+            },
+        ]
+
+    async def run_in_pane(self, arguments: Dict, progress) -> Dict:
+        control = await self.control(arguments.get('session'), arguments.get('socket'))
+        target = self.target(arguments)
+        category = arguments.get('timeout_category', 'quick')
+        marker_id = phi3.new_marker_id()
+        pane_command = self.simulator.build_pane_command(
+            arguments['command'], marker_id, category, self.simulator.timeout_defaults[category],
+            arguments.get('flood_guard'))
+        marker = re.compile(rf'exit_code=\d+ id={marker_id}')
+
+        socket = arguments.get('socket') or self.default_socket
+        lock = self.pane_locks.setdefault((socket, target), asyncio.Lock())
+        async with lock:
+            pane_id = await control.pane_id(target)
+            queue = control.subscribe(pane_id)
+            try:
+                await control.send_line(target, pane_command)
+                deadline = time.monotonic() + self.simulator.timeout_defaults[category] + 5
+                seen = ''
+                while not marker.search(seen):
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise TimeoutError(f"No completion marker from {target}")
+                    try:
+                        chunk = await asyncio.wait_for(queue.get(), min(remaining, QUIET_INTERVAL))
+                    except asyncio.TimeoutError:
+                        # %output is best effort (a freshly attached client can
+                        # miss early output); a quiet pane is checked directly
+                        if marker.search(await control.capture(target, 50)):
+                            break
+                        continue
+                    text = ANSI_ESCAPE.sub('', chunk.decode('utf-8', 'replace'))
+                    seen = seen[-4096:] + text
+                    await progress(text)
+            finally:
+                control.unsubscribe(pane_id, queue)
+            raw_output = await control.capture(target)
+        result = self.simulator.clean_tmux_output(raw_output, marker_id=marker_id)
+        result['marker_id'] = marker_id
+        return result
+
+    async def capture_pane(self, arguments: Dict, progress) -> Dict:
+        control = await self.control(arguments.get('session'), arguments.get('socket'))
+        return {'output': await control.capture(self.target(arguments), arguments.get('lines'))}
+
+    async def clean_output(self, arguments: Dict, progress) -> Dict:
+        return self.simulator.clean_tmux_output(arguments['raw_output'], arguments.get('marker_id'))
+
+    async def recover_pane(self, arguments: Dict, progress) -> Dict:
+        """Same sequence as `tmux-recover <pane> emergency`, over the shared connection"""
+        control = await self.control(arguments.get('session'), arguments.get('socket'))
+        target = self.target(arguments)
+        pane = arguments.get('pane', 'left')
+        prompt = f'ai-workflow-bash:{pane} $'
+
+        async def wait_for(pattern: str, timeout: float = 5.0) -> bool:
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                lines = [line for line in (await control.capture(target, 50)).split('\n') if line.strip()]
+                if lines and re.search(pattern, lines[-1]):
+                    return True
+                await asyncio.sleep(0.1)
+            return False
+
+        await control.command(f'send-keys -t {target} C-c')
+        interrupted = await wait_for(r'[$#]\s*$')
+        await control.send_line(target, f"clear; cd; export PS1='{prompt} '; clear")
+        restored = await wait_for('^' + re.escape(prompt) + r'\s*$')
+        return {'pane': pane, 'interrupted': interrupted, 'recovered': restored}
+
+    # ---- JSON-RPC ----
+
+    async def handle_message(self, message: Dict, send) -> Optional[Dict]:
+        """Handle one JSON-RPC message; `send` delivers notifications to the caller"""
+        method = message.get('method')
+        request_id = message.get('id')
+        params = message.get('params') or {}
+
+        if request_id is None:
+            return None   # notifications (e.g. notifications/initialized) need no reply
+
+        try:
+            if method == 'initialize':
+                result = {
+                    'protocolVersion': PROTOCOL_VERSION,
+                    'capabilities': {'tools': {}},
+                    'serverInfo': {'name': 'ai-workflow', 'version': '1.0'},
+                }
+            elif method == 'ping':
+                result = {}
+            elif method == 'tools/list':
+                result = {'tools': self.tool_definitions()}
+            elif method == 'tools/call':
+                result = await self.call_tool(params, send)
+            else:
+                return {'jsonrpc': '2.0', 'id': request_id,
+                        'error': {'code': -32601, 'message': f'Method not found: {method}'}}
+        except Exception as e:
+            return {'jsonrpc': '2.0', 'id': request_id,
+                    'error': {'code': -32603, 'message': str(e)}}
+        return {'jsonrpc': '2.0', 'id': request_id, 'result': result}
+
+    async def call_tool(self, params: Dict, send) -> Dict:
+        name = params.get('name')
+        if name not in ('run_in_pane', 'capture_pane', 'clean_output', 'recover_pane'):
+            raise ValueError(f"Unknown tool: {name}")
+        token = (params.get('_meta') or {}).get('progressToken')
+        chunks = 0
+
+        async def progress(text: str):
+            nonlocal chunks
+            chunks += 1
+            if token is not None:
+                await send({'jsonrpc': '2.0', 'method': 'notifications/progress',
+                            'params': {'progressToken': token, 'progress': chunks, 'message': text}})
+
+        try:
+            result = await getattr(self, name)(params.get('arguments') or {}, progress)
+        except Exception as e:
+            return {'content': [{'type': 'text', 'text': str(e)}], 'isError': True}
+        return {'content': [{'type': 'text', 'text': json.dumps(result, default=phi3.json_default)}],
+                'isError': False}
+
+    # ---- HTTP + SSE transport ----
+
+    async def handle_http(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = (await reader.readline()).decode('latin-1').strip()
+            if not request_line:
+                return
+            method, path, _ = request_line.split(' ', 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode('latin-1').strip()
+                if not line:
+                    break
+                key, _, value = line.partition(':')
+                headers[key.strip().lower()] = value.strip()
+            url = urlparse(path)
+
+            if method == 'GET' and url.path == '/sse':
+                await self._serve_sse(reader, writer)
+            elif method == 'POST' and url.path == '/messages':
+                body = await reader.readexactly(int(headers.get('content-length', 0)))
+                session_id = parse_qs(url.query).get('session_id', [''])[0]
+                await self._accept_message(session_id, body, writer)
+            else:
+                self._respond(writer, 404, b'Not Found')
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+    def _respond(self, writer, status: int, body: bytes):
+        reason = {202: 'Accepted', 400: 'Bad Request', 404: 'Not Found'}.get(status, 'OK')
+        writer.write(f'HTTP/1.1 {status} {reason}\r\nContent-Length: {len(body)}\r\n'
+                     f'Connection: close\r\n\r\n'.encode() + body)
+
+    async def _serve_sse(self, reader, writer):
+        session_id = secrets.token_hex(8)
+        queue = asyncio.Queue()
+        self.clients[session_id] = queue
+        writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\n'
+                     b'Cache-Control: no-cache\r\nConnection: keep-alive\r\n\r\n')
+        writer.write(f'event: endpoint\ndata: /messages?session_id={session_id}\n\n'.encode())
+        # The stream ends when the client hangs up
+        disconnected = asyncio.ensure_future(reader.read())
+        try:
+            await writer.drain()
+            while True:
+                getter = asyncio.ensure_future(queue.get())
+                done, _ = await asyncio.wait({getter, disconnected}, return_when=asyncio.FIRST_COMPLETED)
+                if getter not in done:
+                    getter.cancel()
+                    break
+                writer.write(f'event: message\ndata: {json.dumps(getter.result())}\n\n'.encode())
+                await writer.drain()
+        finally:
+            disconnected.cancel()
+            self.clients.pop(session_id, None)
+
+    async def _accept_message(self, session_id: str, body: bytes, writer):
+        queue = self.clients.get(session_id)
+        if queue is None:
+            self._respond(writer, 404, b'Unknown session')
+            return
+        try:
+            message = json.loads(body)
+        except ValueError:
+            self._respond(writer, 400, b'Invalid JSON')
+            return
+        self._respond(writer, 202, b'Accepted')
+        await writer.drain()
+
+        async def dispatch():
+            response = await self.handle_message(message, queue.put)
+            if response is not None:
+                await queue.put(response)
+
+        # Long tool calls must not hold up this client's (or anyone's) next request
+        task = asyncio.ensure_future(dispatch())
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def serve(self, host: str = '127.0.0.1', port: int = 8765):
+        server = await asyncio.start_server(self.handle_http, host, port)
+        async with server:
+            await server.serve_forever()
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] in ('-h', '--help'):
+        print("Usage: ./mcp-server.py [--host H] [--port P] [--session NAME] [--socket S]")
+        print()
+        print("Serves run_in_pane, capture_pane, clean_output and recover_pane over")
+        print("MCP HTTP+SSE (GET /sse, POST /messages). Defaults: 127.0.0.1:8765, ai-workflow.")
+        return
+
+    options = {'--host': '127.0.0.1', '--port': '8765', '--session': 'ai-workflow', '--socket': None}
+    while args:
+        flag = args.pop(0)
+        if flag not in options or not args:
+            print(f"Error: unknown or incomplete option {flag}")
+            sys.exit(1)
+        options[flag] = args.pop(0)
+
+    server = WorkflowMcpServer(options['--session'], options['--socket'])
+    print(f"ai-workflow MCP server on http://{options['--host']}:{options['--port']}/sse", flush=True)
+    try:
+        asyncio.run(server.serve(options['--host'], int(options['--port'])))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
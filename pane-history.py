@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+
+"""
+pane-history.py - Searchable history of commands run in ai-workflow panes
+Every finished tagged command - its command line, cleaned output, exit code,
+pane and timing - is added to a SQLite database with an FTS5 full-text index,
+so "when did this test last fail and what did it print" is a query instead of
+a rerun.
+
+Commands arrive as they finish, either from `PaneCommandQueue` (pass
+`HistoryIndex.record` as its `on_complete`) or by syncing the pane journals
+written by pane-journal.py, which covers commands typed by any client.
+
+    ./pane-history.py sync
+    ./pane-history.py search 'segfault' --pane top --failed
+    ./pane-history.py search 'make: ***'          # words match literally
+    ./pane-history.py search --raw 'KeyError NOT test_*'
+"""
+
+import json
+import os
+import re
+import sqlite3
+import sys
+import time
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT_DIR)
+from workflow_common import load_module, load_phi3_module
+
+PANES = ('left', 'top', 'bottom')
+
+# The line a tagged command was typed as (see Phi3Simulator.build_pane_command)
+TYPED_COMMAND = re.compile(r'^(?:.*?[$#] )?(.*) ; printf "\\nprogram execution done\. '
+                           r'exit_code=%s id=%s\\n" \$\? [0-9a-f]+\s*$')
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commands (
+    id INTEGER PRIMARY KEY,
+    marker_id TEXT UNIQUE,
+    session TEXT,
+    pane TEXT,
+    command TEXT,
+    output TEXT,
+    exit_code INTEGER,
+    output_type TEXT,
+    summary TEXT,
+    started REAL,
+    finished REAL,
+    duration REAL
+);
+CREATE INDEX IF NOT EXISTS commands_pane ON commands (session, pane, finished);
+CREATE INDEX IF NOT EXISTS commands_exit ON commands (exit_code, finished);
+CREATE TABLE IF NOT EXISTS journal_sync (
+    journal TEXT PRIMARY KEY,
+    offset INTEGER
+);
+"""
+
+# External-content FTS table kept in step with `commands` by triggers
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS commands_fts USING fts5(
+    command, output, content='commands', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS commands_ai AFTER INSERT ON commands BEGIN
+    INSERT INTO commands_fts (rowid, command, output) VALUES (new.id, new.command, new.output);
+END;
+CREATE TRIGGER IF NOT EXISTS commands_ad AFTER DELETE ON commands BEGIN
+    INSERT INTO commands_fts (commands_fts, rowid, command, output)
+    VALUES ('delete', old.id, old.command, old.output);
+END;
+CREATE TRIGGER IF NOT EXISTS commands_au AFTER UPDATE ON commands BEGIN
+    INSERT INTO commands_fts (commands_fts, rowid, command, output)
+    VALUES ('delete', old.id, old.command, old.output);
+    INSERT INTO commands_fts (rowid, command, output) VALUES (new.id, new.command, new.output);
+END;
+"""
+
+
+def fts_terms(query: str) -> str:
+    """Plain text -> FTS5 query matching each whitespace-separated term literally
+
+    Every term becomes a quoted phrase, so punctuation (`make: ***`,
+    `KeyError: 'foo'`, `test-suite`) is not parsed as FTS5 syntax. Terms with
+    no word characters match nothing in the index and are dropped.
+    """
+    return ' '.join('"' + term.replace('"', '""') + '"'
+                    for term in query.split() if re.search(r'\w', term))
+
+
+class HistoryIndex:
+    """Command history store with full-text search and filterable fields"""
+
+    def __init__(self, path: Optional[str] = None):
+        cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                                 'ai-workflow')
+        self.path = path or os.environ.get('AI_WORKFLOW_HISTORY', os.path.join(cache_dir, 'history.db'))
+        if self.path != ':memory:':
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.db = sqlite3.connect(self.path)
+        self.db.row_factory = sqlite3.Row
+        self.db.execute('PRAGMA journal_mode=WAL')
+        self.db.executescript(SCHEMA)
+        try:
+            self.db.executescript(FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            # SQLite built without FTS5: searches fall back to LIKE scans
+            self.fts = False
+        self._simulator = None
+
+    def close(self):
+        self.db.close()
+
+    def record(self, result: Dict, session: str = 'ai-workflow'):
+        """Add one finished command (a PaneCommandQueue result) to the index"""
+        started, finished = result.get('started'), result.get('finished') or time.time()
+        self.db.execute(
+            'INSERT INTO commands (marker_id, session, pane, command, output, exit_code, output_type,'
+            ' summary, started, finished, duration) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+            ' ON CONFLICT (marker_id) DO UPDATE SET output = excluded.output,'
+            ' exit_code = excluded.exit_code, output_type = excluded.output_type,'
+            ' summary = excluded.summary, finished = excluded.finished, duration = excluded.duration',
+            (result.get('marker_id'), result.get('session', session), result.get('pane'),
+             result.get('command'), result.get('cleaned_output', ''), result.get('exit_code'),
+             result.get('output_type'), result.get('summary'), started, finished,
+             finished - started if started else None))
+        self.db.commit()
+
+    def sync_journal(self, journal_dir: str, pane: str, session: str = 'ai-workflow') -> int:
+        """Index commands finished in a pane journal since the last sync"""
+        journal_module = load_module('pane_journal', 'pane-journal.py')
+        if self._simulator is None:
+            self._simulator = load_phi3_module().Phi3Simulator()
+        journal = journal_module.PaneJournal(journal_dir, pane)
+        key = os.path.join(os.path.abspath(journal_dir), pane)
+        row = self.db.execute('SELECT offset FROM journal_sync WHERE journal = ?', (key,)).fetchone()
+        synced = row['offset'] if row else -1
+
+        count = 0
+        for entry in journal.commands():
+            if entry['end'] <= synced:
+                continue
+            text = journal.command_text(entry['id'])
+            if text is None:
+                continue    # rotated away before it was synced
+            result = self._simulator.clean_tmux_output(text, marker_id=entry['id'])
+            typed = TYPED_COMMAND.match(text.split('\n', 1)[0])
+            result.update(marker_id=entry['id'], pane=pane, session=session,
+                          command=typed.group(1) if typed else None,
+                          started=entry.get('started'), finished=entry['time'])
+            self.record(result)
+            synced = entry['end']
+            count += 1
+
+        self.db.execute('INSERT OR REPLACE INTO journal_sync (journal, offset) VALUES (?, ?)', (key, synced))
+        self.db.commit()
+        return count
+
+    def search(self, query: Optional[str] = None, pane: Optional[str] = None,
+               session: Optional[str] = None, exit_code: Optional[int] = None,
+               failed: Optional[bool] = None, since: Optional[float] = None,
+               until: Optional[float] = None, limit: int = 20, raw: bool = False) -> List[Dict]:
+        """Most recent commands matching the text query and field filters
+
+        `query` words are matched literally (all of them, in any order). With
+        `raw`, it is passed to FTS5 as is (words, "phrases", prefix*,
+        AND/OR/NOT) and a malformed query raises sqlite3.OperationalError.
+        """
+        clauses, params = [], []
+        match = query if raw else fts_terms(query or '')
+        if match and self.fts:
+            clauses.append('commands.id IN (SELECT rowid FROM commands_fts WHERE commands_fts MATCH ?)')
+            params.append(match)
+        elif query:
+            clauses.append('(command LIKE ? OR output LIKE ?)')
+            params += [f'%{query}%'] * 2
+        for column, value in (('pane', pane), ('session', session), ('exit_code', exit_code)):
+            if value is not None:
+                clauses.append(f'{column} = ?')
+                params.append(value)
+        if failed is not None:
+            clauses.append('exit_code != 0' if failed else 'exit_code = 0')
+        if since is not None:
+            clauses.append('finished >= ?')
+            params.append(since)
+        if until is not None:
+            clauses.append('finished <= ?')
+            params.append(until)
+
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        rows = self.db.execute(f'SELECT * FROM commands{where} ORDER BY finished DESC, id DESC LIMIT ?',
+                               params + [limit]).fetchall()
+        return [dict(row) for row in rows]
+
+    def get(self, marker_id: str) -> Optional[Dict]:
+        row = self.db.execute('SELECT * FROM commands WHERE marker_id = ?', (marker_id,)).fetchone()
+        return dict(row) if row else None
+
+
+def parse_age(value: str) -> float:
+    """'90s', '15m', '2h', '3d' -> epoch seconds that long ago"""
+    units = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+    if value[-1:] in units:
+        return time.time() - float(value[:-1]) * units[value[-1]]
+    return time.time() - float(value)
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ('-h', '--help'):
+        print("Usage: ./pane-history.py sync [--session NAME]")
+        print("       ./pane-history.py search [QUERY] [--pane P] [--session NAME] [--failed]")
+        print("                                [--exit-code N] [--since 2h] [--limit N] [--raw]")
+        print("       ./pane-history.py show <marker_id>")
+        print()
+        print("History lives in $AI_WORKFLOW_HISTORY (default ~/.cache/ai-workflow/history.db);")
+        print("sync reads the pane journals in $AI_WORKFLOW_STATE_DIR/journal.")
+        print("QUERY words match literally; --raw passes QUERY to SQLite FTS5 as a query.")
+        return
+
+    command, args = args[0], args[1:]
+    options = {'--pane': None, '--session': None, '--exit-code': None,
+               '--since': None, '--limit': '20'}
+    failed = '--failed' in args
+    raw = '--raw' in args
+    args = [arg for arg in args if arg not in ('--failed', '--raw')]
+    positional = []
+    while args:
+        flag = args.pop(0)
+        if flag in options and args:
+            options[flag] = args.pop(0)
+        elif flag.startswith('--'):
+            print(f"Error: unknown or incomplete option {flag}")
+            sys.exit(1)
+        else:
+            positional.append(flag)
+
+    index = HistoryIndex()
+    if command == 'sync':
+        session = options['--session'] or 'ai-workflow'
+        journal_dir = os.path.join(os.environ.get('AI_WORKFLOW_STATE_DIR', f'/tmp/ai-workflow-{session}'),
+                                   'journal')
+        counts = {pane: index.sync_journal(journal_dir, pane, session) for pane in PANES}
+        print(json.dumps(counts))
+    elif command == 'search':
+        try:
+            results = index.search(
+                ' '.join(positional) or None, pane=options['--pane'],
+                session=options['--session'],
+                exit_code=int(options['--exit-code']) if options['--exit-code'] is not None else None,
+                failed=True if failed else None,
+                since=parse_age(options['--since']) if options['--since'] else None,
+                limit=int(options['--limit']), raw=raw)
+        except sqlite3.OperationalError as e:
+            print(f"Error: invalid FTS5 query: {e}")
+            sys.exit(1)
+        for result in results:
+            result['output'] = result['output'][-500:]
+            print(json.dumps(result))
+    elif command == 'show' and positional:
+        result = index.get(positional[0])
+        if result is None:
+            print(f"Error: no command {positional[0]} in history")
+            sys.exit(1)
+        print(json.dumps(result, indent=2))
+    else:
+        print(f"Error: unknown command {command}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
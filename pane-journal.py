@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+
+"""
+pane-journal.py - On-disk output journal for ai-workflow panes
+Every byte a pane prints is appended to fixed-size segment files that rotate
+as a ring, so output survives tmux's history-limit, `clear`/`reset` during
+recovery and even the session itself, without being held in memory.
+
+Offsets are logical (bytes since the journal began) and each tagged command
+marker is indexed with the byte range of its command's output, so one
+command's output can be read back - as memoryviews over mmap'd segments,
+touching only that range - and handed to `clean_tmux_output`.
+
+    <journal_dir>/<pane>-<start offset, hex>.seg   output segments
+    <journal_dir>/<pane>.index                     one JSON line per command
+
+Index entries are dropped with the segment their output starts in, so the
+index stays as bounded as the ring.
+
+setup-workflow.sh pipes each pane into `pane-journal.py record`, which also
+writes the capped <pane>.stream followed by pane-listener.py and pane-vt.py.
+"""
+
+import contextlib
+import json
+import mmap
+import os
+import re
+import sys
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT_DIR)
+from workflow_common import ANSI_ESCAPE, STREAM_LIMIT, StreamWriter, load_phi3_module
+
+SEGMENT_SIZE = 4 * 1024 * 1024
+MAX_SEGMENTS = 8
+
+# Raw-stream forms of the tagged marker (see phi3-simulator.py) and of the
+# pane echoing the typed command line, whose printf ends in "$? <id>"
+MARKER = re.compile(rb'program execution done\. exit_code=(\d+) id=([0-9a-f]+)\r?\n')
+COMMAND_ECHO = re.compile(rb'\$\? ([0-9a-f]+)\r?\n')
+
+
+def segment_paths(journal_dir: str, pane: str) -> List[Tuple[int, str]]:
+    """(start offset, path) of the pane's segments, oldest first"""
+    pattern = re.compile(re.escape(pane) + r'-([0-9a-f]{16})\.seg$')
+    try:
+        names = os.listdir(journal_dir)
+    except FileNotFoundError:
+        return []
+    segments = []
+    for name in names:
+        match = pattern.match(name)
+        if match:
+            segments.append((int(match.group(1), 16), os.path.join(journal_dir, name)))
+    return sorted(segments)
+
+
+class JournalWriter:
+    """Appends pane output to rotating segments and indexes command markers"""
+
+    def __init__(self, journal_dir: str, pane: str, segment_size: int = SEGMENT_SIZE,
+                 max_segments: int = MAX_SEGMENTS):
+        self.journal_dir = journal_dir
+        self.pane = pane
+        self.segment_size = segment_size
+        self.max_segments = max_segments
+        os.makedirs(journal_dir, exist_ok=True)
+
+        # Resume after the newest segment of an earlier recorder
+        segments = segment_paths(journal_dir, pane)
+        if segments:
+            start, path = segments[-1]
+            self.offset = start + os.path.getsize(path)
+        else:
+            self.offset = 0
+        self.segment = None
+        self.segment_end = 0
+        self.scan_buffer = b''       # current unfinished line
+        self.scan_base = self.offset # logical offset of scan_buffer[0]
+        self.command_starts = {}     # marker id -> (offset, time) of its command echo
+        self.last_marker_end = self.offset
+
+    def _open_segment(self):
+        segments = segment_paths(self.journal_dir, self.pane)
+        if segments and segments[-1][0] + os.path.getsize(segments[-1][1]) == self.offset \
+                and os.path.getsize(segments[-1][1]) < self.segment_size:
+            start, path = segments[-1]
+        else:
+            start = self.offset
+            path = os.path.join(self.journal_dir, f'{self.pane}-{start:016x}.seg')
+            segments.append((start, path))
+            # Ring: drop the oldest segments beyond the limit, and their commands
+            for _, old_path in segments[:-self.max_segments]:
+                os.remove(old_path)
+            if len(segments) > self.max_segments:
+                self._prune_index(segments[-self.max_segments][0])
+        self.segment = open(path, 'ab')
+        self.segment_end = start + self.segment_size
+
+    def _prune_index(self, start: int):
+        """Drop index entries whose output starts before `start` (rotated away)"""
+        path = os.path.join(self.journal_dir, f'{self.pane}.index')
+        try:
+            with open(path) as index:
+                lines = [line for line in index if line.strip()]
+        except FileNotFoundError:
+            return
+        kept = [line for line in lines if json.loads(line)['start'] >= start]
+        if len(kept) < len(lines):
+            # Replaced whole so readers see the old index or the new one
+            with open(path + '.tmp', 'w') as index:
+                index.writelines(kept)
+            os.replace(path + '.tmp', path)
+
+    def append(self, data: bytes) -> Tuple[int, int]:
+        """Journal a chunk of pane output, returning its (start, end) offsets"""
+        start = self.offset
+        view = memoryview(data)
+        while view:
+            if self.segment is None:
+                self._open_segment()
+            room = self.segment_end - self.offset
+            written = self.segment.write(view[:room])
+            self.offset += written
+            view = view[written:]
+            if self.offset >= self.segment_end:
+                self.segment.close()
+                self.segment = None
+        if self.segment is not None:
+            self.segment.flush()
+        self._scan(data)
+        return start, self.offset
+
+    def _scan(self, data: bytes):
+        """Index markers on the complete lines now available"""
+        self.scan_buffer += data
+        line_end = self.scan_buffer.rfind(b'\n') + 1
+        if not line_end:
+            if len(self.scan_buffer) > 4096:
+                self.scan_base += len(self.scan_buffer)
+                self.scan_buffer = b''
+            return
+        lines = self.scan_buffer[:line_end]
+
+        for match in COMMAND_ECHO.finditer(lines):
+            line_start = lines.rfind(b'\n', 0, match.start()) + 1
+            self.command_starts[match.group(1).decode()] = (self.scan_base + line_start, time.time())
+
+        entries = []
+        for match in MARKER.finditer(lines):
+            marker_id = match.group(2).decode()
+            end = self.scan_base + match.end()
+            start, started = self.command_starts.pop(marker_id, (self.last_marker_end, None))
+            entries.append({
+                'id': marker_id,
+                'start': start,
+                'end': end,
+                'exit_code': int(match.group(1)),
+                'started': started,
+                'time': time.time(),
+            })
+            self.last_marker_end = end
+        if entries:
+            with open(os.path.join(self.journal_dir, f'{self.pane}.index'), 'a') as index:
+                index.write(''.join(json.dumps(entry) + '\n' for entry in entries))
+
+        self.scan_base += line_end
+        self.scan_buffer = self.scan_buffer[line_end:]
+
+    def close(self):
+        if self.segment is not None:
+            self.segment.close()
+            self.segment = None
+
+
+class PaneJournal:
+    """Read side of one pane's journal
+
+    Index entries are kept in memory and only lines appended since the last
+    lookup are read, so looking up every command (as pane-history.py sync
+    does) reads the index once.
+    """
+
+    def __init__(self, journal_dir: str, pane: str):
+        self.journal_dir = journal_dir
+        self.pane = pane
+        self.entries = {}          # marker id -> index entry, in index order
+        self.index_position = 0    # bytes of the index already parsed
+        self.index_head = None     # its first line: changes when the writer prunes it
+
+    def segments(self) -> List[Tuple[int, str]]:
+        return segment_paths(self.journal_dir, self.pane)
+
+    @property
+    def start_offset(self) -> int:
+        """Oldest offset still on disk"""
+        segments = self.segments()
+        return segments[0][0] if segments else 0
+
+    @property
+    def end_offset(self) -> int:
+        segments = self.segments()
+        if not segments:
+            return 0
+        start, path = segments[-1]
+        return start + os.path.getsize(path)
+
+    @contextlib.contextmanager
+    def mapped(self, start: int, end: Optional[int] = None) -> Iterator[List[memoryview]]:
+        """Zero-copy views of [start, end), one per segment, valid inside the with block
+
+        The part already rotated away is skipped.
+        """
+        with contextlib.ExitStack() as stack:
+            views = []
+            for segment_start, path in self.segments():
+                try:
+                    f = stack.enter_context(open(path, 'rb'))
+                except FileNotFoundError:
+                    continue    # rotated away while reading
+                size = os.fstat(f.fileno()).st_size
+                segment_end = segment_start + size
+                if size == 0 or segment_end <= start or (end is not None and segment_start >= end):
+                    continue
+                mapped = stack.enter_context(mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ))
+                whole = stack.enter_context(memoryview(mapped))
+                low = max(start, segment_start) - segment_start
+                high = size if end is None else min(end, segment_end) - segment_start
+                views.append(stack.enter_context(whole[low:high]))
+            yield views
+
+    def read(self, start: int, end: Optional[int] = None) -> bytes:
+        """Bytes in [start, end), copied once out of the mapped segments"""
+        with self.mapped(start, end) as views:
+            return b''.join(views)
+
+    def _refresh(self):
+        """Parse index lines appended since the last call, all of them after a prune"""
+        try:
+            index = open(os.path.join(self.journal_dir, f'{self.pane}.index'), 'rb')
+        except FileNotFoundError:
+            self.entries, self.index_position, self.index_head = {}, 0, None
+            return
+        with index:
+            head = index.readline()
+            if head != self.index_head:
+                self.entries, self.index_position, self.index_head = {}, 0, head
+            index.seek(self.index_position)
+            data = index.read()
+        complete = data[:data.rfind(b'\n') + 1]    # the writer may be mid-line
+        self.index_position += len(complete)
+        for line in complete.splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                self.entries.pop(entry['id'], None)    # a re-recorded id moves to the end
+                self.entries[entry['id']] = entry
+
+    def commands(self) -> List[Dict]:
+        """Index entries for every finished tagged command still on disk, oldest first"""
+        self._refresh()
+        return list(self.entries.values())
+
+    def command(self, marker_id: str) -> Optional[Dict]:
+        self._refresh()
+        return self.entries.get(marker_id)
+
+    def command_output(self, marker_id: str) -> Optional[bytes]:
+        """Raw output of one command, None if unknown or rotated away"""
+        entry = self.command(marker_id)
+        if entry is None or entry['start'] < self.start_offset:
+            return None
+        return self.read(entry['start'], entry['end'])
+
+    def command_text(self, marker_id: str) -> Optional[str]:
+        """One command's output as plain text, ready for clean_tmux_output"""
+        raw = self.command_output(marker_id)
+        if raw is None:
+            return None
+        text = ANSI_ESCAPE.sub('', raw.decode('utf-8', 'replace'))
+        return text.replace('\r\n', '\n').replace('\r', '')
+
+
+def record(journal_dir: str, pane: str, stream_path: Optional[str] = None):
+    """Journal stdin until EOF (the pipe-pane end of the stream)
+
+    With stream_path, the raw output is also appended to that capped,
+    rotating pane stream.
+    """
+    writer = JournalWriter(journal_dir, pane,
+                           int(os.environ.get('AI_WORKFLOW_JOURNAL_SEGMENT', SEGMENT_SIZE)),
+                           int(os.environ.get('AI_WORKFLOW_JOURNAL_SEGMENTS', MAX_SEGMENTS)))
+    stream = None
+    if stream_path:
+        stream = StreamWriter(stream_path, int(os.environ.get('AI_WORKFLOW_STREAM_LIMIT', STREAM_LIMIT)))
+    try:
+        while True:
+            data = os.read(sys.stdin.fileno(), 65536)
+            if not data:
+                break
+            if stream is not None:
+                stream.append(data)
+            writer.append(data)
+    finally:
+        writer.close()
+        if stream is not None:
+            stream.close()
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ('-h', '--help'):
+        print("Usage: ./pane-journal.py record <journal_dir> <pane> [--stream <path>]   (reads stdin)")
+        print("       ./pane-journal.py list <journal_dir> <pane>")
+        print("       ./pane-journal.py show <journal_dir> <pane> <marker_id> [--clean]")
+        print()
+        print("The journal of a session lives in $AI_WORKFLOW_STATE_DIR/journal.")
+        return
+
+    command, args = args[0], args[1:]
+    if command == 'record' and len(args) == 2:
+        record(*args)
+    elif command == 'record' and len(args) == 4 and args[2] == '--stream':
+        record(args[0], args[1], args[3])
+    elif command == 'list' and len(args) == 2:
+        for entry in PaneJournal(*args).commands():
+            print(json.dumps(entry))
+    elif command == 'show' and len(args) >= 3:
+        journal = PaneJournal(args[0], args[1])
+        text = journal.command_text(args[2])
+        if text is None:
+            print(f"Error: no journaled output for {args[2]}")
+            sys.exit(1)
+        if '--clean' in args:
+            simulator = load_phi3_module().Phi3Simulator()
+            print(json.dumps(simulator.clean_tmux_output(text, marker_id=args[2]).to_dict(), indent=2))
+        else:
+            sys.stdout.write(text)
+    else:
+        print(f"Error: unknown command or missing arguments: {command}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
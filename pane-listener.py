@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+
+"""
+pane-listener.py - Live readiness table for ai-workflow panes
+Follows the per-pane streams written by `tmux pipe-pane` (see setup-workflow.sh)
+and tracks the OSC 133 markers emitted by shell-integration.sh, so prompt
+verification needs no capture-pane round trip or screen parsing.
+"""
+
+import json
+import os
+import re
+import sys
+import time
+from typing import Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from workflow_common import StreamFollower
+
+# ESC ] 133 ; <kind> [; <args>...] terminated by BEL or ST (ESC \)
+OSC_133 = re.compile(rb'\x1b\]133;([A-D])(?:;([^\x07\x1b]*))?(?:\x07|\x1b\\)')
+
+
+class PaneListener:
+    """Tracks prompt-ready / running / exit status for every pane stream"""
+
+    def __init__(self, state_dir: Optional[str] = None):
+        self.state_dir = state_dir or os.environ.get(
+            'AI_WORKFLOW_STATE_DIR', '/tmp/ai-workflow-ai-workflow')
+        self.followers = {}  # pane -> StreamFollower of its stream
+        self.pending = {}    # pane -> unterminated escape sequence tail
+        self.states = {}     # pane -> state dict
+
+    def _new_state(self) -> Dict:
+        return {
+            'state': 'unknown',   # ready | running | unknown
+            'exit_code': None,    # exit status of the last finished command
+            'command_started': None,
+            'last_duration': None,
+            'commands': 0,
+            'updated': None,
+        }
+
+    @staticmethod
+    def _timestamp(value: str, default: float) -> float:
+        """Parse an $EPOCHREALTIME stamp (either decimal separator)"""
+        try:
+            return float(value.replace(',', '.'))
+        except ValueError:
+            return default
+
+    def _apply(self, pane: str, kind: str, args: List[str], now: float) -> Dict:
+        state = self.states.setdefault(pane, self._new_state())
+        if kind == 'C':
+            state['state'] = 'running'
+            state['command_started'] = self._timestamp(args[0], now) if args else now
+        elif kind == 'D':
+            # D is also emitted before the very first prompt; only a
+            # command we saw start has a meaningful exit status
+            if state['state'] == 'running' and args and args[0].isdigit():
+                finished = self._timestamp(args[1], now) if len(args) > 1 else now
+                state['exit_code'] = int(args[0])
+                state['commands'] += 1
+                if state['command_started'] is not None:
+                    state['last_duration'] = finished - state['command_started']
+        elif kind == 'A':
+            state['state'] = 'ready'
+        state['updated'] = now
+        return {'pane': pane, 'event': kind, 'args': args, 'time': now}
+
+    def feed(self, pane: str, data: bytes) -> List[Dict]:
+        """Process a chunk of raw pane output, returning the marker events in it"""
+        data = self.pending.pop(pane, b'') + data
+        now = time.time()
+        events = []
+        end = 0
+        for match in OSC_133.finditer(data):
+            args = match.group(2).decode('ascii', 'replace').split(';') if match.group(2) else []
+            events.append(self._apply(pane, match.group(1).decode(), args, now))
+            end = match.end()
+
+        # Keep a trailing, possibly incomplete OSC for the next chunk
+        tail_start = data.rfind(b'\x1b]', end)
+        if tail_start != -1 and len(data) - tail_start < 64:
+            self.pending[pane] = data[tail_start:]
+        return events
+
+    def poll(self) -> List[Dict]:
+        """Read whatever was appended to each pane stream since the last poll"""
+        events = []
+        try:
+            names = sorted(os.listdir(self.state_dir))
+        except FileNotFoundError:
+            return events
+
+        for name in names:
+            if not name.endswith('.stream'):
+                continue
+            pane = name[:-len('.stream')]
+            follower = self.followers.get(pane)
+            if follower is None:
+                follower = self.followers[pane] = StreamFollower(os.path.join(self.state_dir, name))
+            data = follower.read()
+            if follower.restarted:
+                self.pending.pop(pane, None)
+            if not data:
+                self.states.setdefault(pane, self._new_state())
+                continue
+            events.extend(self.feed(pane, data))
+        return events
+
+    def is_ready(self, pane: str) -> bool:
+        """True when the pane's shell is showing its prompt"""
+        self.poll()
+        return self.states.get(pane, {}).get('state') == 'ready'
+
+    def wait_ready(self, pane: str, timeout: float = 10.0, interval: float = 0.05) -> bool:
+        """Block until the pane is ready for input or the timeout expires"""
+        deadline = time.time() + timeout
+        while True:
+            if self.is_ready(pane):
+                return True
+            if time.time() >= deadline:
+                return False
+            time.sleep(interval)
+
+    def snapshot(self) -> Dict:
+        """Current state table for every known pane"""
+        self.poll()
+        return {pane: dict(state) for pane, state in sorted(self.states.items())}
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] in ('-h', '--help'):
+        print("Usage: ./pane-listener.py [state_dir] [--watch]")
+        print()
+        print("Prints the readiness table for every pane stream in state_dir")
+        print("(default: $AI_WORKFLOW_STATE_DIR or /tmp/ai-workflow-ai-workflow).")
+        print("With --watch, prints each marker event as it arrives.")
+        return
+
+    watch = '--watch' in args
+    args = [arg for arg in args if arg != '--watch']
+    listener = PaneListener(args[0] if args else None)
+
+    if not watch:
+        print(json.dumps(listener.snapshot(), indent=2))
+        return
+
+    try:
+        while True:
+            for event in listener.poll():
+                print(json.dumps(event), flush=True)
+            time.sleep(0.05)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,470 @@
+#!/usr/bin/env python3
+
+"""
+pane-replay.py - Record real pane sessions and replay them at scale
+A recording (trace) holds what was typed into a pane and every chunk of
+output it printed, with timestamps. The replay engine plays a trace back in
+thousands of simulated panes at once, in-process and without tmux, so the
+command driver (`PaneCommandQueue`), the output cleaner and the pipeline
+scheduling can be load-tested with realistic output sizes and timing.
+
+Replayed commands get the marker ids of the driver that sends them: the
+recorded id is rewritten in the output, so results are demultiplexed exactly
+as they are for a live pane.
+
+    ./pane-replay.py record build.trace bottom "make -j8" "make test"
+    ./pane-replay.py info build.trace
+    ./pane-replay.py load build.trace --panes 1000 --commands 5
+
+Trace format, one JSON object per line:
+
+    {"trace": 1, "pane": "bottom", "session": "ai-workflow", "recorded": <epoch>}
+    {"t": 0.0, "out": "ai-workflow-bash:bottom $ "}
+    {"t": 0.41, "in": "make -j8 ; printf ... $? 1a2b3c4d"}
+    {"t": 0.43, "out": "make -j8 ; printf ...\\r\\ncc -c main.c\\r\\n"}
+
+`t` is seconds since the recording started. Output is UTF-8 text with
+undecodable bytes kept as surrogate escapes.
+"""
+
+import codecs
+import collections
+import heapq
+import json
+import os
+import re
+import resource
+import sys
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, ROOT_DIR)
+from workflow_common import ANSI_ESCAPE, StreamFollower, load_phi3_module
+
+HISTORY_LIMIT = 2000    # tmux's default history-limit, in lines
+
+# Typed line of a tagged command (see Phi3Simulator.build_pane_command)
+TYPED_COMMAND = re.compile(r'^(.*) ; printf "\\nprogram execution done\. '
+                           r'exit_code=%s id=%s\\n" \$\? ([0-9a-f]+)$')
+MARKER = re.compile(rb'program execution done\. exit_code=(\d+) id=([0-9a-f]+)')
+CLEAR_HISTORY = '\x1b[3J'
+
+
+phi3 = load_phi3_module()
+
+
+class RecordedCommand:
+    """One typed command and the output that followed it, until the next one"""
+
+    def __init__(self, line: str, offset: float):
+        match = TYPED_COMMAND.match(line)
+        self.line = line
+        self.command = match.group(1) if match else line
+        self.marker_id = match.group(2).encode() if match else None
+        self.offset = offset           # trace time it was typed
+        self.output = bytearray()      # all output, joined
+        self.chunks = []               # (delay after typing, end position in output)
+        self.exit_code = None
+        self.duration = None           # typing -> marker
+
+    def add_output(self, delay: float, data: bytes):
+        self.output += data
+        self.chunks.append((delay, len(self.output)))
+        if self.exit_code is None and self.marker_id:
+            for match in MARKER.finditer(self.output):
+                if match.group(2) == self.marker_id:
+                    self.exit_code = int(match.group(1))
+                    self.duration = delay
+                    break
+
+    def replay_chunks(self, marker_id: str) -> List[Tuple[float, bytes]]:
+        """Output chunks with the recorded marker id replaced by marker_id"""
+        output = bytes(self.output)
+        bounds = [end for _, end in self.chunks]
+        if self.marker_id:
+            new_id = marker_id.encode()
+            shift = len(new_id) - len(self.marker_id)
+            if shift:
+                # Move chunk boundaries past each rewritten id
+                for position in [m.start() for m in re.finditer(re.escape(self.marker_id), output)]:
+                    bounds = [end + shift if end > position else end for end in bounds]
+            output = output.replace(self.marker_id, new_id)
+        chunks, start = [], 0
+        for (delay, _), end in zip(self.chunks, bounds):
+            chunks.append((delay, output[start:end]))
+            start = end
+        return chunks
+
+
+class Trace:
+    """A recorded pane session, split into its commands"""
+
+    def __init__(self, events: List[Dict], header: Optional[Dict] = None):
+        self.header = header or {'trace': 1}
+        self.events = events
+        self.preamble = []     # (time, data) printed before the first command
+        self.commands = []
+        for event in events:
+            if 'in' in event:
+                self.commands.append(RecordedCommand(event['in'], event['t']))
+            elif self.commands:
+                data = encode(event['out'])
+                if len(self.commands) > 1 and self.commands[-2].exit_code is None:
+                    # The previous marker can be read after the next command was typed
+                    previous = self.commands[-2]
+                    for match in MARKER.finditer(data):
+                        if match.group(2) == previous.marker_id:
+                            line_end = data.find(b'\n', match.end()) + 1 or len(data)
+                            previous.add_output(event['t'] - previous.offset, data[:line_end])
+                            data = data[line_end:]
+                            break
+                current = self.commands[-1]
+                if data:
+                    current.add_output(event['t'] - current.offset, data)
+            else:
+                self.preamble.append((event['t'], encode(event['out'])))
+
+    @classmethod
+    def load(cls, path: str) -> 'Trace':
+        header, events = None, []
+        with open(path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                if 'trace' in entry:
+                    header = entry
+                else:
+                    events.append(entry)
+        return cls(events, header)
+
+    def save(self, path: str):
+        with open(path, 'w') as f:
+            f.write(json.dumps(self.header) + '\n')
+            for event in self.events:
+                f.write(json.dumps(event) + '\n')
+
+    def summary(self) -> Dict:
+        finished = [command for command in self.commands if command.duration is not None]
+        return {
+            'pane': self.header.get('pane'),
+            'commands': len(self.commands),
+            'finished': len(finished),
+            'output_bytes': sum(len(command.output) for command in self.commands),
+            'chunks': sum(len(command.chunks) for command in self.commands),
+            'durations': {command.command: round(command.duration, 3) for command in finished},
+        }
+
+
+def encode(text: str) -> bytes:
+    return text.encode('utf-8', 'surrogateescape')
+
+
+def decode(data: bytes) -> str:
+    return data.decode('utf-8', 'surrogateescape')
+
+
+def synthetic_trace(specs: Iterable[Tuple[str, int, float, int]], pane: str = 'bottom') -> Trace:
+    """Trace of made-up commands: (command, output lines, duration, exit code) each
+
+    Output lines are spread evenly over the duration, for load tests when no
+    recording is at hand.
+    """
+    prompt = f'ai-workflow-bash:{pane} $ '
+    events = [{'t': 0.0, 'out': prompt}]
+    now = 0.1
+    simulator = phi3.Phi3Simulator()
+    for number, (command, lines, duration, exit_code) in enumerate(specs):
+        marker_id = f'{number:08x}'
+        line = simulator.build_pane_command(command, marker_id)
+        events.append({'t': now, 'in': line})
+        events.append({'t': now + 0.002, 'out': line + '\r\n'})
+        for n in range(lines):
+            events.append({'t': now + duration * (n + 1) / (lines + 1),
+                           'out': f'{command}: output line {n + 1} of {lines}\r\n'})
+        events.append({'t': now + duration, 'out': f'\r\nprogram execution done. exit_code={exit_code} '
+                                                   f'id={marker_id}\r\n{prompt}'})
+        now += duration + 0.1
+    return Trace(events, {'trace': 1, 'pane': pane, 'synthetic': True})
+
+
+class ReplayPane:
+    """A simulated pane: typed lines start recorded commands, output lands in its history"""
+
+    def __init__(self, engine: 'ReplayEngine', name: str, history_limit: int = HISTORY_LIMIT):
+        self.engine = engine
+        self.name = name
+        self.lines = collections.deque(maxlen=history_limit)
+        self.partial = ''
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.next_command = 0
+        self.marker_times = {}    # marker id -> engine time its marker was printed
+        self.bytes_out = 0
+
+    def type_line(self, line: str):
+        """Keys typed into the pane followed by Enter"""
+        match = TYPED_COMMAND.match(line)
+        commands = self.engine.trace.commands
+        recorded = self.engine.by_command.get(match.group(1)) if match else None
+        if recorded is None:
+            recorded = commands[self.next_command % len(commands)]
+            self.next_command += 1
+        marker_id = match.group(2) if match else ''
+        for delay, data in recorded.replay_chunks(marker_id):
+            self.engine.schedule(delay, self, data)
+
+    def write(self, data: bytes):
+        """Output reaching the pane, as tmux would store it in history"""
+        self.bytes_out += len(data)
+        for match in MARKER.finditer(data):
+            self.marker_times.setdefault(match.group(2).decode(), self.engine.clock())
+        text = self.partial + self.decoder.decode(data)
+        cleared = text.rfind(CLEAR_HISTORY)
+        if cleared != -1:
+            # `clear` empties tmux's history too
+            self.lines.clear()
+            text = text[cleared + len(CLEAR_HISTORY):]
+        lines = text.split('\n')
+        self.partial = lines.pop()
+        for line in lines:
+            # Carriage returns overwrite the line, as progress bars do
+            self.lines.append(ANSI_ESCAPE.sub('', line.rstrip('\r').rsplit('\r', 1)[-1]))
+
+    def capture(self) -> str:
+        """Like `capture-pane -p -J -S -`"""
+        current = ANSI_ESCAPE.sub('', self.partial.rsplit('\r', 1)[-1])
+        return '\n'.join(self.lines) + '\n' + current + '\n'
+
+
+class ReplayEngine:
+    """Plays one trace in many panes, on the trace's timing scaled by speed"""
+
+    def __init__(self, trace: Trace, panes: int = 1, speed: float = 1.0,
+                 history_limit: int = HISTORY_LIMIT, clock: Callable[[], float] = time.monotonic,
+                 sinks: Optional[List[Callable[[str, bytes], None]]] = None):
+        if not trace.commands:
+            raise ValueError("Trace has no commands to replay")
+        self.trace = trace
+        self.speed = speed
+        self.clock = clock
+        self.sinks = sinks or []    # callables(pane name, data), e.g. JournalWriter-backed
+        self.by_command = {}
+        for command in trace.commands:
+            self.by_command.setdefault(command.command, command)
+        self.queue = []    # heap of (due, sequence, pane, data)
+        self.sequence = 0
+        self.panes = [ReplayPane(self, f'replay-{n}', history_limit) for n in range(panes)]
+        for pane in self.panes:
+            for offset, data in trace.preamble:
+                self.schedule(offset, pane, data)
+
+    def schedule(self, delay: float, pane: ReplayPane, data: bytes):
+        self.sequence += 1
+        heapq.heappush(self.queue, (self.clock() + delay / self.speed, self.sequence, pane, data))
+
+    def advance(self) -> int:
+        """Deliver every chunk that is due, returning how many were delivered"""
+        now = self.clock()
+        delivered = 0
+        while self.queue and self.queue[0][0] <= now:
+            _, _, pane, data = heapq.heappop(self.queue)
+            pane.write(data)
+            for sink in self.sinks:
+                sink(pane.name, data)
+            delivered += 1
+        return delivered
+
+    def next_due(self) -> Optional[float]:
+        return self.queue[0][0] if self.queue else None
+
+
+class ReplayQueue(phi3.PaneCommandQueue):
+    """PaneCommandQueue driving a replayed pane instead of tmux"""
+
+    def __init__(self, simulator, replay_pane: ReplayPane, pane: str = 'bottom', **kwargs):
+        super().__init__(simulator, pane, **kwargs)
+        self.replay_pane = replay_pane
+
+    def send(self, pane_command: str):
+        self.replay_pane.type_line(pane_command)
+
+    def capture(self) -> str:
+        return self.replay_pane.capture()
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run_load(engine: ReplayEngine, commands_per_pane: int = 3, pipeline_depth: int = 1,
+             poll_interval: float = 0.05, timeout: Optional[float] = None) -> Dict:
+    """Drive every replayed pane through a PaneCommandQueue and measure the driver
+
+    Each pane runs the trace's commands in order. Reports how long a poll
+    round over all panes takes, how long after a marker was printed its
+    command was seen as finished, and whether every result matches the
+    recording.
+    """
+    simulator = phi3.Phi3Simulator()
+    commands = engine.trace.commands
+    queues = []
+    for pane in engine.panes:
+        queue = ReplayQueue(simulator, pane, pane=engine.trace.header.get('pane') or 'bottom',
+                            pipeline_depth=pipeline_depth)
+        for n in range(commands_per_pane):
+            queue.submit(commands[n % len(commands)].command)
+        queues.append(queue)
+
+    expected = {name: recorded.exit_code for name, recorded in engine.by_command.items()}
+    rounds, lags, mismatches = [], [], 0
+    completed = 0
+    start, cpu_start = time.monotonic(), time.process_time()
+    deadline = start + timeout if timeout else None
+    active = list(queues)
+    while active:
+        round_start = time.monotonic()
+        engine.advance()
+        still_active = []
+        for queue in active:
+            for result in queue.pump():
+                completed += 1
+                marker_time = queue.replay_pane.marker_times.get(result['marker_id'])
+                if marker_time is not None:
+                    lags.append(engine.clock() - marker_time)
+                if result['exit_code'] != expected.get(result['command']):
+                    mismatches += 1
+            if queue.pending or queue.in_flight:
+                still_active.append(queue)
+        active = still_active
+        round_end = time.monotonic()
+        rounds.append(round_end - round_start)
+        if deadline and round_end > deadline:
+            break
+        if active:
+            time.sleep(max(0.0, poll_interval - (round_end - round_start)))
+
+    elapsed = time.monotonic() - start
+    return {
+        'panes': len(queues),
+        'commands': len(queues) * commands_per_pane,
+        'completed': completed,
+        'mismatched_exit_codes': mismatches,
+        'unfinished': sum(len(q.pending) + len(q.in_flight) for q in queues),
+        'wall_seconds': round(elapsed, 3),
+        'cpu_seconds': round(time.process_time() - cpu_start, 3),
+        'poll_rounds': len(rounds),
+        'round_seconds': {'p50': percentile(rounds, 0.5), 'p95': percentile(rounds, 0.95),
+                          'max': max(rounds) if rounds else None},
+        'detection_lag_seconds': {'p50': percentile(lags, 0.5), 'p95': percentile(lags, 0.95),
+                                  'max': max(lags) if lags else None},
+        'output_bytes': sum(pane.bytes_out for pane in engine.panes),
+        'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+class RecordingQueue(phi3.PaneCommandQueue):
+    """PaneCommandQueue on a live pane that records what it types and what the pane prints
+
+    Output is read from the pane's pipe-pane stream (see setup-workflow.sh),
+    so every chunk is timestamped as it arrives.
+    """
+
+    def __init__(self, simulator, pane: str, stream_path: str, **kwargs):
+        super().__init__(simulator, pane, **kwargs)
+        self.stream = StreamFollower(stream_path, from_end=True)
+        self.start = time.monotonic()
+        self.events = []
+
+    def read_stream(self) -> bool:
+        """Record output appended since the last read"""
+        data = self.stream.read()
+        if not data:
+            return False
+        self.events.append({'t': round(time.monotonic() - self.start, 4), 'out': decode(data)})
+        return True
+
+    def send(self, pane_command: str):
+        # Output so far belongs before the keystrokes
+        self.read_stream()
+        self.events.append({'t': round(time.monotonic() - self.start, 4), 'in': pane_command})
+        super().send(pane_command)
+
+
+def record(pane: str, commands: List[str], session: str = 'ai-workflow', socket: Optional[str] = None,
+           state_dir: Optional[str] = None, timeout: Optional[float] = None,
+           poll_interval: float = 0.01, settle: float = 0.3) -> Trace:
+    """Run commands in a live pane, recording keystrokes and output timing"""
+    state_dir = state_dir or os.environ.get('AI_WORKFLOW_STATE_DIR', f'/tmp/ai-workflow-{session}')
+    queue = RecordingQueue(phi3.Phi3Simulator(session, socket), pane,
+                           os.path.join(state_dir, f'{pane}.stream'))
+    for command in commands:
+        queue.submit(command)
+    deadline = queue.start + timeout if timeout else None
+    while queue.pending or queue.in_flight:
+        queue.read_stream()
+        queue.pump()
+        if deadline and time.monotonic() > deadline:
+            raise TimeoutError(f"Recording in {pane} pane did not finish in {timeout}s")
+        time.sleep(poll_interval)
+
+    # Pick up the marker and prompt that follow the last command
+    quiet_since = time.monotonic()
+    while time.monotonic() - quiet_since < settle:
+        if queue.read_stream():
+            quiet_since = time.monotonic()
+        time.sleep(poll_interval)
+
+    header = {'trace': 1, 'pane': pane, 'session': session, 'recorded': time.time()}
+    return Trace(queue.events, header)
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ('-h', '--help'):
+        print("Usage: ./pane-replay.py record <trace> <pane> <command>... [--session NAME] [--socket NAME]")
+        print("       ./pane-replay.py info <trace>")
+        print("       ./pane-replay.py load <trace|--synthetic> [--panes N] [--commands N] [--depth N]")
+        print("                             [--speed X] [--poll SECONDS]")
+        print()
+        print("record reads the pane stream in $AI_WORKFLOW_STATE_DIR (see setup-workflow.sh).")
+        return
+
+    command, args = args[0], args[1:]
+    options = {'--session': 'ai-workflow', '--socket': None, '--panes': '1000', '--commands': '3',
+               '--depth': '1', '--speed': '1', '--poll': '0.05'}
+    positional = []
+    while args:
+        flag = args.pop(0)
+        if flag in options and args:
+            options[flag] = args.pop(0)
+        elif flag.startswith('--') and flag != '--synthetic':
+            print(f"Error: unknown or incomplete option {flag}")
+            sys.exit(1)
+        else:
+            positional.append(flag)
+
+    if command == 'record' and len(positional) >= 3:
+        trace = record(positional[1], positional[2:], options['--session'], options['--socket'])
+        trace.save(positional[0])
+        print(json.dumps(trace.summary(), indent=2))
+    elif command == 'info' and positional:
+        print(json.dumps(Trace.load(positional[0]).summary(), indent=2))
+    elif command == 'load' and positional:
+        if positional[0] == '--synthetic':
+            trace = synthetic_trace([('make', 200, 3.0, 0), ('make test', 500, 8.0, 1), ('ls', 5, 0.05, 0)])
+        else:
+            trace = Trace.load(positional[0])
+        engine = ReplayEngine(trace, int(options['--panes']), float(options['--speed']))
+        print(json.dumps(run_load(engine, int(options['--commands']), int(options['--depth']),
+                                  float(options['--poll'])), indent=2))
+    else:
+        print(f"Error: unknown command or missing arguments: {command}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+
+"""
+pane-vt.py - In-process virtual terminals for ai-workflow panes
+Replays each pane's raw output (the `tmux pipe-pane` streams written by
+setup-workflow.sh, or control-mode %output lines) through a small VT100/xterm
+emulator, so "what's on screen", "is the prompt showing" and "last N lines"
+are answered from memory instead of forking `tmux capture-pane` per query.
+
+Screen rows are arrays of code points; scrollback keeps finished rows as
+trimmed strings in a bounded deque. Wide (East Asian W/F, e.g. emoji)
+characters take two cells, like in tmux: the second holds WIDE_TAIL.
+"""
+
+import codecs
+import json
+import os
+import re
+import subprocess
+import sys
+import unicodedata
+from array import array
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from workflow_common import StreamFollower
+
+PANES = ('left', 'top', 'bottom')
+BLANK = ord(' ')
+WIDE_TAIL = 0    # second cell of a wide character, dropped when rendering
+CELL_ENCODING = 'utf-32-le' if sys.byteorder == 'little' else 'utf-32-be'
+
+# Escape sequences and C0 controls; everything between matches is plain text
+TOKEN = re.compile(
+    r'\x1b\[([<=>?]?)([0-9;:]*)[ -/]*([@-~])'        # CSI
+    r'|\x1b\]([^\x07\x1b]*)(?:\x07|\x1b\\)'          # OSC, BEL or ST terminated
+    r'|\x1b[()*+].'                                   # charset designation (ignored)
+    r'|\x1b([^\[\]()*+])'                              # other two-byte escapes
+    r'|([\x00-\x1a\x1c-\x1f\x7f])')                   # C0 controls except ESC
+DEFAULT_PROMPT = re.compile(r'(ai-workflow-bash:\S+ \$|[$#]) ?$')
+
+
+class Terminal:
+    """VT100/xterm screen model: cursor movement, erasing, scroll regions,
+    insert/delete, autowrap and the alternate screen. Colours and other
+    attributes are parsed and dropped."""
+
+    def __init__(self, width: int = 80, height: int = 24, scrollback: int = 2000):
+        self.width = width
+        self.height = height
+        self.scrollback = deque(maxlen=scrollback)
+        self.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+        self.pending = ''          # incomplete escape sequence from the last chunk
+        self.prompt_state = None   # from OSC 133 markers: ready | running | None
+        self.reset()
+
+    def reset(self):
+        self.lines = [self._blank_row() for _ in range(self.height)]
+        self.x = self.y = 0
+        self.wrap_pending = False
+        self.autowrap = True
+        self.cursor_visible = True
+        self.top, self.bottom = 0, self.height - 1
+        self.saved_cursor = (0, 0)
+        self.main_screen = None    # (lines, cursor) while the alternate screen is shown
+
+    def _blank_row(self) -> array:
+        return array('I', [BLANK]) * self.width
+
+    @staticmethod
+    def _row_text(row: array) -> str:
+        return row.tobytes().decode(CELL_ENCODING).replace('\x00', '')
+
+    # ---- input ----
+
+    def feed(self, data: bytes):
+        """Process a chunk of raw pane output"""
+        text = self.pending + self.decoder.decode(data)
+        self.pending = ''
+        position = 0
+        for match in TOKEN.finditer(text):
+            if match.start() > position:
+                self._write(text[position:match.start()])
+            position = match.end()
+            self._token(match)
+
+        rest = text[position:]
+        escape = rest.find('\x1b')
+        if escape != -1 and len(rest) - escape < 256:
+            # Possibly a sequence cut by the read boundary; finish it next time
+            self.pending = rest[escape:]
+            rest = rest[:escape]
+        if rest:
+            self._write(rest)
+
+    def _write(self, text: str):
+        text = text.replace('\x1b', '')
+        if text.isascii():
+            self._write_cells(array('I', map(ord, text)))
+            return
+        # Narrow runs are copied in one go; wide characters need two cells
+        run_start = 0
+        for index, char in enumerate(text):
+            if unicodedata.east_asian_width(char) in ('W', 'F'):
+                if index > run_start:
+                    self._write_cells(array('I', map(ord, text[run_start:index])))
+                self._write_wide(ord(char))
+                run_start = index + 1
+        if run_start < len(text):
+            self._write_cells(array('I', map(ord, text[run_start:])))
+
+    def _write_wide(self, code: int):
+        if self.wrap_pending:
+            self.wrap_pending = False
+            self.x = 0
+            self._index()
+        if self.x == self.width - 1:
+            # No room for both cells: tmux leaves the last cell blank and wraps
+            if not self.autowrap:
+                return
+            self.lines[self.y][self.x] = BLANK
+            self.x = 0
+            self._index()
+        row = self.lines[self.y]
+        row[self.x] = code
+        row[self.x + 1] = WIDE_TAIL
+        self.x += 2
+        if self.x >= self.width:
+            self.x = self.width - 1
+            self.wrap_pending = self.autowrap
+
+    def _write_cells(self, codes: array):
+        start = 0
+        while start < len(codes):
+            if self.wrap_pending:
+                self.wrap_pending = False
+                self.x = 0
+                self._index()
+            row = self.lines[self.y]
+            count = min(self.width - self.x, len(codes) - start)
+            row[self.x:self.x + count] = codes[start:start + count]
+            start += count
+            self.x += count
+            if self.x >= self.width:
+                self.x = self.width - 1
+                if self.autowrap:
+                    self.wrap_pending = True
+                elif start < len(codes):
+                    # No wrap: the rest of the run lands on the last cell
+                    row[self.x] = codes[-1]
+                    break
+
+    def _token(self, match):
+        if match.group(3) is not None:
+            self._csi(match.group(1), match.group(2), match.group(3))
+        elif match.group(4) is not None:
+            self._osc(match.group(4))
+        elif match.group(5) is not None:
+            self._escape(match.group(5))
+        elif match.group(6) is not None:
+            self._control(match.group(6))
+
+    def _control(self, char: str):
+        if char == '\r':
+            self.x = 0
+            self.wrap_pending = False
+        elif char in '\n\x0b\x0c':
+            self._index()
+            self.wrap_pending = False
+        elif char == '\b':
+            self.x = max(0, self.x - 1)
+            self.wrap_pending = False
+        elif char == '\t':
+            self.x = min(self.width - 1, (self.x // 8 + 1) * 8)
+
+    def _escape(self, char: str):
+        if char == '7':
+            self.saved_cursor = (self.x, self.y)
+        elif char == '8':
+            self.x, self.y = self.saved_cursor
+            self.wrap_pending = False
+        elif char == 'D':
+            self._index()
+        elif char == 'E':
+            self.x = 0
+            self._index()
+        elif char == 'M':
+            if self.y == self.top:
+                self._scroll_down(1)
+            elif self.y > 0:
+                self.y -= 1
+        elif char == 'c':
+            self.reset()
+
+    def _osc(self, body: str):
+        if body.startswith('133;'):
+            kind = body[4:5]
+            if kind == 'A':
+                self.prompt_state = 'ready'
+            elif kind == 'C':
+                self.prompt_state = 'running'
+
+    def _csi(self, private: str, params: str, final: str):
+        args = [int(value) if value.isdigit() else 0 for value in params.replace(':', ';').split(';')]
+        first = args[0] or 1   # count-style parameter, 0/absent means 1
+
+        if private == '?':
+            if final in 'hl':
+                self._private_modes(args, final == 'h')
+            return
+        if private:
+            return
+
+        if final == 'A':
+            self.y = max(self.top if self.y >= self.top else 0, self.y - first)
+        elif final == 'B':
+            self.y = min(self.bottom if self.y <= self.bottom else self.height - 1, self.y + first)
+        elif final == 'C':
+            self.x = min(self.width - 1, self.x + first)
+        elif final == 'D':
+            self.x = max(0, self.x - first)
+        elif final == 'E':
+            self.x, self.y = 0, min(self.height - 1, self.y + first)
+        elif final == 'F':
+            self.x, self.y = 0, max(0, self.y - first)
+        elif final in 'G`':
+            self.x = min(self.width - 1, first - 1)
+        elif final == 'd':
+            self.y = min(self.height - 1, first - 1)
+        elif final in 'Hf':
+            row = args[0] or 1
+            column = args[1] if len(args) > 1 and args[1] else 1
+            self.x, self.y = min(self.width - 1, column - 1), min(self.height - 1, row - 1)
+        elif final == 'J':
+            self._erase_display(args[0])
+        elif final == 'K':
+            self._erase_line(args[0])
+        elif final == '@':
+            row = self.lines[self.y]
+            count = min(first, self.width - self.x)
+            row[self.x:] = (self._blank_row()[:count] + row[self.x:])[:self.width - self.x]
+        elif final == 'P':
+            row = self.lines[self.y]
+            count = min(first, self.width - self.x)
+            row[self.x:] = row[self.x + count:] + self._blank_row()[:count]
+        elif final == 'X':
+            count = min(first, self.width - self.x)
+            self.lines[self.y][self.x:self.x + count] = self._blank_row()[:count]
+        elif final == 'L':
+            if self.top <= self.y <= self.bottom:
+                for _ in range(min(first, self.bottom - self.y + 1)):
+                    del self.lines[self.bottom]
+                    self.lines.insert(self.y, self._blank_row())
+                self.x = 0
+        elif final == 'M':
+            if self.top <= self.y <= self.bottom:
+                for _ in range(min(first, self.bottom - self.y + 1)):
+                    del self.lines[self.y]
+                    self.lines.insert(self.bottom, self._blank_row())
+                self.x = 0
+        elif final == 'S':
+            self._scroll_up(first)
+        elif final == 'T':
+            self._scroll_down(first)
+        elif final == 'r':
+            top = (args[0] or 1) - 1
+            bottom = (args[1] if len(args) > 1 and args[1] else self.height) - 1
+            if top < bottom < self.height:
+                self.top, self.bottom = top, bottom
+                self.x = self.y = 0
+        elif final == 's':
+            self.saved_cursor = (self.x, self.y)
+        elif final == 'u':
+            self.x, self.y = self.saved_cursor
+        else:
+            return   # SGR and anything unrecognised
+        self.wrap_pending = False
+
+    def _private_modes(self, modes: List[int], enable: bool):
+        for mode in modes:
+            if mode == 7:
+                self.autowrap = enable
+            elif mode == 25:
+                self.cursor_visible = enable
+            elif mode in (47, 1047, 1049):
+                if enable and self.main_screen is None:
+                    self.main_screen = (self.lines, (self.x, self.y))
+                    self.lines = [self._blank_row() for _ in range(self.height)]
+                elif not enable and self.main_screen is not None:
+                    self.lines, cursor = self.main_screen
+                    self.main_screen = None
+                    if mode == 1049:
+                        self.x, self.y = cursor
+
+    def _erase_display(self, mode: int):
+        if mode == 0:
+            self._erase_line(0)
+            for y in range(self.y + 1, self.height):
+                self.lines[y] = self._blank_row()
+        elif mode == 1:
+            self._erase_line(1)
+            for y in range(self.y):
+                self.lines[y] = self._blank_row()
+        elif mode == 2:
+            if self.main_screen is None:
+                # Like tmux (scroll-on-clear), keep the cleared rows as history
+                rows = self.display()
+                while rows and not rows[-1]:
+                    rows.pop()
+                self.scrollback.extend(rows)
+            self.lines = [self._blank_row() for _ in range(self.height)]
+        elif mode == 3:
+            self.scrollback.clear()
+
+    def _erase_line(self, mode: int):
+        row = self.lines[self.y]
+        if mode == 0:
+            row[self.x:] = self._blank_row()[:self.width - self.x]
+        elif mode == 1:
+            row[:self.x + 1] = self._blank_row()[:self.x + 1]
+        elif mode == 2:
+            self.lines[self.y] = self._blank_row()
+
+    def _index(self):
+        """Line feed: move down, scrolling the region at its bottom margin"""
+        if self.y == self.bottom:
+            self._scroll_up(1)
+        elif self.y < self.height - 1:
+            self.y += 1
+
+    def _scroll_up(self, count: int):
+        for _ in range(min(count, self.bottom - self.top + 1)):
+            row = self.lines.pop(self.top)
+            if self.top == 0 and self.main_screen is None:
+                self.scrollback.append(self._row_text(row).rstrip())
+            self.lines.insert(self.bottom, self._blank_row())
+
+    def _scroll_down(self, count: int):
+        for _ in range(min(count, self.bottom - self.top + 1)):
+            del self.lines[self.bottom]
+            self.lines.insert(self.top, self._blank_row())
+
+    def resize(self, width: int, height: int):
+        """Follow a pane resize: crop or pad rows, keeping the cursor row visible"""
+        for index, row in enumerate(self.lines):
+            self.lines[index] = (row + array('I', [BLANK]) * max(0, width - self.width))[:width]
+        self.width = width
+        while self.y >= height:
+            self.y -= 1
+            self.scrollback.append(self._row_text(self.lines.pop(0)).rstrip())
+        while len(self.lines) > height:
+            self.lines.pop()
+        while len(self.lines) < height:
+            self.lines.append(self._blank_row())
+        self.height = height
+        self.top, self.bottom = 0, height - 1
+        self.x = min(self.x, width - 1)
+
+    # ---- queries ----
+
+    def display(self) -> List[str]:
+        """Screen rows as text, trailing blanks trimmed"""
+        return [self._row_text(row).rstrip() for row in self.lines]
+
+    def cursor(self) -> Tuple[int, int]:
+        return self.x, self.y
+
+    def last_lines(self, count: int) -> List[str]:
+        """Last `count` lines of scrollback plus screen, ignoring blank rows below the output"""
+        rows = self.display()
+        while rows and not rows[-1] and len(rows) > self.y + 1:
+            rows.pop()
+        history = list(self.scrollback)[-count:] if count > len(rows) else []
+        return (history + rows)[-count:]
+
+    def prompt_showing(self, pattern=DEFAULT_PROMPT) -> bool:
+        """True when the shell waits for input
+
+        OSC 133 markers (shell-integration.sh) are trusted when present;
+        otherwise the text before the cursor is matched against `pattern`.
+        """
+        if self.prompt_state is not None:
+            return self.prompt_state == 'ready'
+        before_cursor = self._row_text(self.lines[self.y][:self.x])
+        return re.search(pattern, before_cursor) is not None
+
+
+class PaneTerminals:
+    """A Terminal per pane, fed from the pipe-pane streams in a state dir"""
+
+    def __init__(self, state_dir: Optional[str] = None, sizes: Optional[Dict[str, Tuple[int, int]]] = None,
+                 scrollback: int = 2000):
+        self.state_dir = state_dir or os.environ.get(
+            'AI_WORKFLOW_STATE_DIR', '/tmp/ai-workflow-ai-workflow')
+        self.sizes = sizes or {}
+        self.scrollback = scrollback
+        self.followers = {}    # pane -> StreamFollower of its stream
+        self.terminals = {}    # pane -> Terminal
+        self.pane_ids = {}     # control-mode pane id (%N) -> pane name
+
+    @classmethod
+    def from_tmux(cls, session: str = 'ai-workflow', socket: Optional[str] = None,
+                  state_dir: Optional[str] = None) -> 'PaneTerminals':
+        """Size the terminals from the live session (one tmux call, at start only)"""
+        argv = (['tmux', '-L', socket] if socket else ['tmux']) + [
+            'list-panes', '-t', f'{session}:0', '-F', '#{pane_index} #{pane_id} #{pane_width} #{pane_height}']
+        result = subprocess.run(argv, capture_output=True, text=True, check=True)
+        terminals = cls(state_dir or os.environ.get('AI_WORKFLOW_STATE_DIR', f'/tmp/ai-workflow-{session}'))
+        for line in result.stdout.split('\n'):
+            if not line.strip():
+                continue
+            index, pane_id, width, height = line.split()
+            name = PANES[int(index)] if int(index) < len(PANES) else index
+            terminals.sizes[name] = (int(width), int(height))
+            terminals.pane_ids[pane_id] = name
+        return terminals
+
+    def terminal(self, pane: str) -> Terminal:
+        if pane not in self.terminals:
+            width, height = self.sizes.get(pane, (80, 24))
+            self.terminals[pane] = Terminal(width, height, self.scrollback)
+        return self.terminals[pane]
+
+    def feed(self, pane: str, data: bytes):
+        self.terminal(pane).feed(data)
+
+    def feed_control_line(self, line: bytes):
+        """Feed one `%output %N data` line from a tmux control-mode client"""
+        if not line.startswith(b'%output '):
+            return
+        _, pane_id, data = (line.rstrip(b'\n').split(b' ', 2) + [b''])[:3]
+        pane = self.pane_ids.get(pane_id.decode(), pane_id.decode())
+        self.feed(pane, re.sub(rb'\\([0-7]{3})', lambda match: bytes([int(match.group(1), 8)]), data))
+
+    def poll(self):
+        """Apply whatever was appended to each pane stream since the last poll"""
+        try:
+            names = os.listdir(self.state_dir)
+        except FileNotFoundError:
+            return
+        for name in names:
+            if not name.endswith('.stream'):
+                continue
+            pane = name[:-len('.stream')]
+            follower = self.followers.get(pane)
+            if follower is None:
+                follower = self.followers[pane] = StreamFollower(os.path.join(self.state_dir, name))
+            data = follower.read()
+            if follower.restarted:
+                # Stream was truncated or replaced; rebuild from scratch
+                self.terminals.pop(pane, None)
+            if data:
+                self.feed(pane, data)
+
+    def screen(self, pane: str) -> List[str]:
+        self.poll()
+        return self.terminal(pane).display()
+
+    def read_screen(self, pane: str) -> Tuple[List[str], Tuple[int, int]]:
+        """(rows, cursor), the reader signature ScreenTracker accepts"""
+        self.poll()
+        terminal = self.terminal(pane)
+        return terminal.display(), terminal.cursor()
+
+    def last_lines(self, pane: str, count: int = 20) -> List[str]:
+        self.poll()
+        return self.terminal(pane).last_lines(count)
+
+    def prompt_showing(self, pane: str) -> bool:
+        self.poll()
+        return self.terminal(pane).prompt_showing()
+
+
+def main():
+    args = sys.argv[1:]
+    if args and args[0] in ('-h', '--help'):
+        print("Usage: ./pane-vt.py [pane] [--lines N] [--session NAME] [--socket S]")
+        print()
+        print("Replays the pane streams in $AI_WORKFLOW_STATE_DIR (default")
+        print("/tmp/ai-workflow-<session>) and prints each pane's screen, or the")
+        print("last N lines of one pane, with its prompt state.")
+        return
+
+    options = {'--lines': None, '--session': 'ai-workflow', '--socket': None}
+    panes = []
+    while args:
+        flag = args.pop(0)
+        if flag in options and args:
+            options[flag] = args.pop(0)
+        elif flag.startswith('--'):
+            print(f"Error: unknown or incomplete option {flag}")
+            sys.exit(1)
+        else:
+            panes.append(flag)
+
+    terminals = PaneTerminals.from_tmux(options['--session'], options['--socket'])
+    terminals.poll()
+    report = {}
+    for pane in panes or sorted(terminals.terminals):
+        terminal = terminals.terminal(pane)
+        lines = terminal.last_lines(int(options['--lines'])) if options['--lines'] else terminal.display()
+        report[pane] = {'prompt_showing': terminal.prompt_showing(),
+                        'cursor': list(terminal.cursor()), 'lines': lines}
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
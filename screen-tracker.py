@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+
+r"""
+screen-tracker.py - Screen-diff monitoring for interactive panes
+Keeps the last screen seen in each pane and reports only the rows that changed
+since then (with row numbers and the cursor position), so babysitting a REPL,
+`mysql` session or dev server forwards a line or two instead of a full screen.
+
+    ./screen-tracker.py top                        # full screen, then diffs with --watch
+    ./screen-tracker.py top --until 'mysql>\s*$'   # wait until the screen matches
+"""
+
+import json
+import re
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+PANES = ('left', 'top', 'bottom')
+
+# A screen as (rows, (cursor_x, cursor_y))
+Screen = Tuple[List[str], Tuple[int, int]]
+
+
+class ScreenTracker:
+    """Per-pane screen snapshots and row-level diffs between them
+
+    Screens are read with one tmux call per poll (cursor and contents batched
+    with `\\;`). Pass `reader` to take screens from elsewhere, e.g. an
+    in-process terminal fed by pipe-pane.
+    """
+
+    def __init__(self, session: str = 'ai-workflow', socket: Optional[str] = None,
+                 reader: Optional[Callable[[str], Screen]] = None):
+        self.session = session
+        self.socket = socket
+        self.reader = reader or self.read_screen
+        self.screens = {}    # pane -> last Screen reported
+
+    def target(self, pane: str) -> str:
+        """tmux target for a pane name (other targets pass through)"""
+        if pane in PANES:
+            return f'{self.session}:0.{PANES.index(pane)}'
+        return pane
+
+    def read_screen(self, pane: str) -> Screen:
+        target = self.target(pane)
+        argv = (['tmux', '-L', self.socket] if self.socket else ['tmux']) + [
+            'display-message', '-p', '-t', target, '#{cursor_x} #{cursor_y} #{pane_height}', ';',
+            'capture-pane', '-p', '-t', target]
+        result = subprocess.run(argv, capture_output=True, text=True, check=True)
+        header, _, body = result.stdout.partition('\n')
+        cursor_x, cursor_y, height = (int(value) for value in header.split())
+        rows = body.split('\n')[:height]
+        rows += [''] * (height - len(rows))
+        return [row.rstrip() for row in rows], (cursor_x, cursor_y)
+
+    def changes(self, pane: str) -> Dict:
+        """Rows that changed since the last call for this pane
+
+        The first call (or one after the pane was resized) reports every
+        non-blank row with `full` set.
+        """
+        rows, cursor = self.reader(pane)
+        previous = self.screens.get(pane)
+        self.screens[pane] = (rows, cursor)
+
+        if previous is None or len(previous[0]) != len(rows):
+            changed = [[number, text] for number, text in enumerate(rows) if text]
+            full = True
+        else:
+            changed = [[number, text] for number, (old, text) in enumerate(zip(previous[0], rows))
+                       if old != text]
+            full = False
+
+        return {
+            'pane': pane,
+            'full': full,
+            'height': len(rows),
+            'rows': changed,
+            'cursor': list(cursor),
+            'cursor_moved': previous is None or previous[1] != cursor,
+        }
+
+    def screen(self, pane: str) -> List[str]:
+        """Last screen seen for the pane (read one if there is none yet)"""
+        if pane not in self.screens:
+            self.changes(pane)
+        return list(self.screens[pane][0])
+
+    def reset(self, pane: Optional[str] = None):
+        """Forget snapshots so the next call reports full screens"""
+        if pane is None:
+            self.screens.clear()
+        else:
+            self.screens.pop(pane, None)
+
+    def wait_for_change(self, pane: str, pattern: Optional[str] = None,
+                        timeout: float = 10.0, interval: float = 0.1) -> Optional[Dict]:
+        """Block until the screen changes, or (with `pattern`) until it matches
+
+        Returns the changes not yet reported, merged across polls, or None on
+        timeout. The live screen is read first, so one that already matches
+        `pattern` returns at once, but a stale snapshot does not.
+        """
+        regex = re.compile(pattern, re.MULTILINE) if pattern else None
+        first = pane not in self.screens
+        diff = self.changes(pane)
+        # A first read is the baseline, not a change
+        merged = {} if first else dict(diff['rows'])
+        cursor_moved = not first and diff['cursor_moved']
+        diff['full'] = diff['full'] and not first
+
+        deadline = time.time() + timeout
+        while True:
+            if regex:
+                done = regex.search('\n'.join(self.screens[pane][0])) is not None
+            else:
+                done = bool(merged) or cursor_moved
+            if done:
+                diff['rows'] = [[number, merged[number]] for number in sorted(merged)]
+                diff['cursor_moved'] = cursor_moved
+                return diff
+            if time.time() >= deadline:
+                return None
+            time.sleep(interval)
+            diff = self.changes(pane)
+            if diff['full']:
+                merged.clear()
+            merged.update((number, text) for number, text in diff['rows'])
+            cursor_moved = cursor_moved or diff['cursor_moved']
+
+
+def main():
+    args = sys.argv[1:]
+    if not args or args[0] in ('-h', '--help'):
+        print("Usage: ./screen-tracker.py <pane> [--watch] [--until REGEX] [--timeout S]")
+        print("                                  [--session NAME] [--socket S]")
+        print()
+        print("Prints the pane's screen as JSON rows. --watch prints only changed rows")
+        print("as they happen; --until waits for the screen to match REGEX.")
+        return
+
+    options = {'--until': None, '--timeout': '10', '--session': 'ai-workflow', '--socket': None}
+    watch = '--watch' in args
+    args = [arg for arg in args if arg != '--watch']
+    pane = args.pop(0)
+    while args:
+        flag = args.pop(0)
+        if flag not in options or not args:
+            print(f"Error: unknown or incomplete option {flag}")
+            sys.exit(1)
+        options[flag] = args.pop(0)
+
+    tracker = ScreenTracker(options['--session'], options['--socket'])
+    if options['--until']:
+        diff = tracker.wait_for_change(pane, options['--until'], float(options['--timeout']))
+        if diff is None:
+            print(f"Timed out waiting for {options['--until']!r}")
+            sys.exit(1)
+        print(json.dumps(diff))
+        return
+
+    print(json.dumps(tracker.changes(pane)), flush=True)
+    if not watch:
+        return
+    try:
+        while True:
+            diff = tracker.wait_for_change(pane, timeout=60)
+            if diff is not None:
+                print(json.dumps(diff), flush=True)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -4,9 +4,21 @@
 # Creates or attaches to the ai-workflow tmux session
 # Supports both native and Docker execution modes
 
-SESSION_NAME="ai-workflow"
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+SESSION_NAME=${AI_WORKFLOW_SESSION:-ai-workflow}
 DOCKER_MODE=${AI_WORKFLOW_DOCKER:-true}  # Default to Docker mode
-CONTAINER_NAME="ai-workflow-dev"
+CONTAINER_NAME=${AI_WORKFLOW_CONTAINER:-ai-workflow-dev}
+TMUX_SOCKET=${AI_WORKFLOW_SOCKET:-}      # tmux -L socket name, empty = default server
+IMAGE_NAME="ai-workflow:latest"
+
+# Warm pool of prebuilt containers claimed when a new container is needed
+POOL_SIZE=${AI_WORKFLOW_POOL_SIZE:-0}
+POOL_PREFIX="${CONTAINER_NAME}-pool"
+
+# Cached image/container IDs and credential fingerprint from the last setup
+STATE_CACHE_DIR="${XDG_CACHE_HOME:-$HOME/.cache}/ai-workflow"
+STATE_CACHE_FILE="$STATE_CACHE_DIR/docker-state-$CONTAINER_NAME"
 
 # Colors for output
 RED='\033[0;31m'
@@ -63,7 +75,7 @@ check_docker_compose() {
 
 # Function to build Docker image if needed
 build_docker_image() {
-    local image_name="ai-workflow:latest"
+    local image_name="$IMAGE_NAME"
     
     print_status "Checking if Docker image exists..."
     
@@ -82,12 +94,174 @@ build_docker_image() {
     return 0
 }
 
-# Function to start Docker container
-start_docker_container() {
-    local image_name="ai-workflow:latest"
+# Function to compute a fingerprint of the local inputs to the container
+# (Dockerfile, workspace path and AWS credential files). Missing files are
+# hashed as such so that adding or removing one changes the fingerprint.
+local_fingerprint() {
+    local aws_source_dir="${HOME}/.aws"
+    local file
+    
+    {
+        echo "workspace=$(pwd)"
+        for file in Dockerfile "$aws_source_dir/config" "$aws_source_dir/credentials"; do
+            if [ -f "$file" ]; then
+                echo "$file=$(cksum < "$file")"
+            else
+                echo "$file=missing"
+            fi
+        done
+    } | cksum | cut -d' ' -f1
+}
+
+# Function to read a key from the cached Docker state file
+read_state_cache() {
+    local key=$1
+    
+    [ -f "$STATE_CACHE_FILE" ] || return 1
+    sed -n "s/^$key=//p" "$STATE_CACHE_FILE"
+}
+
+# Function to record the current image ID, container ID and local
+# fingerprint so the next setup can skip inspection and copying
+write_state_cache() {
+    local container_state
+    
+    container_state=$(docker inspect --type container --format '{{.Id}} {{.Image}}' "$CONTAINER_NAME" 2>/dev/null) || return 1
+    
+    mkdir -p "$STATE_CACHE_DIR"
+    {
+        echo "container_id=${container_state%% *}"
+        echo "image_id=${container_state#* }"
+        echo "fingerprint=$(local_fingerprint)"
+    } > "$STATE_CACHE_FILE"
+}
+
+# Function to check whether the cached Docker state is still valid
+# Costs one docker inspect of both the container and $IMAGE_NAME: the
+# container must still be running with the cached ID and image, that image
+# must still be the current $IMAGE_NAME (not replaced by a rebuild), and
+# the local fingerprint must be unchanged.
+docker_state_is_cached() {
+    local cached_container cached_image cached_fingerprint inspected
+    local container_id container_image running image_id
+    
+    cached_container=$(read_state_cache container_id) || return 1
+    cached_image=$(read_state_cache image_id)
+    cached_fingerprint=$(read_state_cache fingerprint)
+    
+    if [ -z "$cached_container" ] || [ "$cached_fingerprint" != "$(local_fingerprint)" ]; then
+        return 1
+    fi
+    
+    # Images have no .State, so their line is just the ID
+    inspected=$(docker inspect --format '{{.Id}}{{if .State}} {{.Image}} {{.State.Running}}{{end}}' \
+        "$CONTAINER_NAME" "$IMAGE_NAME" 2>/dev/null) || return 1
+    { read -r container_id container_image running; read -r image_id; } <<< "$inspected"
+    [ "$container_id $container_image $running" = "$cached_container $cached_image true" ] && \
+        [ "$image_id" = "$cached_image" ]
+}
+
+# Function to copy AWS config and credentials into the container
+copy_aws_credentials() {
     local aws_source_dir="${HOME}/.aws"  # Default to current user's .aws directory
     local aws_dest_dir="/home/developer/.aws"
-    local current_user=$(whoami)
+    
+    # Ensure .aws directory exists in container
+    docker exec "$CONTAINER_NAME" mkdir -p "$aws_dest_dir" || true
+    
+    # Copy AWS config if it exists
+    if [ -f "$aws_source_dir/config" ]; then
+        docker cp "$aws_source_dir/config" "$CONTAINER_NAME:$aws_dest_dir/config"
+        print_status "Copied AWS config to container"
+    else
+        print_warning "No AWS config file found at $aws_source_dir/config"
+    fi
+    
+    # Copy AWS credentials if they exist
+    if [ -f "$aws_source_dir/credentials" ]; then
+        docker cp "$aws_source_dir/credentials" "$CONTAINER_NAME:$aws_dest_dir/credentials"
+        print_status "Copied AWS credentials to container"
+    else
+        print_warning "No AWS credentials file found at $aws_source_dir/credentials"
+    fi
+    
+    # Set correct permissions inside the container
+    docker exec "$CONTAINER_NAME" bash -c "
+        chown -R developer:developer $aws_dest_dir
+        chmod 700 $aws_dest_dir
+        chmod 600 $aws_dest_dir/config $aws_dest_dir/credentials 2>/dev/null || true
+    "
+}
+
+# Function to run a new ai-workflow container with the standard mounts
+run_workflow_container() {
+    local name=$1
+    shift
+    local run_args=(
+        -d
+        --name "$name"
+        --network host
+        -v "$(pwd):/workspace"
+        -e TERM=xterm-256color
+        -e AI_WORKFLOW_MODE=docker
+        --stdin --tty
+    )
+    
+    # Optional read-only mounts, only when present on the host
+    if [ -f "$HOME/.gitconfig" ]; then
+        run_args+=(-v "$HOME/.gitconfig:/home/developer/.gitconfig:ro")
+    fi
+    if [ -d "$HOME/.ssh" ]; then
+        run_args+=(-v "$HOME/.ssh:/home/developer/.ssh:ro")
+    fi
+    
+    docker run "${run_args[@]}" "$@" "$IMAGE_NAME" sleep infinity > /dev/null
+}
+
+# Function to claim a prebuilt container from the warm pool
+# The pool container is renamed to $CONTAINER_NAME; fails if none is ready.
+# Pool containers mount the directory that refilled the pool, so only those
+# labelled with the current workspace are claimed.
+claim_pool_container() {
+    local target_image_id=$1
+    local pool_container
+    
+    pool_container=$(docker ps \
+        --filter "name=^${POOL_PREFIX}-" \
+        --filter "label=ai-workflow.image=$target_image_id" \
+        --filter "label=ai-workflow.workspace=$(pwd)" \
+        --format '{{.Names}}' | head -n 1)
+    
+    [ -n "$pool_container" ] || return 1
+    
+    print_status "Claiming warm container $pool_container..."
+    docker rename "$pool_container" "$CONTAINER_NAME"
+}
+
+# Function to top the warm pool up to $POOL_SIZE running containers for the
+# current workspace. Pool containers built from an outdated image are removed
+refill_pool() {
+    local target_image_id pool_container pool_count
+    
+    [ "$POOL_SIZE" -gt 0 ] 2>/dev/null || return 0
+    target_image_id=$(docker inspect --format='{{.Id}}' "$IMAGE_NAME" 2>/dev/null) || return 1
+    
+    for pool_container in $(docker ps -a --filter "name=^${POOL_PREFIX}-" --format '{{.Names}} {{.Label "ai-workflow.image"}}' | awk -v id="$target_image_id" '$2 != id {print $1}'); do
+        docker rm -f "$pool_container" > /dev/null
+    done
+    
+    pool_count=$(docker ps --filter "name=^${POOL_PREFIX}-" \
+        --filter "label=ai-workflow.workspace=$(pwd)" --format '{{.Names}}' | wc -l)
+    while [ "$pool_count" -lt "$POOL_SIZE" ]; do
+        run_workflow_container "${POOL_PREFIX}-$$-$RANDOM" --label "ai-workflow.image=$target_image_id" \
+            --label "ai-workflow.workspace=$(pwd)" || return 1
+        pool_count=$((pool_count + 1))
+    done
+}
+
+# Function to start Docker container
+start_docker_container() {
+    local image_name="$IMAGE_NAME"
     
     # Check if container is already running
     if docker ps --format "table {{.Names}}" | grep -q "^${CONTAINER_NAME}$"; then
@@ -104,6 +278,12 @@ start_docker_container() {
             # Continue to create new container below
         else
             print_status "Container is using current image"
+            
+            # Refresh credentials, which may have changed since the cache was written
+            if [ "$(read_state_cache fingerprint)" != "$(local_fingerprint)" ]; then
+                print_status "Updating AWS credentials in running container..."
+                copy_aws_credentials
+            fi
             return 0
         fi
     fi
@@ -124,55 +304,27 @@ start_docker_container() {
             
             # Copy AWS credentials after container is started
             print_status "Updating AWS credentials in running container..."
-            
-            # Ensure .aws directory exists in container
-            docker exec "$CONTAINER_NAME" mkdir -p "$aws_dest_dir" || true
-            
-            # Copy AWS config if it exists
-            if [ -f "$aws_source_dir/config" ]; then
-                docker cp "$aws_source_dir/config" "$CONTAINER_NAME:$aws_dest_dir/config"
-                print_status "Copied AWS config to container"
-            else
-                print_warning "No AWS config file found at $aws_source_dir/config"
-            fi
-            
-            # Copy AWS credentials if they exist
-            if [ -f "$aws_source_dir/credentials" ]; then
-                docker cp "$aws_source_dir/credentials" "$CONTAINER_NAME:$aws_dest_dir/credentials"
-                print_status "Copied AWS credentials to container"
-            else
-                print_warning "No AWS credentials file found at $aws_source_dir/credentials"
-            fi
-            
-            # Set correct permissions inside the container
-            docker exec "$CONTAINER_NAME" bash -c "
-                chown -R developer:developer $aws_dest_dir
-                chmod 700 $aws_dest_dir
-                chmod 600 $aws_dest_dir/config $aws_dest_dir/credentials 2>/dev/null || true
-            "
+            copy_aws_credentials
             
             return 0
         fi
     fi
     
-    # Create and start new container
-    print_status "Creating and starting new container $CONTAINER_NAME..."
+    # Create and start new container, preferring a warm one from the pool
+    local target_image_id=$(docker inspect --format='{{.Id}}' "$image_name" 2>/dev/null)
     
-    # Use docker-compose if available, otherwise use docker run
-    if check_docker_compose; then
-        $DOCKER_COMPOSE_CMD up -d
+    if [ "$POOL_SIZE" -gt 0 ] 2>/dev/null && claim_pool_container "$target_image_id"; then
+        :
     else
-        docker run -d \
-            --name "$CONTAINER_NAME" \
-            --network host \
-            -v "$(pwd):/workspace" \
-            -v "$HOME/.gitconfig:/home/developer/.gitconfig:ro" 2>/dev/null || true \
-            -v "$HOME/.ssh:/home/developer/.ssh:ro" 2>/dev/null || true \
-            -e TERM=xterm-256color \
-            -e AI_WORKFLOW_MODE=docker \
-            --stdin --tty \
-            "$image_name" \
-            sleep infinity
+        print_status "Creating and starting new container $CONTAINER_NAME..."
+        
+        # Use docker-compose if available (it only knows the default container
+        # name), otherwise use docker run
+        if [ "$CONTAINER_NAME" = "ai-workflow-dev" ] && check_docker_compose; then
+            $DOCKER_COMPOSE_CMD up -d
+        else
+            run_workflow_container "$CONTAINER_NAME"
+        fi
     fi
     
     if [ $? -eq 0 ]; then
@@ -180,33 +332,13 @@ start_docker_container() {
         
         # Copy AWS credentials after container is created
         print_status "Setting up AWS credentials in new container..."
+        copy_aws_credentials
         
-        # Ensure .aws directory exists in container
-        docker exec "$CONTAINER_NAME" mkdir -p "$aws_dest_dir" || true
-        
-        # Copy AWS config if it exists
-        if [ -f "$aws_source_dir/config" ]; then
-            docker cp "$aws_source_dir/config" "$CONTAINER_NAME:$aws_dest_dir/config"
-            print_status "Copied AWS config to container"
-        else
-            print_warning "No AWS config file found at $aws_source_dir/config"
-        fi
-        
-        # Copy AWS credentials if they exist
-        if [ -f "$aws_source_dir/credentials" ]; then
-            docker cp "$aws_source_dir/credentials" "$CONTAINER_NAME:$aws_dest_dir/credentials"
-            print_status "Copied AWS credentials to container"
-        else
-            print_warning "No AWS credentials file found at $aws_source_dir/credentials"
+        # Replace the claimed pool container in the background
+        if [ "$POOL_SIZE" -gt 0 ] 2>/dev/null; then
+            refill_pool > /dev/null 2>&1 &
         fi
         
-        # Set correct permissions inside the container
-        docker exec "$CONTAINER_NAME" bash -c "
-            chown -R developer:developer $aws_dest_dir
-            chmod 700 $aws_dest_dir
-            chmod 600 $aws_dest_dir/config $aws_dest_dir/credentials 2>/dev/null || true
-        "
-        
         return 0
     else
         print_error "Failed to start container"
@@ -214,44 +346,178 @@ start_docker_container() {
     fi
 }
 
-# Function to set up custom prompt in a pane
-setup_pane_prompt() {
-    local pane_name=$1
-    local pane_target=$2
-    local execution_context=$3
+# Function to prepare the Docker environment (image, container, credentials)
+# Skips all inspection and copying when the cached state is still valid
+prepare_docker_environment() {
+    if docker_state_is_cached; then
+        print_status "Container state unchanged since last setup, skipping checks"
+        return 0
+    fi
     
-    print_status "Setting up prompt for $pane_name pane..."
+    # Check Docker availability
+    if ! check_docker; then
+        return 2
+    fi
+    
+    # Build image and start container
+    if ! build_docker_image; then
+        print_error "Failed to prepare Docker environment"
+        return 1
+    fi
+    
+    if ! start_docker_container; then
+        print_error "Failed to start Docker container"
+        return 1
+    fi
+    
+    write_state_cache
+    return 0
+}
+
+# Function to run a tmux command in the given execution context
+run_tmux() {
+    local execution_context=$1
+    shift
+    
+    local socket_args=()
+    
+    if [ -n "$TMUX_SOCKET" ]; then
+        socket_args=(-L "$TMUX_SOCKET")
+    fi
     
     if [ "$execution_context" = "docker" ]; then
-        # Set the custom PS1 prompt with Docker indicator
-        tmux send-keys -t "$pane_target" "export PS1='ai-workflow-bash:$pane_name(🐳) \$ '" Enter
+        docker exec "$CONTAINER_NAME" tmux "${socket_args[@]}" "$@"
     else
-        # Set the custom PS1 prompt for native execution
-        tmux send-keys -t "$pane_target" "export PS1='ai-workflow-bash:$pane_name \$ '" Enter
+        tmux "${socket_args[@]}" "$@"
     fi
+}
+
+# Function to map a host path inside the workspace to the same file in the
+# container, where the workspace is mounted at /workspace; fails outside it
+container_path() {
+    local host_path=$1
+    local workspace
+    workspace=$(pwd)
     
-    # Clear the screen for a clean start
-    tmux send-keys -t "$pane_target" "clear" Enter
+    case "$host_path" in
+        "$workspace") echo "/workspace" ;;
+        "$workspace"/*) echo "/workspace/${host_path#"$workspace"/}" ;;
+        *) return 1 ;;
+    esac
+}
+
+# Function to print the host directory holding the pane streams and journal
+# Docker panes can only write it through the workspace mount, so there it
+# defaults to .ai-workflow/<session> in the workspace
+host_state_dir() {
+    local execution_context=$1
     
-    # Send a comment to help identify the pane
+    if [ -n "$AI_WORKFLOW_STATE_DIR" ]; then
+        echo "$AI_WORKFLOW_STATE_DIR"
+    elif [ "$execution_context" = "docker" ]; then
+        echo "$(pwd)/.ai-workflow/$SESSION_NAME"
+    else
+        echo "/tmp/ai-workflow-$SESSION_NAME"
+    fi
+}
+
+# Function to record where the panes run in the state directory
+# phi3-simulator.py reads panes.json to type paths the panes can open:
+# Docker panes see host paths under the workspace at /workspace
+write_pane_context() {
+    local execution_context=$1
+    
+    mkdir -p "$SESSION_STATE_DIR" || return 1
     if [ "$execution_context" = "docker" ]; then
-        tmux send-keys -t "$pane_target" "# $pane_name pane ready for ai-workflow (Docker: Ubuntu)" Enter
+        printf '{"context": "docker", "workspace": "%s", "mount": "/workspace"}\n' "$(pwd)"
     else
-        tmux send-keys -t "$pane_target" "# $pane_name pane ready for ai-workflow (Native: $(uname -s))" Enter
+        printf '{"context": "native"}\n'
+    fi > "$SESSION_STATE_DIR/panes.json"
+}
+
+# Function to build the session bootstrap as a single tmux command batch
+# Commands are chained with ';' so the whole layout (panes, mouse mode,
+# prompts) is applied by one tmux invocation, i.e. one docker exec in
+# Docker mode instead of one per step.
+# Result is stored in the SESSION_BATCH array, and the host directory the
+# panes stream into in SESSION_STATE_DIR.
+build_session_batch() {
+    local execution_context=$1
+    local indicator=""
+    local banner="Native: $(uname -s)"
+    local pane_names=("left" "top" "bottom")
+    local state_dir
+    local integration_script="$SCRIPT_DIR/shell-integration.sh"
+    local journal_script="$SCRIPT_DIR/pane-journal.py"
+    local i
+    
+    state_dir=$(host_state_dir "$execution_context")
+    SESSION_STATE_DIR=$state_dir
+    if [ "$execution_context" = "docker" ]; then
+        indicator="(🐳)"
+        banner="Docker: Ubuntu"
+        # Paths as the container sees them through the workspace mount
+        if ! state_dir=$(container_path "$state_dir"); then
+            print_warning "AI_WORKFLOW_STATE_DIR is outside the workspace; Docker panes use .ai-workflow/$SESSION_NAME"
+            state_dir="/workspace/.ai-workflow/$SESSION_NAME"
+            SESSION_STATE_DIR="$(pwd)/.ai-workflow/$SESSION_NAME"
+        fi
+        if ! integration_script=$(container_path "$integration_script") || \
+           ! journal_script=$(container_path "$journal_script"); then
+            # The scripts are only in the container when setup runs from (a
+            # parent of) their directory
+            print_warning "Readiness signaling and the output journal are off: $SCRIPT_DIR is not in the workspace"
+            integration_script=""
+            journal_script=""
+        fi
     fi
+    
+    # Pane 0 = left, Pane 1 = top-right, Pane 2 = bottom-right
+    SESSION_BATCH=(
+        new-session -d -s "$SESSION_NAME" \;
+        split-window -h -t "$SESSION_NAME" \;
+        split-window -v -t "$SESSION_NAME:0.1" \;
+        set-option -t "$SESSION_NAME" mouse on \;
+        run-shell "mkdir -p '$state_dir'"
+    )
+    
+    # Readiness stream, prompt, shell integration, clear and ready comment
+    # for each pane; pane-journal.py keeps the output in bounded segments
+    # under journal/ and in the capped <pane>.stream files that
+    # pane-listener.py and pane-vt.py follow
+    for i in 0 1 2; do
+        local pane_name=${pane_names[$i]}
+        if [ -n "$journal_script" ]; then
+            SESSION_BATCH+=(
+                \; pipe-pane -O -t "$SESSION_NAME:0.$i"
+                "python3 '$journal_script' record '$state_dir/journal' $pane_name --stream '$state_dir/$pane_name.stream'"
+            )
+        fi
+        SESSION_BATCH+=(
+            \; send-keys -t "$SESSION_NAME:0.$i"
+            "export PS1='ai-workflow-bash:$pane_name$indicator \$ '" Enter
+        )
+        if [ -n "$integration_script" ]; then
+            SESSION_BATCH+=("source '$integration_script'" Enter)
+        fi
+        SESSION_BATCH+=(
+            "clear" Enter
+            "# $pane_name pane ready for ai-workflow ($banner)" Enter
+        )
+    done
+    
+    SESSION_BATCH+=(\; select-pane -t "$SESSION_NAME:0.0")
 }
 
 # Function to create tmux session
 create_tmux_session() {
     local execution_context=$1
-    local tmux_command=""
     
     if [ "$execution_context" = "docker" ]; then
-        tmux_command="docker exec -it $CONTAINER_NAME"
         print_status "Creating tmux session inside Docker container..."
         
         # Check AWS configuration after container starts
-        $tmux_command bash -c 'if [ -f ~/.aws/credentials ]; then 
+        docker exec "$CONTAINER_NAME" bash -c 'if [ -f ~/.aws/credentials ]; then 
             echo "AWS Credentials found:"; 
             aws configure list; 
         else 
@@ -261,53 +527,43 @@ create_tmux_session() {
         print_status "Creating native tmux session..."
     fi
     
-    # Create new session (detached)
-    if [ "$execution_context" = "docker" ]; then
-        $tmux_command tmux new-session -d -s "$SESSION_NAME"
-    else
-        tmux new-session -d -s "$SESSION_NAME"
-    fi
+    # Create the session, layout and prompts in one tmux invocation
+    build_session_batch "$execution_context"
+    run_tmux "$execution_context" "${SESSION_BATCH[@]}" || return 1
+    write_pane_context "$execution_context"
     
-    # Split horizontally (left and right)
-    if [ "$execution_context" = "docker" ]; then
-        $tmux_command tmux split-window -h -t "$SESSION_NAME"
-        # Split the right pane vertically (top and bottom)
-        $tmux_command tmux split-window -v -t "$SESSION_NAME:0.1"
-        # Enable mouse mode
-        $tmux_command tmux set-option -t "$SESSION_NAME" mouse on
-    else
-        tmux split-window -h -t "$SESSION_NAME"
-        tmux split-window -v -t "$SESSION_NAME:0.1"
-        tmux set-option -t "$SESSION_NAME" mouse on
+    if [ "$execution_context" = "docker" ] && [ "$SESSION_STATE_DIR" != "$AI_WORKFLOW_STATE_DIR" ]; then
+        print_status "Pane streams are in $SESSION_STATE_DIR; export AI_WORKFLOW_STATE_DIR=$SESSION_STATE_DIR for the host-side tools"
     fi
-    
-    # Set up custom prompts for each pane
-    # Pane 0 = left, Pane 1 = top-right, Pane 2 = bottom-right
-    if [ "$execution_context" = "docker" ]; then
-        # For Docker, we need to send commands to the container
-        $tmux_command tmux send-keys -t "$SESSION_NAME:0.0" "export PS1='ai-workflow-bash:left(🐳) \$ '" Enter
-        $tmux_command tmux send-keys -t "$SESSION_NAME:0.0" "clear" Enter
-        $tmux_command tmux send-keys -t "$SESSION_NAME:0.0" "# left pane ready for ai-workflow (Docker: Ubuntu)" Enter
-        
-        $tmux_command tmux send-keys -t "$SESSION_NAME:0.1" "export PS1='ai-workflow-bash:top(🐳) \$ '" Enter
-        $tmux_command tmux send-keys -t "$SESSION_NAME:0.1" "clear" Enter
-        $tmux_command tmux send-keys -t "$SESSION_NAME:0.1" "# top pane ready for ai-workflow (Docker: Ubuntu)" Enter
-        
-        $tmux_command tmux send-keys -t "$SESSION_NAME:0.2" "export PS1='ai-workflow-bash:bottom(🐳) \$ '" Enter
-        $tmux_command tmux send-keys -t "$SESSION_NAME:0.2" "clear" Enter
-        $tmux_command tmux send-keys -t "$SESSION_NAME:0.2" "# bottom pane ready for ai-workflow (Docker: Ubuntu)" Enter
+}
+
+# Function to get a millisecond timestamp (bash 5 EPOCHREALTIME, perl fallback)
+now_ms() {
+    if [ -n "$EPOCHREALTIME" ]; then
+        local seconds=${EPOCHREALTIME%[.,]*}
+        local micros=${EPOCHREALTIME#*[.,]}
+        echo $(( seconds * 1000 + 10#$micros / 1000 ))
     else
-        setup_pane_prompt "left" "$SESSION_NAME:0.0" "native"
-        setup_pane_prompt "top" "$SESSION_NAME:0.1" "native"
-        setup_pane_prompt "bottom" "$SESSION_NAME:0.2" "native"
+        perl -MTime::HiRes=time -e 'printf "%d\n", time * 1000'
     fi
+}
+
+# Function to measure how long a fresh session takes to come up
+# Any existing session is killed first so the measurement is a cold start
+measure_cold_start() {
+    local execution_context=$1
+    local start_ms end_ms
     
-    # Select the left pane as default
-    if [ "$execution_context" = "docker" ]; then
-        $tmux_command tmux select-pane -t "$SESSION_NAME:0.0"
-    else
-        tmux select-pane -t "$SESSION_NAME:0.0"
+    if session_exists "$execution_context"; then
+        print_status "Killing existing ai-workflow session for cold start..."
+        run_tmux "$execution_context" kill-session -t "$SESSION_NAME"
     fi
+    
+    start_ms=$(now_ms)
+    create_tmux_session "$execution_context" > /dev/null
+    end_ms=$(now_ms)
+    
+    print_success "Cold start ($execution_context): $((end_ms - start_ms)) ms"
 }
 
 # Function to attach to tmux session
@@ -316,10 +572,10 @@ attach_tmux_session() {
     
     if [ "$execution_context" = "docker" ]; then
         print_success "Attaching to ai-workflow session in Docker container..."
-        docker exec -it "$CONTAINER_NAME" tmux attach-session -t "$SESSION_NAME"
+        docker exec -it "$CONTAINER_NAME" tmux ${TMUX_SOCKET:+-L "$TMUX_SOCKET"} attach-session -t "$SESSION_NAME"
     else
         print_success "Attaching to native ai-workflow session..."
-        tmux attach-session -t "$SESSION_NAME"
+        run_tmux native attach-session -t "$SESSION_NAME"
     fi
 }
 
@@ -333,9 +589,9 @@ session_exists() {
             return 1
         fi
         # Check if tmux session exists in container
-        docker exec "$CONTAINER_NAME" tmux has-session -t "$SESSION_NAME" 2>/dev/null
+        run_tmux docker has-session -t "$SESSION_NAME" 2>/dev/null
     else
-        tmux has-session -t "$SESSION_NAME" 2>/dev/null
+        run_tmux native has-session -t "$SESSION_NAME" 2>/dev/null
     fi
 }
 
@@ -344,52 +600,79 @@ main() {
     print_status "AI-Workflow Setup Starting..."
     
     # Check command line arguments
-    case "${1:-}" in
-        --native)
-            DOCKER_MODE=false
-            print_status "Native mode requested"
-            ;;
-        --docker)
-            DOCKER_MODE=true
-            print_status "Docker mode requested"
-            ;;
-        --help|-h)
-            echo "AI-Workflow Setup Script"
-            echo ""
-            echo "Usage: $0 [OPTIONS]"
-            echo ""
-            echo "Options:"
-            echo "  --docker    Use Docker mode (default)"
-            echo "  --native    Use native mode (run tmux directly on host)"
-            echo "  --help,-h   Show this help message"
-            echo ""
-            echo "Environment Variables:"
-            echo "  AI_WORKFLOW_DOCKER=true|false  Override default Docker mode"
-            echo ""
-            exit 0
-            ;;
-    esac
+    local cold_start=false
+    local no_attach=false
+    while [ $# -gt 0 ]; do
+        case "$1" in
+            --native)
+                DOCKER_MODE=false
+                print_status "Native mode requested"
+                ;;
+            --docker)
+                DOCKER_MODE=true
+                print_status "Docker mode requested"
+                ;;
+            --cold-start)
+                cold_start=true
+                print_status "Cold start timing requested"
+                ;;
+            --no-attach)
+                no_attach=true
+                ;;
+            --session)
+                SESSION_NAME=$2
+                shift
+                ;;
+            --socket)
+                TMUX_SOCKET=$2
+                shift
+                ;;
+            --container)
+                CONTAINER_NAME=$2
+                STATE_CACHE_FILE="$STATE_CACHE_DIR/docker-state-$CONTAINER_NAME"
+                POOL_PREFIX="${CONTAINER_NAME}-pool"
+                shift
+                ;;
+            --help|-h)
+                echo "AI-Workflow Setup Script"
+                echo ""
+                echo "Usage: $0 [OPTIONS]"
+                echo ""
+                echo "Options:"
+                echo "  --docker      Use Docker mode (default)"
+                echo "  --native      Use native mode (run tmux directly on host)"
+                echo "  --cold-start  Recreate the session, report creation time, don't attach"
+                echo "  --no-attach   Create the session if needed but don't attach"
+                echo "  --session N   Session name (default ai-workflow)"
+                echo "  --socket S    Run on a separate tmux server (tmux -L S)"
+                echo "  --container C Docker container name (default ai-workflow-dev)"
+                echo "  --help,-h     Show this help message"
+                echo ""
+                echo "Environment Variables:"
+                echo "  AI_WORKFLOW_DOCKER=true|false  Override default Docker mode"
+                echo "  AI_WORKFLOW_POOL_SIZE=N        Keep N warm containers ready (default 0)"
+                echo "  AI_WORKFLOW_SESSION, AI_WORKFLOW_SOCKET, AI_WORKFLOW_CONTAINER"
+                echo "                                 Defaults for --session, --socket, --container"
+                echo ""
+                exit 0
+                ;;
+        esac
+        shift
+    done
     
     # Determine execution mode
     if [ "$DOCKER_MODE" = "true" ]; then
         print_status "Using Docker execution mode"
         
-        # Check Docker availability
-        if ! check_docker; then
-            print_warning "Docker not available, falling back to native mode"
-            DOCKER_MODE=false
-        else
-            # Build image and start container
-            if ! build_docker_image; then
-                print_error "Failed to prepare Docker environment"
-                exit 1
-            fi
-            
-            if ! start_docker_container; then
-                print_error "Failed to start Docker container"
-                exit 1
-            fi
-        fi
+        prepare_docker_environment
+        case $? in
+            0) ;;
+            2)
+                print_warning "Docker not available, falling back to native mode"
+                DOCKER_MODE=false
+                ;;
+            *) exit 1 ;;
+        esac
     fi
     
     if [ "$DOCKER_MODE" = "false" ]; then
@@ -404,12 +687,24 @@ main() {
         execution_context="native"
     fi
     
+    if [ "$cold_start" = "true" ]; then
+        measure_cold_start "$execution_context"
+        return 0
+    fi
+    
     if session_exists "$execution_context"; then
+        if [ "$no_attach" = "true" ]; then
+            print_status "$SESSION_NAME session already exists"
+            return 0
+        fi
         print_status "ai-workflow session already exists. Attaching..."
         attach_tmux_session "$execution_context"
     else
         print_status "Creating new ai-workflow session..."
-        create_tmux_session "$execution_context"
+        if ! create_tmux_session "$execution_context"; then
+            print_error "Failed to create $SESSION_NAME session"
+            exit 1
+        fi
         
         print_success "ai-workflow session created successfully!"
         echo ""
@@ -428,9 +723,14 @@ main() {
         echo "  - Bottom pane: lower right quadrant"
         echo ""
         
+        if [ "$no_attach" = "true" ]; then
+            return 0
+        fi
         attach_tmux_session "$execution_context"
     fi
 }
 
-# Run main function
-main "$@"
+# Run main function (skipped when sourced, e.g. by the unit tests)
+if [ "${BASH_SOURCE[0]}" = "$0" ]; then
+    main "$@"
+fi
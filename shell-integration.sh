@@ -0,0 +1,26 @@
+#!/bin/bash
+
+# shell-integration.sh - Readiness signaling for ai-workflow panes
+# Sourced into each pane's bash by setup-workflow.sh
+#
+# Emits OSC 133 semantic prompt markers into the pane's output stream:
+#   ESC ] 133 ; C ; <time> BEL           command started (from PS0)
+#   ESC ] 133 ; D ; <exit> ; <time> BEL  command finished with exit status
+#   ESC ] 133 ; A BEL                    prompt shown, pane ready for input
+# <time> is $EPOCHREALTIME (bash 5+), empty on older shells.
+# tmux does not draw these, but `tmux pipe-pane -O` passes them through, so
+# pane-listener.py can track every pane's state without capture-pane.
+
+__ai_workflow_prompt() {
+    local exit_code=$?
+    printf '\033]133;D;%s;%s\007\033]133;A\007' "$exit_code" "$EPOCHREALTIME"
+    return $exit_code
+}
+
+PS0=$'\e]133;C;${EPOCHREALTIME}\a'
+
+# Must run first so it still sees the command's exit status
+case "$PROMPT_COMMAND" in
+    *__ai_workflow_prompt*) ;;
+    *) PROMPT_COMMAND="__ai_workflow_prompt${PROMPT_COMMAND:+; $PROMPT_COMMAND}" ;;
+esac
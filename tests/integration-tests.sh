@@ -13,14 +13,39 @@ BLUE='\033[0;34m'
 NC='\033[0m'
 
 SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
-ROOT_DIR="$(cd "$SCRIPT_DIR/../.." && pwd)"
+ROOT_DIR="$(cd "$SCRIPT_DIR/.." && pwd)"
 TEST_SESSION="test-integration-$$"  # Unique session name
+WAIT_TIMEOUT=${INTEGRATION_WAIT_TIMEOUT:-10}  # seconds to wait for a command marker
+PANE_SHELL=${INTEGRATION_PANE_SHELL:-}  # command panes start, empty = tmux default shell
 
 # Counters
 TESTS_RUN=0
 TESTS_PASSED=0
 TESTS_FAILED=0
 
+# name|description of every test, in run order
+ALL_TESTS=(
+    "test_system_files_exist|System files exist and are executable"
+    "test_setup_script_creates_session|Setup script creates proper session structure"
+    "test_pane_targeting|Pane targeting works correctly"
+    "test_recovery_script|Recovery script functionality"
+    "test_tmux_hello_briefing|tmux-hello provides proper briefing"
+    "test_phi3_simulator_parsing|phi3 simulator natural language parsing"
+    "test_phi3_simulator_cleaning|phi3 simulator output cleaning"
+    "test_base64_safety|Base64 safety protocol"
+    "test_session_persistence|Session persistence and reattachment"
+    "test_error_handling|Error handling and timeout simulation"
+)
+
+# --list prints the test names; naming tests runs just those (each test
+# creates the session it needs, so any one can run alone)
+if [[ "${1:-}" == "--list" ]]; then
+    for entry in "${ALL_TESTS[@]}"; do
+        echo "${entry%%|*}"
+    done
+    exit 0
+fi
+
 echo -e "${BLUE}=== RYAN WORKFLOW INTEGRATION TESTS ===${NC}"
 echo "Root directory: $ROOT_DIR"
 echo "Test session: $TEST_SESSION"
@@ -34,6 +59,41 @@ cleanup() {
 trap cleanup EXIT
 
 # Test helper functions
+ensure_test_session() {
+    tmux has-session -t "$TEST_SESSION" 2>/dev/null && return 0
+    tmux new-session -d -s "$TEST_SESSION" $PANE_SHELL &&
+    tmux split-window -h -t "$TEST_SESSION" $PANE_SHELL &&
+    tmux split-window -v -t "$TEST_SESSION:0.1" $PANE_SHELL
+}
+
+# Type a command tagged with a completion marker (the format phi3-simulator.py
+# generates) and print the marker id
+send_tagged() {
+    local target="$1"
+    local command="$2"
+    local marker_id
+    marker_id=$(od -An -N4 -tx1 /dev/urandom | tr -d ' \n')
+    tmux send-keys -t "$target" -l "$command ; printf \"\\nprogram execution done. exit_code=%s id=%s\\n\" \$? $marker_id" &&
+    tmux send-keys -t "$target" Enter &&
+    echo "$marker_id"
+}
+
+# Wait until the pane shows the marker of one tagged command, instead of
+# sleeping a fixed time and hoping it finished
+wait_for_marker() {
+    local target="$1"
+    local marker_id="$2"
+    local deadline=$((SECONDS + WAIT_TIMEOUT))
+    while (( SECONDS <= deadline )); do
+        if tmux capture-pane -t "$target" -p -J | grep -q "exit_code=[0-9]* id=$marker_id"; then
+            return 0
+        fi
+        sleep 0.05
+    done
+    echo -e "${RED}TIMEOUT:${NC} no marker $marker_id in $target after ${WAIT_TIMEOUT}s"
+    return 1
+}
+
 run_test() {
     local test_name="$1"
     local test_command="$2"
@@ -107,9 +167,7 @@ test_setup_script_creates_session() {
     tmux kill-session -t "$TEST_SESSION" 2>/dev/null || true
     
     # Create session using our setup logic (modified for test)
-    tmux new-session -d -s "$TEST_SESSION" &&
-    tmux split-window -h -t "$TEST_SESSION" &&
-    tmux split-window -v -t "$TEST_SESSION:0.1" &&
+    ensure_test_session &&
     
     # Verify session structure
     assert_session_exists "$TEST_SESSION" &&
@@ -122,14 +180,18 @@ test_setup_script_creates_session() {
 
 # Test 3: Pane targeting works correctly
 test_pane_targeting() {
+    ensure_test_session &&
     assert_session_exists "$TEST_SESSION" &&
     
     # Send different commands to each pane
-    tmux send-keys -t "$TEST_SESSION:0.0" "echo 'left-pane-test'" Enter &&
-    tmux send-keys -t "$TEST_SESSION:0.1" "echo 'top-pane-test'" Enter &&
-    tmux send-keys -t "$TEST_SESSION:0.2" "echo 'bottom-pane-test'" Enter &&
+    local left_id top_id bottom_id
+    left_id=$(send_tagged "$TEST_SESSION:0.0" "echo 'left-pane-test'") &&
+    top_id=$(send_tagged "$TEST_SESSION:0.1" "echo 'top-pane-test'") &&
+    bottom_id=$(send_tagged "$TEST_SESSION:0.2" "echo 'bottom-pane-test'") &&
     
-    sleep 1  # Give commands time to execute
+    wait_for_marker "$TEST_SESSION:0.0" "$left_id" &&
+    wait_for_marker "$TEST_SESSION:0.1" "$top_id" &&
+    wait_for_marker "$TEST_SESSION:0.2" "$bottom_id" &&
     
     # Capture and verify outputs
     local left_output top_output bottom_output
@@ -144,16 +206,17 @@ test_pane_targeting() {
 
 # Test 4: Recovery script functionality
 test_recovery_script() {
+    ensure_test_session &&
     assert_session_exists "$TEST_SESSION" &&
     
     # Test status check
-    "$ROOT_DIR/tmux-recover" left status &>/dev/null &&
+    AI_WORKFLOW_SESSION="$TEST_SESSION" "$ROOT_DIR/tmux-recover" left status &>/dev/null &&
     
     # Test clear command
-    "$ROOT_DIR/tmux-recover" top clear &>/dev/null &&
+    AI_WORKFLOW_SESSION="$TEST_SESSION" "$ROOT_DIR/tmux-recover" top clear &>/dev/null &&
     
     # Test interrupt (should not fail even if nothing to interrupt)
-    "$ROOT_DIR/tmux-recover" bottom interrupt &>/dev/null
+    AI_WORKFLOW_SESSION="$TEST_SESSION" "$ROOT_DIR/tmux-recover" bottom interrupt &>/dev/null
 }
 
 # Test 5: tmux-hello provides proper briefing
@@ -161,11 +224,11 @@ test_tmux_hello_briefing() {
     local output
     output=$("$ROOT_DIR/tmux-hello")
     
-    assert_contains "$output" "RYAN WORKFLOW TMUX SYSTEM" &&
+    assert_contains "$output" "AI-WORKFLOW TMUX SYSTEM" &&
     assert_contains "$output" "CRITICAL SAFETY RULES" &&
     assert_contains "$output" "NEVER use heredoc" &&
     assert_contains "$output" "base64 encoding" &&
-    assert_contains "$output" "RECOVERY COMMANDS FOR AI"
+    assert_contains "$output" "TROUBLESHOOTING STUCK SESSIONS"
 }
 
 # Test 6: phi3 simulator natural language parsing
@@ -178,13 +241,13 @@ test_phi3_simulator_parsing() {
     
     assert_contains "$output" "top" &&
     assert_contains "$output" "make clean" &&
-    assert_contains "$output" "ryan-workflow:0.1" &&
+    assert_contains "$output" "ai-workflow:0.1" &&
     
     # Test execute verb
     output=$(python3 phi3-simulator.py "Execute ls -la in the left pane" 2>/dev/null)
     assert_contains "$output" "left" &&
     assert_contains "$output" "ls -la" &&
-    assert_contains "$output" "ryan-workflow:0.0"
+    assert_contains "$output" "ai-workflow:0.0"
 }
 
 # Test 7: phi3 simulator output cleaning
@@ -225,10 +288,13 @@ test_base64_safety() {
 
 # Test 9: Session persistence and reattachment
 test_session_persistence() {
+    ensure_test_session &&
     assert_session_exists "$TEST_SESSION" &&
     
     # Send command and detach
-    tmux send-keys -t "$TEST_SESSION:0.0" "echo 'persistence-test'" Enter &&
+    local marker_id
+    marker_id=$(send_tagged "$TEST_SESSION:0.0" "echo 'persistence-test'") &&
+    wait_for_marker "$TEST_SESSION:0.0" "$marker_id" &&
     
     # Verify we can capture output (session persists)
     local output
@@ -238,32 +304,29 @@ test_session_persistence() {
 
 # Test 10: Error handling and timeout simulation
 test_error_handling() {
+    ensure_test_session &&
     assert_session_exists "$TEST_SESSION" &&
     
     # Test a command that should fail
-    tmux send-keys -t "$TEST_SESSION:0.1" "false ; echo ; echo 'program execution done. exit_code=\$?'" Enter &&
-    
-    sleep 1  # Give command time to execute
+    local marker_id
+    marker_id=$(send_tagged "$TEST_SESSION:0.1" "false") &&
+    wait_for_marker "$TEST_SESSION:0.1" "$marker_id" &&
     
     local output
-    output=$(tmux capture-pane -t "$TEST_SESSION:0.1" -p)
-    assert_contains "$output" "program execution done. exit_code=1"
+    output=$(tmux capture-pane -t "$TEST_SESSION:0.1" -p -J)
+    assert_contains "$output" "program execution done. exit_code=1 id=$marker_id"
 }
 
 # Run all tests
 echo -e "${YELLOW}Starting integration tests...${NC}"
 echo
 
-run_test "System files exist and are executable" "test_system_files_exist"
-run_test "Setup script creates proper session structure" "test_setup_script_creates_session" 
-run_test "Pane targeting works correctly" "test_pane_targeting"
-run_test "Recovery script functionality" "test_recovery_script"
-run_test "tmux-hello provides proper briefing" "test_tmux_hello_briefing"
-run_test "phi3 simulator natural language parsing" "test_phi3_simulator_parsing"
-run_test "phi3 simulator output cleaning" "test_phi3_simulator_cleaning"
-run_test "Base64 safety protocol" "test_base64_safety"
-run_test "Session persistence and reattachment" "test_session_persistence"
-run_test "Error handling and timeout simulation" "test_error_handling"
+for entry in "${ALL_TESTS[@]}"; do
+    name="${entry%%|*}"
+    if [[ $# -eq 0 ]] || [[ " $* " == *" $name "* ]]; then
+        run_test "${entry#*|}" "$name"
+    fi
+done
 
 # Results summary
 echo -e "${BLUE}=== TEST RESULTS ===${NC}"
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+
+"""
+parallel-tests.py - Run the unit and integration tests concurrently
+Every test runs in its own process with a private tmux server (its own
+TMUX_TMPDIR socket directory), temp dir, state dir, history database and phi3
+socket. Tests can then use the same session names (`ai-workflow`,
+`test-integration-*`) without seeing each other, and a worker pool runs them
+side by side. Integration tests wait on command completion markers rather
+than sleeping.
+
+    ./parallel-tests.py                   # everything, one worker per CPU
+    ./parallel-tests.py -j 4 -k journal   # tests whose id contains "journal"
+    ./parallel-tests.py --unit            # or --integration
+"""
+
+import concurrent.futures
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from typing import Dict, List, Tuple
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+UNIT_DIR = os.path.join(SCRIPT_DIR, 'unit')
+INTEGRATION_SCRIPT = os.path.join(SCRIPT_DIR, 'integration-tests.sh')
+
+# Panes skip the user's startup files, which can take seconds per fresh server
+PANE_SHELL = 'bash --norc --noprofile'
+DEFAULT_TIMEOUT = 120
+
+fixtures_spec = importlib.util.spec_from_file_location('tmux_fixtures', os.path.join(UNIT_DIR, 'tmux_fixtures.py'))
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+
+def unit_tests() -> List[Tuple[str, List[str], str]]:
+    """(id, argv, cwd) of every unit test, e.g. test_pane_vt.TestTerminal.test_wrap"""
+    # The test modules load their siblings by paths relative to tests/unit
+    cwd = os.getcwd()
+    os.chdir(UNIT_DIR)
+    try:
+        suite = unittest.defaultTestLoader.discover(UNIT_DIR, pattern='test_*.py', top_level_dir=UNIT_DIR)
+    finally:
+        os.chdir(cwd)
+
+    ids = []
+    pending = [suite]
+    while pending:
+        for test in pending.pop(0):
+            if isinstance(test, unittest.TestSuite):
+                pending.append(test)
+            elif test.id().startswith('unittest.loader._FailedTest.'):
+                ids.append(test.id().rsplit('.', 1)[1])    # rerun the module to show its import error
+            else:
+                ids.append(test.id())
+    return [(test_id, [sys.executable, '-m', 'unittest', test_id], UNIT_DIR) for test_id in ids]
+
+
+def integration_tests() -> List[Tuple[str, List[str], str]]:
+    """(id, argv, cwd) of every test in integration-tests.sh"""
+    names = subprocess.run(['bash', INTEGRATION_SCRIPT, '--list'], capture_output=True,
+                           text=True, check=True).stdout.split()
+    return [(f'integration.{name}', ['bash', INTEGRATION_SCRIPT, name], SCRIPT_DIR) for name in names]
+
+
+def isolated_env(temp_dir: str) -> Dict[str, str]:
+    """Environment pointing every per-user resource into temp_dir"""
+    env = dict(os.environ)
+    # $TMUX overrides TMUX_TMPDIR and would reach the enclosing tmux server
+    env.pop('TMUX', None)
+    tmux_dir = os.path.join(temp_dir, 'tmux')
+    os.makedirs(tmux_dir)
+    env.update(
+        TMUX_TMPDIR=tmux_dir,
+        TMPDIR=temp_dir,
+        AI_WORKFLOW_STATE_DIR=os.path.join(temp_dir, 'state'),
+        AI_WORKFLOW_HISTORY=os.path.join(temp_dir, 'history.db'),
+        AI_WORKFLOW_PHI3_SOCKET=os.path.join(temp_dir, 'phi3.sock'),
+        INTEGRATION_PANE_SHELL=PANE_SHELL,
+    )
+    return env
+
+
+def run_test(test_id: str, argv: List[str], cwd: str, timeout: float) -> Dict:
+    """Run one test in its own process and tmux server"""
+    temp_dir = tempfile.mkdtemp(prefix='parallel-tests-')
+    env = isolated_env(temp_dir)
+    start = time.time()
+    try:
+        process = subprocess.run(argv, cwd=cwd, env=env, stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT, timeout=timeout)
+        passed = process.returncode == 0
+        output = process.stdout.decode('utf-8', 'replace')
+    except subprocess.TimeoutExpired as e:
+        passed = False
+        output = (e.output or b'').decode('utf-8', 'replace') + f'\nTimed out after {timeout}s\n'
+    finally:
+        # A test that died mid-way leaves its server and panes behind
+        fixtures.kill_server(env=env)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    return {'id': test_id, 'passed': passed, 'duration': time.time() - start, 'output': output}
+
+
+def main():
+    args = sys.argv[1:]
+    if '-h' in args or '--help' in args:
+        print("Usage: ./parallel-tests.py [-j WORKERS] [-k SUBSTRING] [--unit | --integration]")
+        print("                           [--timeout SECONDS]")
+        print()
+        print("Runs each test in its own process with a private tmux server and temp dir.")
+        return
+
+    workers = os.cpu_count() or 4
+    pattern = None
+    timeout = DEFAULT_TIMEOUT
+    kinds = {'unit', 'integration'}
+    while args:
+        flag = args.pop(0)
+        if flag == '-j' and args:
+            workers = int(args.pop(0))
+        elif flag == '-k' and args:
+            pattern = args.pop(0)
+        elif flag == '--timeout' and args:
+            timeout = float(args.pop(0))
+        elif flag in ('--unit', '--integration'):
+            kinds = {flag[2:]}
+        else:
+            print(f"Error: unknown or incomplete option {flag}")
+            sys.exit(1)
+
+    tests = (unit_tests() if 'unit' in kinds else []) + \
+            (integration_tests() if 'integration' in kinds else [])
+    if pattern:
+        tests = [test for test in tests if pattern in test[0]]
+    if not tests:
+        print("No tests selected")
+        sys.exit(1)
+
+    print(f"Running {len(tests)} tests on {workers} workers")
+    start = time.time()
+    results = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(run_test, *test, timeout) for test in tests]
+        for future in concurrent.futures.as_completed(futures):
+            result = future.result()
+            results.append(result)
+            status = 'PASS' if result['passed'] else 'FAIL'
+            print(f"{status} {result['duration']:6.2f}s  {result['id']}", flush=True)
+
+    failed = [result for result in results if not result['passed']]
+    for result in failed:
+        print(f"\n=== {result['id']} ===")
+        print(result['output'].rstrip())
+
+    elapsed = time.time() - start
+    serial = sum(result['duration'] for result in results)
+    print(f"\n{len(results) - len(failed)} passed, {len(failed)} failed in {elapsed:.1f}s "
+          f"({serial:.1f}s of test time)")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+
+"""
+phi3-client.py - Thin client for the resident phi3 simulator
+Sends parse/generate/clean requests to `phi3-simulator.py --serve` over its
+Unix socket (newline-delimited JSON), so shell loops skip the simulator's
+imports and setup on every call. When no daemon is listening, the request is
+executed in-process instead, with the same results.
+
+    ./phi3-client.py generate "Run make clean in the top pane"   # prints the tmux command
+    ./phi3-client.py parse "Execute ls -la in the left pane"     # prints parsed JSON
+    ./phi3-client.py clean output.txt [marker_id]                # '-' reads stdin
+"""
+
+import json
+import os
+import socket
+import sys
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def default_socket_path() -> str:
+    """Same rule as phi3-simulator.py, without importing it"""
+    if os.environ.get('AI_WORKFLOW_PHI3_SOCKET'):
+        return os.environ['AI_WORKFLOW_PHI3_SOCKET']
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(runtime_dir, f'ai-workflow-phi3-{os.getuid()}.sock')
+
+
+class Phi3Client:
+    """Request/response over one daemon connection, or in-process fallback"""
+
+    def __init__(self, socket_path=None, timeout=5.0):
+        self.socket_path = socket_path or default_socket_path()
+        self.timeout = timeout
+        self.connection = None
+        self.reader = None
+        self.simulator = None    # in-process fallback, created on first use
+
+    def _connect(self) -> bool:
+        try:
+            connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            connection.settimeout(self.timeout)
+            connection.connect(self.socket_path)
+        except OSError:
+            return False
+        self.connection = connection
+        self.reader = connection.makefile('rb')
+        return True
+
+    def _in_process(self, request):
+        if self.simulator is None:
+            # Imported only on fallback to keep the daemon path light
+            import importlib.util
+            spec = importlib.util.spec_from_file_location(
+                'phi3_simulator', os.path.join(SCRIPT_DIR, 'phi3-simulator.py'))
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self.simulator = module.Phi3Simulator()
+        # Round-trip through JSON so callers get the same plain values the daemon sends
+        response = json.loads(self.simulator.handle_line(json.dumps(request).encode()))
+        if not response['ok']:
+            raise RuntimeError(response['error'])
+        return response['result']
+
+    def call(self, op, **arguments):
+        """Run one request, preferring the daemon"""
+        request = dict(arguments, op=op)
+        if self.simulator is None and (self.connection is not None or self._connect()):
+            try:
+                self.connection.sendall(json.dumps(request).encode() + b'\n')
+                line = self.reader.readline()
+                if line:
+                    response = json.loads(line)
+                    if not response['ok']:
+                        raise RuntimeError(response['error'])
+                    return response['result']
+            except OSError:
+                pass
+            # Daemon went away mid-call
+            self.close()
+        return self._in_process(request)
+
+    def close(self):
+        if self.connection is not None:
+            self.reader.close()
+            self.connection.close()
+            self.connection = None
+            self.reader = None
+
+
+def main():
+    args = sys.argv[1:]
+    if len(args) < 2 or args[0] not in ('parse', 'generate', 'clean'):
+        print('Usage: ./phi3-client.py generate "<natural_language_request>"')
+        print('       ./phi3-client.py parse "<natural_language_request>"')
+        print('       ./phi3-client.py clean <raw_output_file|-> [marker_id]')
+        print()
+        print('Talks to `phi3-simulator.py --serve` at $AI_WORKFLOW_PHI3_SOCKET')
+        print('(default $XDG_RUNTIME_DIR or /tmp), running in-process if it is not up.')
+        sys.exit(1)
+
+    client = Phi3Client()
+    op = args[0]
+    if op == 'clean':
+        if args[1] == '-':
+            raw_output = sys.stdin.read()
+        else:
+            with open(args[1]) as f:
+                raw_output = f.read()
+        result = client.call('clean', raw_output=raw_output, marker_id=args[2] if len(args) > 2 else None)
+        print(json.dumps(result, indent=2))
+    elif op == 'generate':
+        print(client.call('generate', request=' '.join(args[1:]))['tmux_command'])
+    else:
+        print(json.dumps(client.call('parse', request=' '.join(args[1:])), indent=2))
+    client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -5,20 +5,145 @@ phi3-simulator.py - Simulates what phi3 would do for command parsing and output
 This demonstrates the tactical layer that would save Claude tokens
 """
 
+import errno
 import json
+import os
 import re
+import secrets
+import shlex
+import socket
+import socketserver
 import subprocess
 import sys
-from typing import Dict, Tuple
+import time
+from collections.abc import MutableMapping
+from typing import Callable, Dict, List, Optional, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+from workflow_common import ANSI_ESCAPE
+
+# Completion marker printed after every generated command. Tagged markers carry
+# a per-command id so output can be attributed when several commands share a pane.
+MARKER_TEXT = 'program execution done.'
+TAGGED_MARKER = re.compile(r'program execution done\. exit_code=(\d+) id=([0-9a-f]+)')
+
+# Commands that flood the pane run under flood-guard.py, which spills their full
+# output to <spill_dir>/<marker_id>.log; the cleaner then reads head, tail and
+# first error from that file instead of the pane.
+FLOOD_GUARD = os.path.join(ROOT_DIR, 'flood-guard.py')
+ERROR_INDICATORS = ['error:', 'failed', 'cannot', 'permission denied']
+# Matched against lowercased bytes: much faster than re.IGNORECASE on large spills
+ERROR_PATTERN = re.compile(b'|'.join(re.escape(indicator.encode()) for indicator in ERROR_INDICATORS))
+SPILL_HEAD_LINES = 50
+SPILL_TAIL_LINES = 100
+SPILL_READ_BYTES = 1 << 20    # window read at each end of a spill file
+
+
+def screen_line(line: str) -> str:
+    """A spilled line as the terminal showed it: no escapes, only the last redraw after a CR"""
+    return ANSI_ESCAPE.sub('', line).rstrip('\r').rsplit('\r', 1)[-1].strip()
+
+def new_marker_id() -> str:
+    """Short random id tying a command to its completion marker"""
+    return secrets.token_hex(4)
+
+def default_socket_path() -> str:
+    """Unix socket of the resident simulator (--serve)"""
+    if os.environ.get('AI_WORKFLOW_PHI3_SOCKET'):
+        return os.environ['AI_WORKFLOW_PHI3_SOCKET']
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR') or '/tmp'
+    return os.path.join(runtime_dir, f'ai-workflow-phi3-{os.getuid()}.sock')
+
+class Result(MutableMapping):
+    """Slot-backed result that still reads and updates like the dicts it replaced
+    
+    FIELDS live in slots, so a result carries no per-instance dict. Keys added
+    afterwards (the queue adds marker_id, pane and timings) go into a small
+    dict created only when needed. Unlike those dicts, a result is not
+    JSON-serializable as is: use to_dict(), to_json() or json_default.
+    """
+    __slots__ = ('_extra',)
+    FIELDS: Tuple[str, ...] = ()
+    
+    def __init__(self, **fields):
+        for name in self.FIELDS:
+            setattr(self, name, fields.pop(name))
+        self._extra = fields or None
+    
+    def __getitem__(self, key):
+        if key in self.FIELDS:
+            return getattr(self, key)
+        if self._extra is not None and key in self._extra:
+            return self._extra[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        if key in self.FIELDS:
+            setattr(self, key, value)
+        elif self._extra is None:
+            self._extra = {key: value}
+        else:
+            self._extra[key] = value
+    
+    def __delitem__(self, key):
+        if key in self.FIELDS:
+            raise TypeError(f"{key} is a fixed field of {type(self).__name__}")
+        if self._extra is None or key not in self._extra:
+            raise KeyError(key)
+        del self._extra[key]
+    
+    def __iter__(self):
+        yield from self.FIELDS
+        if self._extra is not None:
+            yield from self._extra
+    
+    def __len__(self):
+        return len(self.FIELDS) + (len(self._extra) if self._extra is not None else 0)
+    
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+    
+    def to_dict(self) -> Dict:
+        fields = {name: getattr(self, name) for name in self.FIELDS}
+        if self._extra is not None:
+            fields.update(self._extra)
+        return fields
+    
+    def to_json(self) -> str:
+        """Compact one-line JSON, for batch output and the daemon"""
+        return dumps_compact(self)
+
+class ParsedCommand(Result):
+    """parse_natural_language() result"""
+    FIELDS = ('original_request', 'pane', 'command', 'timeout_category', 'timeout_seconds', 'marker_id')
+    __slots__ = FIELDS
+
+class CleanResult(Result):
+    """clean_tmux_output() result"""
+    FIELDS = ('output_type', 'exit_code', 'summary', 'cleaned_output', 'line_count')
+    __slots__ = FIELDS
+
+def json_default(value):
+    """json.dumps default= hook: results serialize as their fields"""
+    if isinstance(value, Result):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps_compact(value) -> str:
+    """JSON without indentation or spaces after separators"""
+    return json.dumps(value, separators=(',', ':'), default=json_default)
 
 class Phi3Simulator:
     """Simulates phi3's role in the AI handoff pattern"""
     
-    def __init__(self):
+    def __init__(self, session: str = 'ai-workflow', socket: Optional[str] = None):
+        self.session = session
+        self.socket = socket  # tmux -L socket name, None = default server
         self.pane_mapping = {
-            'left': 'ai-workflow:0.0',
-            'top': 'ai-workflow:0.1', 
-            'bottom': 'ai-workflow:0.2'
+            'left': f'{session}:0.0',
+            'top': f'{session}:0.1', 
+            'bottom': f'{session}:0.2'
         }
         
         self.timeout_defaults = {
@@ -27,8 +152,21 @@ class Phi3Simulator:
             'test': 600,      # test suites
             'long': 1800      # complex builds
         }
+        
+        state_dir = os.environ.get('AI_WORKFLOW_STATE_DIR', f'/tmp/ai-workflow-{session}')
+        # Written by setup-workflow.sh: where the panes run and how they see host paths
+        self.context_path = os.path.join(state_dir, 'panes.json')
+        self.spill_dir = os.environ.get('AI_WORKFLOW_SPILL_DIR') or os.path.join(state_dir, 'spill')
+        # Categories run under the flood guard unless a command says otherwise
+        self.flood_guard_categories = {
+            category.strip() for category in os.environ.get('AI_WORKFLOW_FLOOD_GUARD', '').split(',')
+            if category.strip()}
+    
+    def tmux_command(self) -> List[str]:
+        """argv prefix for tmux calls against this simulator's server"""
+        return ['tmux', '-L', self.socket] if self.socket else ['tmux']
     
-    def parse_natural_language(self, request: str) -> Dict:
+    def parse_natural_language(self, request: str) -> ParsedCommand:
         """Parse natural language into structured command info"""
         request_lower = request.lower()
         
@@ -66,19 +204,69 @@ class Phi3Simulator:
         elif any(word in command.lower() for word in ['compile', 'link']):
             timeout_category = 'long'
         
-        return {
-            'original_request': request,
-            'pane': pane,
-            'command': command,
-            'timeout_category': timeout_category,
-            'timeout_seconds': self.timeout_defaults[timeout_category]
-        }
+        return ParsedCommand(
+            original_request=request,
+            pane=pane,
+            command=command,
+            timeout_category=timeout_category,
+            timeout_seconds=self.timeout_defaults[timeout_category],
+            marker_id=new_marker_id()
+        )
+    
+    def spill_path(self, marker_id: str) -> str:
+        """Side file holding the full output of a flood-guarded command"""
+        return os.path.join(self.spill_dir, f'{marker_id}.log')
+    
+    def pane_path(self, host_path: str) -> Optional[str]:
+        """host_path as the panes see it, None when they cannot reach it
+        
+        Docker panes see only the workspace, mounted at /workspace.
+        """
+        try:
+            with open(self.context_path) as f:
+                context = json.load(f)
+        except (OSError, ValueError):
+            return host_path
+        if context.get('context') != 'docker':
+            return host_path
+        relative = os.path.relpath(host_path, context['workspace'])
+        if relative == os.pardir or relative.startswith(os.pardir + os.sep):
+            return None
+        return os.path.normpath(os.path.join(context['mount'], relative))
+    
+    def build_pane_command(self, command: str, marker_id: str,
+                           timeout_category: str = 'quick', timeout: Optional[int] = None,
+                           flood_guard: Optional[bool] = None) -> str:
+        """Build the shell line typed into the pane for a marker-tagged command
+        
+        flood_guard=None uses the $AI_WORKFLOW_FLOOD_GUARD categories. Panes
+        that cannot reach flood-guard.py or the spill directory (Docker panes
+        when either is outside the workspace) run the command unguarded.
+        """
+        if timeout_category != 'quick' and timeout:
+            command = f"timeout {timeout} {command}"
+        if flood_guard is None:
+            flood_guard = timeout_category in self.flood_guard_categories
+        if flood_guard:
+            guard, spill = self.pane_path(FLOOD_GUARD), self.pane_path(self.spill_path(marker_id))
+            if guard and spill:
+                command = ' '.join(shlex.quote(arg) for arg in ('python3', guard, spill, command))
+        # printf runs straight after the command so $? is still its status
+        return f'{command} ; printf "\\n{MARKER_TEXT} exit_code=%s id=%s\\n" $? {marker_id}'
     
     def generate_tmux_command(self, parsed: Dict) -> str:
         """Convert parsed request into tmux command"""
         pane_target = self.pane_mapping[parsed['pane']]
         command = parsed['command']
         timeout = parsed['timeout_seconds']
+        tmux = ' '.join(shlex.quote(arg) for arg in self.tmux_command())
+        
+        # Tagged commands get a marker carrying their id
+        if parsed.get('marker_id'):
+            pane_command = self.build_pane_command(command, parsed['marker_id'],
+                                                   parsed['timeout_category'], timeout,
+                                                   parsed.get('flood_guard'))
+            return f'{tmux} send-keys -t {pane_target} {shlex.quote(pane_command)} Enter'
         
         # Add completion marker for commands expected to finish
         if parsed['timeout_category'] != 'quick':
@@ -86,10 +274,144 @@ class Phi3Simulator:
         else:
             command_with_marker = f"{command} ; echo ; echo 'program execution done. exit_code=$?'"
         
-        return f'tmux send-keys -t {pane_target} "{command_with_marker}" Enter'
+        return f'{tmux} send-keys -t {pane_target} "{command_with_marker}" Enter'
+    
+    def handle_request(self, request: Dict) -> Dict:
+        """Serve one daemon request: {"op": "parse" | "generate" | "clean" | "ping", ...}"""
+        op = request.get('op')
+        if op == 'parse':
+            return self.parse_natural_language(request['request'])
+        if op == 'generate':
+            parsed = request.get('parsed') or self.parse_natural_language(request['request'])
+            return {'parsed': parsed, 'tmux_command': self.generate_tmux_command(parsed)}
+        if op == 'clean':
+            return self.clean_tmux_output(request['raw_output'], request.get('marker_id'))
+        if op == 'ping':
+            return {'pid': os.getpid()}
+        raise ValueError(f"Unknown op: {op}")
+    
+    def handle_line(self, line: bytes) -> str:
+        """One newline-delimited JSON request -> one compact JSON response line"""
+        try:
+            response = {'ok': True, 'result': self.handle_request(json.loads(line))}
+        except Exception as e:
+            response = {'ok': False, 'error': f'{type(e).__name__}: {e}'}
+        return dumps_compact(response) + '\n'
+    
+    def extract_command_output(self, raw_output: str, marker_id: str) -> Optional[str]:
+        """Return the slice of raw output belonging to one tagged command
+        
+        The slice runs from the pane's echo of the command line, whose
+        printf ends in "$? <marker_id>" (or the previous marker when the echo
+        is gone), up to and including this command's marker. Returns None
+        when the marker has not been printed yet.
+        """
+        lines = raw_output.split('\n')
+        end = None
+        for index, line in enumerate(lines):
+            match = TAGGED_MARKER.search(line)
+            if match and match.group(2) == marker_id:
+                end = index
+                break
+        if end is None:
+            return None
+        
+        echo_suffix = f'$? {marker_id}'
+        start = 0
+        for index in range(end - 1, -1, -1):
+            line = lines[index]
+            if line.rstrip().endswith(echo_suffix) or TAGGED_MARKER.search(line):
+                start = index
+                break
+        return '\n'.join(lines[start:end + 1])
+    
+    def split_command_outputs(self, raw_output: str) -> Dict[str, str]:
+        """Demultiplex raw pane output into {marker_id: output slice}"""
+        outputs = {}
+        for match in TAGGED_MARKER.finditer(raw_output):
+            marker_id = match.group(2)
+            outputs[marker_id] = self.extract_command_output(raw_output, marker_id)
+        return outputs
     
-    def clean_tmux_output(self, raw_output: str) -> Dict:
-        """Clean raw tmux output into structured results"""
+    def read_spill(self, marker_id: str) -> Optional[Dict]:
+        """Head, tail, first error and line count of a command's spill file, None without one
+        
+        Only the ends of the file are decoded; the line count and first error
+        come from a block scan, so multi-GB spills stay cheap to summarize.
+        """
+        path = self.spill_path(marker_id)
+        try:
+            spill = open(path, 'rb')
+        except FileNotFoundError:
+            return None
+        status = {}
+        try:
+            with open(path + '.status') as f:
+                status = json.load(f)
+        except (OSError, ValueError):
+            pass    # guard still running or killed
+        
+        with spill:
+            size = os.fstat(spill.fileno()).st_size
+            head = spill.read(SPILL_READ_BYTES)
+            spill.seek(max(len(head), size - SPILL_READ_BYTES))
+            rest = spill.read()
+            
+            # Line count and first error need a pass over the whole file
+            line_count = status.get('lines')
+            first_error = None
+            counted = 0
+            pending = b''    # unfinished last line of the previous block
+            spill.seek(0)
+            while line_count is None or first_error is None:
+                block = spill.read(SPILL_READ_BYTES)
+                if not block:
+                    break
+                if line_count is None:
+                    counted += block.count(b'\n')
+                if first_error is None:
+                    text = pending + block
+                    match = ERROR_PATTERN.search(text.lower())
+                    start = text.rfind(b'\n', 0, match.start()) + 1 if match else text.rfind(b'\n') + 1
+                    end = text.find(b'\n', match.end()) if match else -1
+                    if end >= 0:
+                        first_error = screen_line(text[start:end].decode('utf-8', 'replace'))
+                    else:
+                        pending = text[start:][-SPILL_READ_BYTES:]
+            if first_error is None and ERROR_PATTERN.search(pending.lower()):
+                first_error = screen_line(pending.decode('utf-8', 'replace'))
+            if line_count is None:
+                line_count = counted + (1 if size and not (rest or head).endswith(b'\n') else 0)
+        
+        def decoded(data: bytes) -> List[str]:
+            lines = (screen_line(line) for line in data.decode('utf-8', 'replace').split('\n'))
+            return [line for line in lines if line]
+        
+        if rest:
+            head_lines = decoded(head[:head.rfind(b'\n') + 1])[:SPILL_HEAD_LINES]
+            tail_lines = decoded(rest[rest.find(b'\n') + 1:])[-SPILL_TAIL_LINES:]
+        else:
+            lines = decoded(head)
+            head_lines, tail_lines = lines[:SPILL_HEAD_LINES], lines[SPILL_HEAD_LINES:][-SPILL_TAIL_LINES:]
+        return {
+            'path': path,
+            'status': status,
+            'line_count': line_count,
+            'head': head_lines,
+            'tail': tail_lines,
+            'first_error': first_error,
+        }
+    
+    def clean_tmux_output(self, raw_output: str, marker_id: Optional[str] = None) -> CleanResult:
+        """Clean raw tmux output into structured results
+        
+        With marker_id, only the output of that tagged command is considered,
+        and a flood-guarded command's spill file stands in for the pane.
+        """
+        spill = None
+        if marker_id is not None:
+            raw_output = self.extract_command_output(raw_output, marker_id) or ''
+            spill = self.read_spill(marker_id)
         lines = raw_output.strip().split('\n')
         
         # Look for completion marker
@@ -100,14 +422,25 @@ class Phi3Simulator:
                 if match:
                     completion_match = int(match.group(1))
                 break
+        if completion_match is None and spill is not None:
+            # The marker scrolled away or was never captured; the guard kept the status
+            completion_match = spill['status'].get('exit_code')
         
-        # Remove prompt lines and completion markers
-        cleaned_lines = []
-        for line in lines:
-            if not line.startswith('ai-workflow-bash:') and \
-               'program execution done' not in line and \
-               line.strip():
-                cleaned_lines.append(line)
+        if spill is not None:
+            cleaned_lines = spill['head']
+            omitted = spill['line_count'] - len(spill['head']) - len(spill['tail'])
+            if omitted > 0:
+                cleaned_lines = cleaned_lines + [
+                    f"[... {omitted} lines omitted, full output in {spill['path']} ...]"]
+            cleaned_lines = cleaned_lines + spill['tail']
+        else:
+            # Remove prompt lines and completion markers
+            cleaned_lines = []
+            for line in lines:
+                if not line.startswith('ai-workflow-bash:') and \
+                   'program execution done' not in line and \
+                   line.strip():
+                    cleaned_lines.append(line)
         
         # Classify output
         output_type = 'unknown'
@@ -127,26 +460,182 @@ class Phi3Simulator:
             summary = f"Command timed out"
         elif output_type == 'error':
             # Try to extract error info
-            error_indicators = ['error:', 'failed', 'cannot', 'permission denied']
-            for line in cleaned_lines[-10:]:  # Check last 10 lines
-                if any(indicator in line.lower() for indicator in error_indicators):
-                    summary = f"Error: {line.strip()}"
-                    break
+            if spill is not None and spill['first_error']:
+                summary = f"Error: {spill['first_error']}"
+            else:
+                for line in cleaned_lines[-10:]:  # Check last 10 lines
+                    if any(indicator in line.lower() for indicator in ERROR_INDICATORS):
+                        summary = f"Error: {line.strip()}"
+                        break
             if not summary:
                 summary = f"Command failed with exit code {completion_match}"
         
-        return {
-            'output_type': output_type,
-            'exit_code': completion_match,
-            'summary': summary,
-            'cleaned_output': '\n'.join(cleaned_lines),
-            'line_count': len(cleaned_lines)
-        }
+        result = CleanResult(
+            output_type=output_type,
+            exit_code=completion_match,
+            summary=summary,
+            cleaned_output='\n'.join(cleaned_lines),
+            line_count=spill['line_count'] if spill is not None else len(cleaned_lines)
+        )
+        if spill is not None:
+            result['spill_path'] = spill['path']
+        return result
+
+class PaneCommandQueue:
+    """Per-pane queue of marker-tagged commands
+    
+    Commands are typed into the pane as soon as there is room in the pipeline:
+    with pipeline_depth=1 the next command is sent the moment the previous
+    marker is seen; larger depths type ahead and results are demultiplexed
+    by marker id. Typed-ahead lines sit in the terminal's input queue, so a
+    running command that reads stdin (a pager, `read`, `cat`, an
+    interactive prompt) swallows them: only use pipeline_depth > 1 for
+    commands that do not read their input.
+    """
+    
+    def __init__(self, simulator: Phi3Simulator, pane: str, pipeline_depth: int = 1,
+                 on_complete: Optional[Callable[[CleanResult], None]] = None):
+        self.simulator = simulator
+        self.pane = pane
+        self.target = simulator.pane_mapping[pane]
+        self.pipeline_depth = max(1, pipeline_depth)
+        self.on_complete = on_complete
+        self.pending = []      # parsed-style dicts not yet sent
+        self.in_flight = []    # sent, marker not seen yet (oldest first)
+        self.results = {}      # marker_id -> cleaned result
+    
+    def submit(self, command: str, timeout_category: str = 'quick',
+               flood_guard: Optional[bool] = None) -> str:
+        """Queue a command, returning its marker id"""
+        marker_id = new_marker_id()
+        self.pending.append({
+            'pane': self.pane,
+            'command': command,
+            'timeout_category': timeout_category,
+            'timeout_seconds': self.simulator.timeout_defaults[timeout_category],
+            'marker_id': marker_id,
+            'flood_guard': flood_guard
+        })
+        return marker_id
+    
+    def send(self, pane_command: str):
+        """Type one line into the pane (literal keys, then Enter) in one tmux call"""
+        subprocess.run(self.simulator.tmux_command() + [
+            'send-keys', '-t', self.target, '-l', pane_command, ';',
+            'send-keys', '-t', self.target, 'Enter'], check=True)
+    
+    def capture(self) -> str:
+        """Capture the pane including scrollback, with wrapped lines joined"""
+        return subprocess.run(self.simulator.tmux_command() + [
+            'capture-pane', '-p', '-J', '-S', '-', '-t', self.target],
+            capture_output=True, text=True, check=True).stdout
+    
+    def _fill_pipeline(self):
+        while self.pending and len(self.in_flight) < self.pipeline_depth:
+            item = self.pending.pop(0)
+            pane_command = self.simulator.build_pane_command(
+                item['command'], item['marker_id'], item['timeout_category'], item['timeout_seconds'],
+                item['flood_guard'])
+            item['started'] = time.time()
+            self.send(pane_command)
+            self.in_flight.append(item)
+    
+    def pump(self) -> List[CleanResult]:
+        """Send what fits in the pipeline and collect finished commands"""
+        self._fill_pipeline()
+        if not self.in_flight:
+            return []
+        
+        outputs = self.simulator.split_command_outputs(self.capture())
+        finished = []
+        for item in list(self.in_flight):
+            output = outputs.get(item['marker_id'])
+            if output is None:
+                continue
+            result = self.simulator.clean_tmux_output(output, marker_id=item['marker_id'])
+            result.update({
+                'marker_id': item['marker_id'],
+                'session': self.simulator.session,
+                'pane': self.pane,
+                'command': item['command'],
+                'started': item['started'],
+                'finished': time.time()
+            })
+            self.in_flight.remove(item)
+            self.results[item['marker_id']] = result
+            finished.append(result)
+            if self.on_complete:
+                self.on_complete(result)
+        
+        if finished:
+            self._fill_pipeline()
+        return finished
+    
+    def run_all(self, poll_interval: float = 0.05, timeout: Optional[float] = None) -> Dict[str, CleanResult]:
+        """Drive the queue until every submitted command has finished"""
+        deadline = time.time() + timeout if timeout else None
+        while self.pending or self.in_flight:
+            if not self.pump() and (self.pending or self.in_flight):
+                if deadline and time.time() > deadline:
+                    raise TimeoutError(f"{len(self.pending) + len(self.in_flight)} commands "
+                                       f"still unfinished in {self.pane} pane")
+                time.sleep(poll_interval)
+        return self.results
+
+class DaemonHandler(socketserver.StreamRequestHandler):
+    """Newline-delimited JSON: one request per line, one response per line"""
+    
+    def handle(self):
+        for line in self.rfile:
+            if not line.strip():
+                continue
+            self.wfile.write(self.server.simulator.handle_line(line).encode())
+            self.wfile.flush()
+
+def make_server(socket_path: str, simulator: Optional[Phi3Simulator] = None):
+    """Bind the daemon's socket; the caller runs serve_forever()
+
+    Raises OSError(EADDRINUSE) if a daemon is already answering there.
+    """
+    if os.path.exists(socket_path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+        except OSError:
+            os.unlink(socket_path)  # stale socket from a previous daemon
+        else:
+            raise OSError(errno.EADDRINUSE, f"a phi3 daemon is already listening on {socket_path}")
+        finally:
+            probe.close()
+    server = socketserver.ThreadingUnixStreamServer(socket_path, DaemonHandler)
+    server.daemon_threads = True
+    server.simulator = simulator or Phi3Simulator()
+    return server
+
+def serve(socket_path: str, simulator: Optional[Phi3Simulator] = None):
+    """Run the resident simulator on a Unix socket until interrupted"""
+    try:
+        server = make_server(socket_path, simulator)
+    except OSError as e:
+        print(f"Error: {e.strerror}", file=sys.stderr)
+        sys.exit(1)
+    print(f"phi3 simulator listening on {socket_path}", file=sys.stderr, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
 
 def main():
     if len(sys.argv) < 2:
         print("Usage: ./phi3-simulator.py <natural_language_request>")
         print("       ./phi3-simulator.py --clean <raw_output_file>")
+        print("       ./phi3-simulator.py --clean <raw_output_file> --compact")
+        print("       ./phi3-simulator.py --batch   (daemon requests on stdin, one response line each)")
+        print("       ./phi3-simulator.py --serve [socket_path]   (resident mode, see phi3-client.py)")
         print()
         print("Examples:")
         print('  ./phi3-simulator.py "Run make clean in the top pane"')
@@ -156,7 +645,19 @@ def main():
     
     simulator = Phi3Simulator()
     
-    if sys.argv[1] == '--clean':
+    if sys.argv[1] == '--serve':
+        serve(sys.argv[2] if len(sys.argv) > 2 else default_socket_path(), simulator)
+        
+    elif sys.argv[1] == '--batch':
+        # Same requests and responses as the daemon, over stdin/stdout.
+        # Flushed per line so a shell coprocess can wait on each answer.
+        write, flush = sys.stdout.write, sys.stdout.flush
+        for line in iter(sys.stdin.buffer.readline, b''):
+            if line.strip():
+                write(simulator.handle_line(line))
+                flush()
+        
+    elif sys.argv[1] == '--clean':
         # Clean output mode
         if len(sys.argv) < 3:
             print("Error: --clean requires a file argument")
@@ -169,9 +670,12 @@ def main():
             print(f"Error: File {sys.argv[2]} not found")
             return
         
-        print("=== PHI3 OUTPUT CLEANING ===")
         cleaned = simulator.clean_tmux_output(raw_output)
-        print(json.dumps(cleaned, indent=2))
+        if '--compact' in sys.argv[3:]:
+            print(cleaned.to_json())
+            return
+        print("=== PHI3 OUTPUT CLEANING ===")
+        print(json.dumps(cleaned.to_dict(), indent=2))
         
     else:
         # Parse natural language mode
@@ -184,7 +688,7 @@ def main():
         # Step 1: Parse natural language
         parsed = simulator.parse_natural_language(request)
         print("Parsed structure:")
-        print(json.dumps(parsed, indent=2))
+        print(json.dumps(parsed.to_dict(), indent=2))
         print()
         
         # Step 2: Generate tmux command
@@ -22,6 +22,11 @@ phi3_spec = importlib.util.spec_from_file_location("phi3_simulator", "../phi3-si
 phi3_module = importlib.util.module_from_spec(phi3_spec)
 phi3_spec.loader.exec_module(phi3_module)
 
+replay_spec = importlib.util.spec_from_file_location(
+    "pane_replay", os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'pane-replay.py'))
+replay_module = importlib.util.module_from_spec(replay_spec)
+replay_spec.loader.exec_module(replay_module)
+
 class StressTester:
     def __init__(self):
         self.simulator = phi3_module.Phi3Simulator()
@@ -289,6 +294,33 @@ class StressTester:
         # Should not grow by more than 50MB
         return memory_growth < 50
     
+    def replay_load_test(self, num_panes=1000, commands_per_pane=3, speed=4.0):
+        """Drive many replayed panes through PaneCommandQueue, without tmux
+        
+        Replays $AI_WORKFLOW_REPLAY_TRACE (recorded with `pane-replay.py record`)
+        or a synthetic build/test/ls session.
+        """
+        print(f"📼 Replay load test: {num_panes} panes, {commands_per_pane} commands each...")
+        
+        trace_path = os.environ.get('AI_WORKFLOW_REPLAY_TRACE')
+        if trace_path:
+            trace = replay_module.Trace.load(trace_path)
+        else:
+            trace = replay_module.synthetic_trace([('make', 200, 3.0, 0), ('make test', 500, 8.0, 1),
+                                                   ('ls', 5, 0.05, 0)])
+        engine = replay_module.ReplayEngine(trace, num_panes, speed)
+        stats = replay_module.run_load(engine, commands_per_pane, timeout=300)
+        
+        print(f"✅ Replay load test completed:")
+        print(f"   Completed: {stats['completed']}/{stats['commands']}")
+        print(f"   Wall time: {stats['wall_seconds']:.2f}s (CPU {stats['cpu_seconds']:.2f}s)")
+        print(f"   Poll round p95: {stats['round_seconds']['p95']*1000:.0f}ms")
+        print(f"   Completion detection lag p95: {stats['detection_lag_seconds']['p95']*1000:.0f}ms")
+        print(f"   Output replayed: {stats['output_bytes'] / 1024 / 1024:.1f} MB")
+        print(f"   Peak RSS: {stats['max_rss_kb'] / 1024:.0f} MB")
+        
+        return stats['unfinished'] == 0 and stats['mismatched_exit_codes'] == 0
+    
     def run_all_stress_tests(self):
         """Run all stress tests"""
         print("🚀 Starting comprehensive stress test suite...")
@@ -299,7 +331,8 @@ class StressTester:
             ("Output Cleaning Stress Test", lambda: self.stress_test_output_cleaning(500)),
             ("Edge Cases Test", self.test_edge_cases),
             ("Concurrent Load Test", lambda: self.concurrent_load_test(10, 100)),
-            ("Memory Usage Test", self.memory_usage_test)
+            ("Memory Usage Test", self.memory_usage_test),
+            ("Replay Load Test", lambda: self.replay_load_test(1000, 3))
         ]
         
         passed = 0
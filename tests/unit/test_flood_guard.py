@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for flood-guard.py
+Covers spilling and throttling, the cleaner reading spill files, and a
+flood-guarded command driven through PaneCommandQueue in a live session
+"""
+
+import unittest
+import subprocess
+import io
+import json
+import os
+
+import importlib.util
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+guard_spec = importlib.util.spec_from_file_location("flood_guard", "../../flood-guard.py")
+guard_module = importlib.util.module_from_spec(guard_spec)
+guard_spec.loader.exec_module(guard_module)
+
+phi3_spec = importlib.util.spec_from_file_location("phi3_simulator", "../phi3-simulator.py")
+phi3 = importlib.util.module_from_spec(phi3_spec)
+phi3_spec.loader.exec_module(phi3)
+
+
+class TestGuard(unittest.TestCase):
+    """Test spilling output and throttling what reaches the pane"""
+
+    def setUp(self):
+        self.spill = os.path.join(fixtures.temp_dir(self), 'spill', 'cmd.log')
+        self.old_rate = guard_module.FLOOD_RATE
+        guard_module.FLOOD_RATE = 100
+
+    def tearDown(self):
+        guard_module.FLOOD_RATE = self.old_rate
+
+    def test_flood_is_spilled_and_throttled(self):
+        """Every line goes to the spill file; the pane gets progress and the tail"""
+        out = io.BytesIO()
+        exit_code = guard_module.guard(self.spill, 'seq 1 50000; echo "error: boom" >&2; exit 3', out)
+        self.assertEqual(exit_code, 3)
+
+        with open(self.spill, 'rb') as f:
+            spilled = f.read().splitlines()
+        self.assertEqual(len(spilled), 50001)
+        self.assertEqual(spilled[-1], b'error: boom')
+
+        shown = out.getvalue().decode()
+        self.assertLess(len(shown.splitlines()), 1000)
+        self.assertIn(f'full output in {self.spill}', shown)
+        self.assertIn('50000\nerror: boom\n', shown)
+
+        with open(self.spill + '.status') as f:
+            status = json.load(f)
+        self.assertEqual((status['exit_code'], status['lines'], status['flooded']), (3, 50001, True))
+
+    def test_quiet_output_passes_through(self):
+        """Below the rate the pane sees exactly what the command printed"""
+        out = io.BytesIO()
+        self.assertEqual(guard_module.guard(self.spill, 'echo one; echo two', out), 0)
+        self.assertEqual(out.getvalue(), b'one\ntwo\n')
+        with open(self.spill + '.status') as f:
+            self.assertFalse(json.load(f)['flooded'])
+
+    def test_command_sees_a_terminal(self):
+        """Under a pty the command still sees a TTY and the spill keeps plain line ends"""
+        out = io.BytesIO()
+        self.assertEqual(guard_module.guard(self.spill, 'test -t 1 && test -t 2 && echo tty', out, tty=True), 0)
+        self.assertEqual(out.getvalue(), b'tty\n')
+        with open(self.spill, 'rb') as f:
+            self.assertEqual(f.read(), b'tty\n')
+        self.assertEqual(guard_module.guard(self.spill, 'test -t 1', io.BytesIO(), tty=False), 1)
+
+    def test_old_spills_are_pruned(self):
+        """Only the newest spills, and their .status files, are kept"""
+        spill_dir = os.path.dirname(self.spill)
+        os.makedirs(spill_dir)
+        for age, name in enumerate(('c', 'b', 'a')):
+            for suffix in ('.log', '.log.status'):
+                path = os.path.join(spill_dir, name + suffix)
+                with open(path, 'w') as f:
+                    f.write('x' * 100)
+                os.utime(path, (1000 - age, 1000 - age))
+        guard_module.prune_spills(spill_dir, keep=2)
+        self.assertEqual(sorted(os.listdir(spill_dir)), ['b.log', 'b.log.status', 'c.log', 'c.log.status'])
+        guard_module.prune_spills(spill_dir, keep=2, limit=150)
+        self.assertEqual(sorted(os.listdir(spill_dir)), ['c.log', 'c.log.status'])
+
+
+class TestSpillCleaning(unittest.TestCase):
+    """Test clean_tmux_output on flood-guarded commands"""
+
+    def setUp(self):
+        fixtures.set_env(self, AI_WORKFLOW_STATE_DIR=fixtures.temp_dir(self),
+                         AI_WORKFLOW_SPILL_DIR=fixtures.temp_dir(self))
+        self.simulator = phi3.Phi3Simulator()
+
+    def test_lost_marker_uses_spill_status(self):
+        """With nothing left in the pane, the spill file still gives the result"""
+        marker_id = phi3.new_marker_id()
+        guard_module.guard(self.simulator.spill_path(marker_id),
+                           'seq 1 5000; echo "cc: cannot open foo.c"; seq 1 5000; exit 2', io.BytesIO())
+        result = self.simulator.clean_tmux_output('', marker_id=marker_id)
+
+        self.assertEqual(result['output_type'], 'error')
+        self.assertEqual(result['exit_code'], 2)
+        self.assertEqual(result['summary'], 'Error: cc: cannot open foo.c')
+        self.assertEqual(result['line_count'], 10001)
+        self.assertEqual(result['spill_path'], self.simulator.spill_path(marker_id))
+        lines = result['cleaned_output'].split('\n')
+        self.assertEqual(len(lines), phi3.SPILL_HEAD_LINES + 1 + phi3.SPILL_TAIL_LINES)
+        self.assertEqual(lines[phi3.SPILL_HEAD_LINES],
+                         f"[... 9851 lines omitted, full output in {result['spill_path']} ...]")
+
+    def test_terminal_output_is_cleaned(self):
+        """Colours and carriage-return progress redraws from a pty do not reach the result"""
+        marker_id = phi3.new_marker_id()
+        guard_module.guard(self.simulator.spill_path(marker_id),
+                           "printf 'x.c:1: \\033[01;31merror:\\033[m bad\\n'; "
+                           "printf '10%%\\r50%%\\r100%%\\n'; "
+                           "echo root | grep --color=always root; exit 1", io.BytesIO(), tty=True)
+        result = self.simulator.clean_tmux_output('', marker_id=marker_id)
+
+        self.assertEqual(result['summary'], 'Error: x.c:1: error: bad')
+        self.assertEqual(result['cleaned_output'], 'x.c:1: error: bad\n100%\nroot')
+        self.assertNotIn('\x1b', result['cleaned_output'])
+
+    def test_pane_command_keeps_marker(self):
+        """The guarded line still prints the command's status in the tagged marker"""
+        marker_id = phi3.new_marker_id()
+        pane_command = self.simulator.build_pane_command('seq 1 100; false', marker_id, flood_guard=True)
+        self.assertIn(self.simulator.spill_path(marker_id), pane_command)
+        output = subprocess.run(['bash', '-c', pane_command], capture_output=True, text=True).stdout
+
+        result = self.simulator.clean_tmux_output(output, marker_id=marker_id)
+        self.assertEqual(result['exit_code'], 1)
+        self.assertEqual(result['line_count'], 100)
+        self.assertTrue(result['cleaned_output'].startswith('1\n2\n'))
+
+    def test_docker_panes_use_workspace_paths(self):
+        """Docker panes get /workspace paths, or no guard when a path is outside the workspace"""
+        state_dir = os.environ['AI_WORKFLOW_STATE_DIR']
+        fixtures.set_env(self, AI_WORKFLOW_SPILL_DIR=None)
+        simulator = phi3.Phi3Simulator()
+        with open(simulator.context_path, 'w') as f:
+            json.dump({'context': 'docker', 'workspace': os.path.dirname(state_dir), 'mount': '/workspace'}, f)
+        self.assertIsNone(simulator.pane_path(phi3.FLOOD_GUARD))
+        self.assertNotIn('flood-guard.py', simulator.build_pane_command('make', 'ab12cd34', flood_guard=True))
+
+        with open(simulator.context_path, 'w') as f:
+            json.dump({'context': 'docker', 'workspace': '/', 'mount': '/workspace'}, f)
+        pane_command = simulator.build_pane_command('make', 'ab12cd34', flood_guard=True)
+        self.assertIn(f"python3 /workspace{phi3.FLOOD_GUARD} /workspace{state_dir}/spill/ab12cd34.log make",
+                      pane_command)
+
+    def test_categories_from_environment(self):
+        """$AI_WORKFLOW_FLOOD_GUARD picks the categories guarded by default"""
+        fixtures.set_env(self, AI_WORKFLOW_FLOOD_GUARD='build, test')
+        simulator = phi3.Phi3Simulator()
+        self.assertIn('flood-guard.py', simulator.build_pane_command('make', 'ab12cd34', 'build', 300))
+        self.assertNotIn('flood-guard.py', simulator.build_pane_command('ls', 'ab12cd34', 'quick'))
+        self.assertNotIn('flood-guard.py', simulator.build_pane_command('make', 'ab12cd34', 'build', 300,
+                                                                        flood_guard=False))
+
+
+class TestLiveFlood(fixtures.LiveSessionTestCase):
+    """Test a flooding command in a session created by setup-workflow.sh"""
+
+    def test_flood_in_pane(self):
+        """The queue sees the marker and the result covers every line printed"""
+        simulator = phi3.Phi3Simulator()
+        queue = phi3.PaneCommandQueue(simulator, 'bottom')
+        marker_id = queue.submit('seq 1 200000; ls /nonexistent', flood_guard=True)
+        result = queue.run_all(timeout=30)[marker_id]
+
+        self.assertEqual(result['output_type'], 'error')
+        self.assertEqual(result['exit_code'], 2)
+        self.assertEqual(result['line_count'], 200001)
+        self.assertIn('No such file or directory', result['summary'] + result['cleaned_output'])
+        self.assertTrue(result['spill_path'].startswith(self.state_dir))
+        with open(os.path.join(self.state_dir, 'panes.json')) as f:
+            self.assertEqual(json.load(f), {'context': 'native'})
+
+
+if __name__ == '__main__':
+    unittest.main()
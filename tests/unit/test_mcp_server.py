@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for mcp-server.py
+Runs the SSE service in-process against a private tmux server
+"""
+
+import unittest
+import asyncio
+import subprocess
+import json
+import os
+import signal
+
+import importlib.util
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+mcp_spec = importlib.util.spec_from_file_location("mcp_server", "../../mcp-server.py")
+mcp_module = importlib.util.module_from_spec(mcp_spec)
+mcp_spec.loader.exec_module(mcp_module)
+
+
+class SseClient:
+    """Minimal MCP SSE client: one event stream plus POSTed messages"""
+    
+    def __init__(self, port):
+        self.port = port
+        self.next_id = 0
+    
+    async def connect(self):
+        self.reader, self.writer = await asyncio.open_connection('127.0.0.1', self.port)
+        self.writer.write(b'GET /sse HTTP/1.1\r\nHost: localhost\r\n\r\n')
+        while (await self.reader.readline()).strip():
+            pass
+        event = await self.read_event()
+        self.endpoint = event['data']
+    
+    async def read_event(self):
+        event = {}
+        while True:
+            line = (await self.reader.readline()).decode().rstrip('\n')
+            if not line:
+                return event
+            key, _, value = line.partition(': ')
+            event[key] = value
+    
+    async def post(self, message):
+        body = json.dumps(message).encode()
+        reader, writer = await asyncio.open_connection('127.0.0.1', self.port)
+        writer.write(f'POST {self.endpoint} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n'.encode() + body)
+        status = await reader.readline()
+        writer.close()
+        return status
+    
+    async def request(self, method, params=None):
+        """Send a request, returning (response, notifications received before it)"""
+        self.next_id += 1
+        status = await self.post({'jsonrpc': '2.0', 'id': self.next_id, 'method': method, 'params': params or {}})
+        assert b'202' in status, status
+        notifications = []
+        while True:
+            message = json.loads((await self.read_event())['data'])
+            if message.get('id') == self.next_id:
+                return message, notifications
+            notifications.append(message)
+    
+    async def call_tool(self, name, arguments):
+        response, notifications = await self.request('tools/call', {
+            'name': name, 'arguments': arguments, '_meta': {'progressToken': f'{name}-{self.next_id}'}})
+        result = response['result']
+        text = result['content'][0]['text']
+        return (text if result['isError'] else json.loads(text)), result['isError'], notifications
+    
+    def close(self):
+        self.writer.close()
+
+
+class TestMcpServer(fixtures.PrivateTmuxTestCase):
+    """Test MCP tools over SSE with several concurrent clients"""
+    
+    def setUp(self):
+        super().setUp()
+        self.create_session()
+    
+    def create_session(self):
+        shell = 'bash --norc --noprofile'
+        subprocess.run(['tmux', 'new-session', '-d', '-s', 'ai-workflow', '-x', '200', '-y', '50', shell, ';',
+                        'set-option', '-g', 'default-command', shell, ';',
+                        'split-window', '-h', ';',
+                        'split-window', '-v', '-t', 'ai-workflow:0.1'], check=True)
+    
+    def run_with_server(self, scenario):
+        async def runner():
+            server = self.server = mcp_module.WorkflowMcpServer()
+            http = await asyncio.start_server(server.handle_http, '127.0.0.1', 0)
+            port = http.sockets[0].getsockname()[1]
+            try:
+                return await asyncio.wait_for(scenario(port), 20)
+            finally:
+                http.close()
+                await server.close()
+        return asyncio.run(runner())
+    
+    def test_initialize_and_list_tools(self):
+        """The service announces the four pane tools"""
+        async def scenario(port):
+            client = SseClient(port)
+            await client.connect()
+            init, _ = await client.request('initialize', {'protocolVersion': '2024-11-05'})
+            tools, _ = await client.request('tools/list')
+            client.close()
+            return init, tools
+        
+        init, tools = self.run_with_server(scenario)
+        self.assertEqual(init['result']['serverInfo']['name'], 'ai-workflow')
+        self.assertEqual({tool['name'] for tool in tools['result']['tools']},
+                         {'run_in_pane', 'capture_pane', 'clean_output', 'recover_pane'})
+    
+    def test_concurrent_clients_run_commands(self):
+        """Two clients run commands in different panes over one connection"""
+        async def scenario(port):
+            clients = [SseClient(port), SseClient(port)]
+            for client in clients:
+                await client.connect()
+            results = await asyncio.gather(
+                clients[0].call_tool('run_in_pane', {'pane': 'left', 'command': 'echo left-done'}),
+                clients[1].call_tool('run_in_pane', {'pane': 'top', 'command': 'echo top-done; false'}))
+            for client in clients:
+                client.close()
+            return results
+        
+        (left, left_error, left_progress), (top, _, _) = self.run_with_server(scenario)
+        
+        self.assertFalse(left_error, left)
+        self.assertEqual(left['output_type'], 'success')
+        self.assertIn('left-done', left['cleaned_output'])
+        self.assertEqual(top['exit_code'], 1)
+        self.assertIn('top-done', top['cleaned_output'])
+        self.assertTrue(any(note['method'] == 'notifications/progress' for note in left_progress))
+    
+    def test_clean_output_tool(self):
+        """clean_output runs the phi3 cleaner server-side"""
+        async def scenario(port):
+            client = SseClient(port)
+            await client.connect()
+            result = await client.call_tool('clean_output', {
+                'raw_output': 'ai-workflow-bash:left $ make\nok\nprogram execution done. exit_code=0'})
+            client.close()
+            return result
+        
+        result, is_error, _ = self.run_with_server(scenario)
+        self.assertFalse(is_error)
+        self.assertEqual(result['output_type'], 'success')
+    
+    def test_recover_pane_tool(self):
+        """recover_pane interrupts a hung command and restores the prompt"""
+        subprocess.run(['tmux', 'send-keys', '-t', 'ai-workflow:0.2', 'sleep 100', 'Enter'], check=True)
+        
+        async def scenario(port):
+            client = SseClient(port)
+            await client.connect()
+            result = await client.call_tool('recover_pane', {'pane': 'bottom'})
+            screen = await client.call_tool('capture_pane', {'pane': 'bottom', 'lines': 5})
+            client.close()
+            return result, screen
+        
+        (result, _, _), (screen, _, _) = self.run_with_server(scenario)
+        self.assertTrue(result['recovered'])
+        self.assertIn('ai-workflow-bash:bottom $', screen['output'])
+    
+    def test_dispatches_are_held_until_done(self):
+        """Running tool calls are referenced by the server and dropped when answered"""
+        async def scenario(port):
+            client = SseClient(port)
+            await client.connect()
+            await client.post({'jsonrpc': '2.0', 'id': 1, 'method': 'tools/call',
+                               'params': {'name': 'run_in_pane',
+                                          'arguments': {'pane': 'left', 'command': 'sleep 0.3'}}})
+            await asyncio.sleep(0.1)
+            running = len(self.server.tasks)
+            while json.loads((await client.read_event())['data']).get('id') != 1:
+                pass
+            await asyncio.sleep(0)
+            client.close()
+            return running, len(self.server.tasks)
+        
+        running, finished = self.run_with_server(scenario)
+        self.assertEqual((running, finished), (1, 0))
+        self.assertEqual(list(self.server.pane_locks), [(None, 'ai-workflow:0.0')])
+    
+    def test_reconnects_after_server_restart(self):
+        """A control client whose tmux server died is replaced on the next call"""
+        async def scenario(port):
+            client = SseClient(port)
+            await client.connect()
+            await client.call_tool('capture_pane', {'pane': 'left'})
+            old = self.server.controls[(None, 'ai-workflow')]
+            
+            # What setup-workflow.sh --cold-start does to the session's server
+            fixtures.kill_server()
+            self.create_session()
+            await asyncio.wait_for(asyncio.shield(old.reader_task), 5)
+            
+            result = await client.call_tool('run_in_pane', {'pane': 'top', 'command': 'echo after-restart'})
+            client.close()
+            return old, result
+        
+        old, (result, is_error, _) = self.run_with_server(scenario)
+        self.assertFalse(is_error, result)
+        self.assertIn('after-restart', result['cleaned_output'])
+        self.assertIsNot(self.server.controls[(None, 'ai-workflow')], old)
+    
+    def test_failed_attach_is_cleaned_up(self):
+        """A control client that cannot attach leaves no process or task behind"""
+        server_pid = int(subprocess.check_output(['tmux', 'display-message', '-p', '#{pid}'], text=True))
+        clients = []
+        
+        class HangingClient(mcp_module.TmuxControlClient):
+            def __init__(self, *args):
+                super().__init__(*args)
+                self.attach_timeout = 0.5
+                clients.append(self)
+        
+        async def scenario():
+            server = mcp_module.WorkflowMcpServer()
+            with self.assertRaises(asyncio.TimeoutError):
+                await server.control(None, None)
+            await asyncio.sleep(0.1)
+            leftover = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+            return server.controls, leftover, clients[0].process.returncode
+        
+        original = mcp_module.TmuxControlClient
+        mcp_module.TmuxControlClient = HangingClient
+        # A stopped server never answers the attach
+        os.kill(server_pid, signal.SIGSTOP)
+        try:
+            controls, leftover, returncode = asyncio.run(scenario())
+        finally:
+            os.kill(server_pid, signal.SIGCONT)
+            mcp_module.TmuxControlClient = original
+        
+        self.assertEqual(controls, {})
+        self.assertEqual(leftover, [])
+        self.assertIsNotNone(returncode)
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for pane-history.py
+Covers recording, full-text search with filters and syncing pane journals
+"""
+
+import unittest
+import subprocess
+import sqlite3
+import os
+import time
+
+import importlib.util
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+history_spec = importlib.util.spec_from_file_location("pane_history", "../../pane-history.py")
+history_module = importlib.util.module_from_spec(history_spec)
+history_spec.loader.exec_module(history_module)
+
+journal_spec = importlib.util.spec_from_file_location("pane_journal", "../../pane-journal.py")
+journal_module = importlib.util.module_from_spec(journal_spec)
+journal_spec.loader.exec_module(journal_module)
+
+
+def make_result(marker_id, command, output, exit_code, pane='top', finished=None):
+    finished = finished or time.time()
+    return {
+        'marker_id': marker_id,
+        'pane': pane,
+        'command': command,
+        'cleaned_output': output,
+        'exit_code': exit_code,
+        'output_type': 'success' if exit_code == 0 else 'error',
+        'summary': '',
+        'started': finished - 2.5,
+        'finished': finished
+    }
+
+
+class TestHistoryIndex(unittest.TestCase):
+    """Test the SQLite history store"""
+    
+    def setUp(self):
+        self.index = history_module.HistoryIndex(os.path.join(fixtures.temp_dir(self), 'history.db'))
+        now = time.time()
+        self.index.record(make_result('a1', 'make test', 'test_parser ... FAILED\nSegmentation fault', 2,
+                                      finished=now - 7200))
+        self.index.record(make_result('a2', 'make test', 'all 42 tests passed', 0, finished=now - 60))
+        self.index.record(make_result('a3', 'npm run build', 'error: cannot find module left-pad', 1,
+                                      pane='left', finished=now - 30))
+    
+    def tearDown(self):
+        self.index.close()
+    
+    def test_full_text_search(self):
+        """Words in the output find the command that printed them"""
+        results = self.index.search('segmentation')
+        self.assertEqual([result['marker_id'] for result in results], ['a1'])
+        self.assertEqual(results[0]['duration'], 2.5)
+    
+    def test_filters(self):
+        """Pane, failure and time filters narrow the results, newest first"""
+        self.assertEqual([r['marker_id'] for r in self.index.search('make', failed=True)], ['a1'])
+        self.assertEqual([r['marker_id'] for r in self.index.search(failed=True)], ['a3', 'a1'])
+        self.assertEqual([r['marker_id'] for r in self.index.search(pane='left')], ['a3'])
+        self.assertEqual([r['marker_id'] for r in self.index.search('test', since=time.time() - 600)], ['a2'])
+        self.assertEqual([r['marker_id'] for r in self.index.search(exit_code=0)], ['a2'])
+    
+    def test_rerecord_updates_entry(self):
+        """Recording the same marker id again replaces its result"""
+        self.index.record(make_result('a3', 'npm run build', 'built in 3s', 0, pane='left'))
+        self.assertEqual(self.index.get('a3')['exit_code'], 0)
+        self.assertEqual(self.index.search('"left-pad"'), [])
+        self.assertEqual(len(self.index.search('built')), 1)
+    
+    def test_punctuation_is_matched_literally(self):
+        """Queries copied from tool output search as text, not FTS5 syntax"""
+        self.index.record(make_result('b1', 'make all', "make: *** [all] Error 2", 2))
+        self.index.record(make_result('b2', 'pytest', "KeyError: 'foo'\nrun test-suite again", 1))
+        for query, expected in (('make: ***', ['b1', 'a2', 'a1']), ("KeyError: 'foo'", ['b2']),
+                                ('test-suite', ['b2']), ('[all] Error', ['b1']), ('***', ['b1']),
+                                ('"left-pad', ['a3']), ('NOT', [])):
+            with self.subTest(query=query):
+                self.assertEqual([r['marker_id'] for r in self.index.search(query)], expected)
+    
+    def test_raw_query(self):
+        """raw=True takes FTS5 syntax and reports malformed queries"""
+        results = self.index.search('segment* OR left', raw=True)
+        self.assertEqual([r['marker_id'] for r in results], ['a3', 'a1'])
+        with self.assertRaises(sqlite3.OperationalError):
+            self.index.search('make: ***', raw=True)
+    
+    def test_cli_search_with_punctuation(self):
+        """The CLI searches punctuated text and rejects bad raw queries cleanly"""
+        env = dict(os.environ, AI_WORKFLOW_HISTORY=self.index.path)
+        run = lambda *args: subprocess.run(['python3', '../../pane-history.py', 'search', *args],
+                                           env=env, capture_output=True, text=True)
+        found = run('cannot find module left-pad')
+        self.assertEqual(found.returncode, 0, found.stderr)
+        self.assertIn('"a3"', found.stdout)
+        bad = run('--raw', 'make: ***')
+        self.assertEqual(bad.returncode, 1)
+        self.assertIn('Error: invalid FTS5 query', bad.stdout)
+        self.assertNotIn('Traceback', bad.stderr)
+
+
+class TestJournalSync(unittest.TestCase):
+    """Test indexing commands from a pane journal"""
+    
+    def setUp(self):
+        self.journal_dir = fixtures.temp_dir(self)
+        self.writer = journal_module.JournalWriter(self.journal_dir, 'bottom')
+        self.index = history_module.HistoryIndex(os.path.join(fixtures.temp_dir(self), 'history.db'))
+    
+    def tearDown(self):
+        self.writer.close()
+        self.index.close()
+    
+    def run_command(self, command, output, exit_code, marker_id):
+        self.writer.append(f'ai-workflow-bash:bottom $ {command} ; printf "\\nprogram execution done. '
+                           f'exit_code=%s id=%s\\n" $? {marker_id}\r\n'.encode())
+        self.writer.append(f'{output}\r\n\r\nprogram execution done. exit_code={exit_code} '
+                           f'id={marker_id}\r\nai-workflow-bash:bottom $ '.encode())
+    
+    def test_sync_is_incremental(self):
+        """Each journaled command is indexed once, with its typed command line"""
+        self.run_command('pytest -x', 'E   KeyError: session', 1, 'b1')
+        self.assertEqual(self.index.sync_journal(self.journal_dir, 'bottom'), 1)
+        self.assertEqual(self.index.sync_journal(self.journal_dir, 'bottom'), 0)
+        
+        self.run_command('git status', 'nothing to commit', 0, 'b2')
+        self.assertEqual(self.index.sync_journal(self.journal_dir, 'bottom'), 1)
+        
+        result = self.index.search('KeyError')[0]
+        self.assertEqual(result['command'], 'pytest -x')
+        self.assertEqual(result['pane'], 'bottom')
+        self.assertEqual(result['exit_code'], 1)
+        self.assertIsNotNone(result['duration'])
+        self.assertEqual(self.index.get('b2')['output'], 'nothing to commit')
+
+
+if __name__ == '__main__':
+    unittest.main()
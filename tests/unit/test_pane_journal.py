@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for pane-journal.py
+Covers segment rotation, marker offsets and journaling of a live session
+"""
+
+import unittest
+import subprocess
+import os
+import time
+
+import importlib.util
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+journal_spec = importlib.util.spec_from_file_location("pane_journal", "../../pane-journal.py")
+journal_module = importlib.util.module_from_spec(journal_spec)
+journal_spec.loader.exec_module(journal_module)
+
+common_spec = importlib.util.spec_from_file_location("workflow_common", "../../workflow_common.py")
+common_module = importlib.util.module_from_spec(common_spec)
+common_spec.loader.exec_module(common_module)
+
+phi3_spec = importlib.util.spec_from_file_location("phi3_simulator", "../phi3-simulator.py")
+phi3_module = importlib.util.module_from_spec(phi3_spec)
+phi3_spec.loader.exec_module(phi3_module)
+
+
+class TestJournal(unittest.TestCase):
+    """Test the writer and reader on scripted pane output"""
+    
+    def setUp(self):
+        self.journal_dir = fixtures.temp_dir(self)
+        self.writer = journal_module.JournalWriter(self.journal_dir, 'top', segment_size=64, max_segments=3)
+        self.journal = journal_module.PaneJournal(self.journal_dir, 'top')
+    
+    def tearDown(self):
+        self.writer.close()
+    
+    def test_marker_offsets_bound_one_command(self):
+        """Each marker is indexed with exactly its command's byte range"""
+        # Large enough segments that the first command is not rotated away
+        self.writer.close()
+        self.writer = journal_module.JournalWriter(self.journal_dir, 'top')
+        self.writer.append(b'$ make ; printf "\\n... id=%s\\n" $? 0a1b2c3d\r\nbuilding\r\n\r\n')
+        self.writer.append(b'program execution done. exit_code=2 id=0a1b2c3d\r\n$ ')
+        self.writer.append(b'ls ; printf "..." $? 99aa88bb\r\nfile.txt\r\n\r\nprogram execution ')
+        self.writer.append(b'done. exit_code=0 id=99aa88bb\r\n$ ')
+        
+        entries = self.journal.commands()
+        self.assertEqual([(entry['id'], entry['exit_code']) for entry in entries],
+                         [('0a1b2c3d', 2), ('99aa88bb', 0)])
+        
+        text = self.journal.command_text('99aa88bb')
+        self.assertTrue(text.startswith('$ ls ; printf'))
+        self.assertIn('file.txt', text)
+        self.assertNotIn('building', text)
+        self.assertTrue(text.rstrip().endswith('exit_code=0 id=99aa88bb'))
+    
+    def test_segments_rotate_as_a_ring(self):
+        """Old segments are dropped once more than max_segments exist"""
+        for n in range(10):
+            self.writer.append(b'%02d' % n + b'x' * 30)
+        
+        segments = self.journal.segments()
+        self.assertEqual(len(segments), 3)
+        self.assertTrue(all(os.path.getsize(path) <= 64 for _, path in segments))
+        self.assertEqual(self.journal.end_offset, 320)
+        self.assertEqual(self.journal.start_offset, 128)
+        self.assertTrue(self.journal.read(self.journal.end_offset - 32).startswith(b'09'))
+    
+    def test_read_spans_segments(self):
+        """A range crossing a segment boundary reads back contiguously"""
+        data = bytes(range(48, 48 + 70))
+        self.writer.append(data)
+        self.assertEqual(self.journal.read(50, 70), data[50:70])
+    
+    def test_rotated_command_is_unavailable(self):
+        """A command whose output has been rotated away leaves the index too"""
+        self.writer.append(b'x $? 11111111\r\nout\r\nprogram execution done. exit_code=0 id=11111111\r\n')
+        self.assertIsNotNone(self.journal.command('11111111'))
+        for _ in range(6):
+            self.writer.append(b'y' * 60)
+        self.assertIsNone(self.journal.command('11111111'))
+        self.assertIsNone(self.journal.command_output('11111111'))
+        with open(os.path.join(self.journal_dir, 'top.index')) as index:
+            self.assertEqual(index.read(), '')
+    
+    def test_index_is_bounded_and_read_incrementally(self):
+        """The index holds only commands still on disk; lookups parse only new lines"""
+        for n in range(40):
+            marker_id = '%08x' % n
+            self.writer.append(b'$? %s\r\nprogram execution done. exit_code=0 id=%s\r\n'
+                               % (marker_id.encode(), marker_id.encode()))
+            self.assertEqual(self.journal.command(marker_id)['id'], marker_id)
+        
+        entries = self.journal.commands()
+        self.assertLess(len(entries), 10)
+        self.assertGreaterEqual(entries[0]['start'], self.journal.start_offset)
+        self.assertEqual(entries[-1]['id'], '%08x' % 39)
+        with open(os.path.join(self.journal_dir, 'top.index')) as index:
+            self.assertEqual(len(index.readlines()), len(entries))
+        self.assertEqual(self.journal.index_position,
+                         os.path.getsize(os.path.join(self.journal_dir, 'top.index')))
+    
+    def test_writer_resumes_offsets(self):
+        """A new recorder continues the logical offsets of the last one"""
+        self.writer.append(b'a' * 40)
+        self.writer.close()
+        writer = journal_module.JournalWriter(self.journal_dir, 'top', segment_size=64, max_segments=3)
+        start, end = writer.append(b'b' * 40)
+        writer.close()
+        self.assertEqual((start, end), (40, 80))
+        self.assertEqual(self.journal.read(30, 50), b'a' * 10 + b'b' * 10)
+    
+    def test_mapped_yields_views_without_copying(self):
+        """mapped() hands out memoryviews per segment, released on exit"""
+        data = bytes(range(48, 48 + 70))
+        self.writer.append(data)
+        with self.journal.mapped(50, 70) as views:
+            self.assertEqual(len(views), 2)
+            self.assertTrue(all(isinstance(view, memoryview) for view in views))
+            self.assertEqual(b''.join(views), data[50:70])
+        with self.assertRaises(ValueError):
+            views[0].tobytes()
+
+
+class TestStream(unittest.TestCase):
+    """Test the capped pane stream and its follower"""
+    
+    def setUp(self):
+        self.path = os.path.join(fixtures.temp_dir(self), 'top.stream')
+        self.writer = common_module.StreamWriter(self.path, limit=100)
+    
+    def tearDown(self):
+        self.writer.close()
+    
+    def test_stream_is_capped(self):
+        """The stream rotates to <pane>.stream.1 instead of growing past the limit"""
+        for n in range(20):
+            self.writer.append(b'%02d' % n + b'x' * 28)
+        self.assertLessEqual(os.path.getsize(self.path), 100)
+        self.assertLessEqual(os.path.getsize(self.path + '.1'), 100)
+        self.assertEqual(sorted(os.listdir(os.path.dirname(self.path))), ['top.stream', 'top.stream.1'])
+    
+    def test_follower_reads_across_rotation(self):
+        """Nothing is lost or repeated when the stream rotates between reads"""
+        follower = common_module.StreamFollower(self.path)
+        self.writer.append(b'a' * 60)
+        self.assertEqual(follower.read(), b'a' * 60)
+        self.writer.append(b'b' * 30)
+        self.writer.append(b'c' * 30)
+        self.assertEqual(follower.read(), b'b' * 30 + b'c' * 30)
+        self.assertFalse(follower.restarted)
+        self.assertEqual(follower.read(), b'')
+    
+    def test_follower_restarts_after_truncation(self):
+        """A stream truncated in place is reported and read from the start"""
+        follower = common_module.StreamFollower(self.path)
+        self.writer.append(b'a' * 60)
+        follower.read()
+        with open(self.path, 'wb') as f:
+            f.write(b'new')
+        self.assertEqual(follower.read(), b'new')
+        self.assertTrue(follower.restarted)
+
+
+class TestLiveJournal(fixtures.LiveSessionTestCase):
+    """Test journaling of a session created by setup-workflow.sh"""
+    
+    def setUp(self):
+        super().setUp()
+        self.journal = journal_module.PaneJournal(os.path.join(self.state_dir, 'journal'), 'bottom')
+    
+    def wait_for_command(self, marker_id, timeout=10):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            if self.journal.command(marker_id):
+                return True
+            time.sleep(0.05)
+        return False
+    
+    def test_output_survives_clear(self):
+        """A command's output is cleanable from the journal after the pane is cleared"""
+        simulator = phi3_module.Phi3Simulator()
+        marker_id = phi3_module.new_marker_id()
+        line = simulator.build_pane_command('echo journal-$((40 + 2)); false', marker_id)
+        subprocess.run(['tmux', 'send-keys', '-t', 'ai-workflow:0.2', '-l', line, ';',
+                        'send-keys', '-t', 'ai-workflow:0.2', 'Enter'], env=self.env, check=True)
+        self.assertTrue(self.wait_for_command(marker_id))
+        
+        subprocess.run(['tmux', 'send-keys', '-t', 'ai-workflow:0.2', 'clear', 'Enter', ';',
+                        'clear-history', '-t', 'ai-workflow:0.2'], env=self.env, check=True)
+        
+        result = simulator.clean_tmux_output(self.journal.command_text(marker_id), marker_id=marker_id)
+        self.assertEqual(result['exit_code'], 1)
+        self.assertIn('journal-42', result['cleaned_output'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for pane-listener.py readiness signaling
+Covers OSC 133 marker parsing and the live state table over real pane streams
+"""
+
+import unittest
+import subprocess
+import time
+
+import importlib.util
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+listener_spec = importlib.util.spec_from_file_location("pane_listener", "../../pane-listener.py")
+listener_module = importlib.util.module_from_spec(listener_spec)
+listener_spec.loader.exec_module(listener_module)
+
+
+class TestMarkerParsing(unittest.TestCase):
+    """Test OSC 133 marker handling on raw byte chunks"""
+    
+    def setUp(self):
+        self.listener = listener_module.PaneListener(fixtures.temp_dir(self))
+    
+    def test_command_lifecycle(self):
+        """C then D;status then A gives a ready pane with the exit code"""
+        self.listener.feed('top', b'\x1b]133;A\x07prompt $ ')
+        self.assertEqual(self.listener.states['top']['state'], 'ready')
+        
+        self.listener.feed('top', b'make\r\n\x1b]133;C\x07building...\r\n')
+        self.assertEqual(self.listener.states['top']['state'], 'running')
+        
+        self.listener.feed('top', b'\x1b]133;D;2\x07\x1b]133;A\x07prompt $ ')
+        state = self.listener.states['top']
+        self.assertEqual(state['state'], 'ready')
+        self.assertEqual(state['exit_code'], 2)
+        self.assertEqual(state['commands'], 1)
+        self.assertIsNotNone(state['last_duration'])
+    
+    def test_marker_split_across_chunks(self):
+        """A marker cut in half by a read boundary is still recognised"""
+        self.listener.feed('left', b'output\x1b]13')
+        self.listener.feed('left', b'3;A\x07')
+        self.assertEqual(self.listener.states['left']['state'], 'ready')
+    
+    def test_initial_finish_marker_ignored(self):
+        """The D marker before the first prompt does not count as a command"""
+        self.listener.feed('bottom', b'\x1b]133;D;0\x07\x1b]133;A\x07')
+        self.assertIsNone(self.listener.states['bottom']['exit_code'])
+        self.assertEqual(self.listener.states['bottom']['commands'], 0)
+    
+    def test_string_terminator_accepted(self):
+        """ESC backslash works as the OSC terminator as well as BEL"""
+        events = self.listener.feed('left', b'\x1b]133;C\x1b\\')
+        self.assertEqual([event['event'] for event in events], ['C'])
+
+
+class TestLiveSession(fixtures.LiveSessionTestCase):
+    """Test the listener against a session created by setup-workflow.sh"""
+    
+    def setUp(self):
+        super().setUp()
+        self.listener = listener_module.PaneListener(self.state_dir)
+    
+    def test_panes_report_ready_and_exit_status(self):
+        """All panes become ready and a failing command's status is seen"""
+        for pane in ('left', 'top', 'bottom'):
+            self.assertTrue(self.listener.wait_ready(pane, timeout=5), pane)
+        
+        subprocess.run(['tmux', 'send-keys', '-t', 'ai-workflow:0.1', 'sleep 0.2; false', 'Enter'],
+                       env=self.env, check=True)
+        
+        deadline = time.time() + 5
+        while time.time() < deadline:
+            state = self.listener.snapshot()['top']
+            if state['exit_code'] == 1 and state['state'] == 'ready':
+                break
+            time.sleep(0.05)
+        
+        self.assertEqual(state['exit_code'], 1)
+        self.assertGreaterEqual(state['last_duration'], 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
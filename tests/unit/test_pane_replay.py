@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for pane-replay.py
+Covers trace segmentation, marker id rewriting, replayed panes driven by
+PaneCommandQueue and recording a live session
+"""
+
+import unittest
+import os
+
+import importlib.util
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+replay_spec = importlib.util.spec_from_file_location("pane_replay", "../../pane-replay.py")
+replay_module = importlib.util.module_from_spec(replay_spec)
+replay_spec.loader.exec_module(replay_module)
+
+
+class TestTrace(unittest.TestCase):
+    """Test splitting recordings into commands and rewriting their ids"""
+
+    def setUp(self):
+        line = 'make ; printf "\\nprogram execution done. exit_code=%s id=%s\\n" $? 0a1b2c3d'
+        self.trace = replay_module.Trace([
+            {'t': 0.0, 'out': 'ai-workflow-bash:top $ '},
+            {'t': 1.0, 'in': line},
+            {'t': 1.1, 'out': line + '\r\ncc main.c\r\n'},
+            {'t': 3.0, 'out': '\r\nprogram execution done. exit_code=2 id=0a1b'},
+            {'t': 3.1, 'out': '2c3d\r\nai-workflow-bash:top $ '},
+        ], {'trace': 1, 'pane': 'top'})
+
+    def test_commands_and_timing(self):
+        """Typed lines start commands; the marker gives exit code and duration"""
+        self.assertEqual(len(self.trace.preamble), 1)
+        command = self.trace.commands[0]
+        self.assertEqual(command.command, 'make')
+        self.assertEqual(command.exit_code, 2)
+        self.assertAlmostEqual(command.duration, 2.1)
+        self.assertEqual([round(delay, 1) for delay, _ in command.chunks], [0.1, 2.0, 2.1])
+
+    def test_marker_id_rewritten_across_chunks(self):
+        """The recorded id is replaced even when a chunk boundary splits it"""
+        chunks = self.trace.commands[0].replay_chunks('99887766')
+        output = b''.join(data for _, data in chunks)
+        self.assertIn(b'exit_code=2 id=99887766\r\n', output)
+        self.assertNotIn(b'0a1b2c3d', output)
+        self.assertEqual(len(chunks), 3)
+
+        longer = b''.join(data for _, data in self.trace.commands[0].replay_chunks('abcdef0123'))
+        self.assertIn(b'id=abcdef0123\r\n', longer)
+
+    def test_save_and_load(self):
+        """Traces round-trip through their JSON lines file, binary output included"""
+        self.trace.events.append({'t': 3.2, 'out': replay_module.decode(b'\xff\xfe raw')})
+        path = os.path.join(fixtures.temp_dir(self), 'make.trace')
+        self.trace.save(path)
+        loaded = replay_module.Trace.load(path)
+        self.assertEqual(loaded.header['pane'], 'top')
+        self.assertTrue(bytes(loaded.commands[0].output).endswith(b'\xff\xfe raw'))
+
+
+class TestReplay(unittest.TestCase):
+    """Test driving replayed panes with PaneCommandQueue"""
+
+    def test_queues_finish_on_replayed_panes(self):
+        """Every pane runs every command with the recorded results"""
+        trace = replay_module.synthetic_trace([('make', 30, 0.5, 0), ('make test', 10, 0.3, 1)])
+        engine = replay_module.ReplayEngine(trace, panes=25, speed=10)
+        stats = replay_module.run_load(engine, commands_per_pane=2, poll_interval=0.01, timeout=10)
+
+        self.assertEqual(stats['completed'], 50)
+        self.assertEqual(stats['unfinished'], 0)
+        self.assertEqual(stats['mismatched_exit_codes'], 0)
+        self.assertIsNotNone(stats['detection_lag_seconds']['max'])
+
+    def test_pane_history_is_limited(self):
+        """Replayed panes keep only history_limit lines, like tmux"""
+        trace = replay_module.synthetic_trace([('seq', 100, 0.0, 0)])
+        engine = replay_module.ReplayEngine(trace, panes=1, history_limit=20, clock=lambda: 0.0)
+        pane = engine.panes[0]
+        pane.type_line(trace.commands[0].line)
+        engine.advance()
+        lines = pane.capture().splitlines()
+        self.assertEqual(len(lines), 21)
+        self.assertIn('program execution done. exit_code=0 id=00000000', lines[-2])
+
+
+class TestLiveRecording(fixtures.LiveSessionTestCase):
+    """Test recording a session created by setup-workflow.sh and replaying it"""
+
+    def test_record_then_replay(self):
+        """A recorded session replays with the same cleaned results"""
+        trace = replay_module.record('bottom', ['echo replay-$((6 * 7))', 'sleep 0.2; false'], timeout=10)
+        self.assertEqual([command.exit_code for command in trace.commands], [0, 1])
+        self.assertGreaterEqual(trace.commands[1].duration, 0.2)
+
+        engine = replay_module.ReplayEngine(trace, panes=10, speed=5)
+        simulator = replay_module.phi3.Phi3Simulator()
+        queue = replay_module.ReplayQueue(simulator, engine.panes[0])
+        marker_id = queue.submit('echo replay-$((6 * 7))')
+        while queue.pending or queue.in_flight:
+            engine.advance()
+            queue.pump()
+        self.assertEqual(queue.results[marker_id]['cleaned_output'], 'replay-42')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for pane-vt.py
+Covers the emulator on scripted output and agreement with tmux on a live pane
+"""
+
+import unittest
+import subprocess
+import time
+
+import importlib.util
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+vt_spec = importlib.util.spec_from_file_location("pane_vt", "../../pane-vt.py")
+vt_module = importlib.util.module_from_spec(vt_spec)
+vt_spec.loader.exec_module(vt_module)
+
+
+class TestTerminal(unittest.TestCase):
+    """Test screen updates for the sequences shells and REPLs emit"""
+    
+    def setUp(self):
+        self.terminal = vt_module.Terminal(20, 4, scrollback=10)
+    
+    def test_text_wraps_and_scrolls_into_scrollback(self):
+        """Long lines wrap, and rows leaving the top go to scrollback"""
+        self.terminal.feed(b'one\r\ntwo\r\nthree\r\nfour\r\n' + b'x' * 25)
+        self.assertEqual(self.terminal.display(), ['three', 'four', 'x' * 20, 'xxxxx'])
+        self.assertEqual(list(self.terminal.scrollback), ['one', 'two'])
+        self.assertEqual(self.terminal.cursor(), (5, 3))
+    
+    def test_cursor_addressing_and_erase(self):
+        """CUP, EL and ED edit the screen in place"""
+        self.terminal.feed(b'aaaa\r\nbbbb\r\ncccc\x1b[2;3HZ\x1b[K\x1b[3;1H\x1b[J')
+        self.assertEqual(self.terminal.display(), ['aaaa', 'bbZ', '', ''])
+    
+    def test_clear_command(self):
+        """`clear` output (home, erase display, erase scrollback) empties everything"""
+        self.terminal.feed(b'1\r\n2\r\n3\r\n4\r\n5\r\n\x1b[H\x1b[2J\x1b[3Jprompt $ ')
+        self.assertEqual(self.terminal.display(), ['prompt $', '', '', ''])
+        self.assertEqual(len(self.terminal.scrollback), 0)
+    
+    def test_alternate_screen_restores_shell(self):
+        """Full-screen programs do not disturb the shell's screen"""
+        self.terminal.feed(b'$ less file\r\n\x1b[?1049h\x1b[Hpage one\x1b[?1049l')
+        self.assertEqual(self.terminal.display()[0], '$ less file')
+        self.assertEqual(self.terminal.cursor(), (0, 1))
+    
+    def test_insert_delete_characters(self):
+        """Readline-style in-line edits via ICH and DCH"""
+        self.terminal.feed(b'$ ech hi\x1b[6G\x1b[@o')
+        self.assertEqual(self.terminal.display()[0], '$ echo hi')
+        self.terminal.feed(b'\x1b[3G\x1b[2P')
+        self.assertEqual(self.terminal.display()[0], '$ ho hi')
+    
+    def test_sequence_split_across_chunks(self):
+        """Escape sequences and UTF-8 cut by read boundaries still apply"""
+        self.terminal.feed(b'caf\xc3')
+        self.terminal.feed(b'\xa9 \x1b[')
+        self.terminal.feed(b'1;1Hx')
+        self.assertEqual(self.terminal.display()[0], 'xafé')
+    
+    def test_scroll_region(self):
+        """Line feeds at the region's bottom scroll only the region"""
+        self.terminal.feed(b'header\x1b[2;3r\x1b[2;1Ha\r\nb\r\nc')
+        self.assertEqual(self.terminal.display(), ['header', 'b', 'c', ''])
+        self.assertEqual(len(self.terminal.scrollback), 0)
+    
+    def test_prompt_detection(self):
+        """OSC 133 markers win; otherwise the text before the cursor is matched"""
+        self.terminal.feed(b'ai-workflow-bash:left $ ')
+        self.assertTrue(self.terminal.prompt_showing())
+        self.terminal.feed(b'sleep 5\r\n')
+        self.assertFalse(self.terminal.prompt_showing())
+    
+        self.terminal.feed(b'\x1b]133;C\x07')
+        self.assertFalse(self.terminal.prompt_showing())
+        self.terminal.feed(b'\x1b]133;D;0\x07\x1b]133;A\x07anything> ')
+        self.assertTrue(self.terminal.prompt_showing())
+    
+    def test_wide_characters_take_two_cells(self):
+        """Emoji in the Docker prompt advance the cursor by two, as in tmux"""
+        terminal = vt_module.Terminal(80, 4)
+        terminal.feed('ai-workflow-bash:top(🐳) $ ls'.encode())
+        self.assertEqual(terminal.cursor(), (29, 0))
+        self.assertEqual(terminal.display()[0], 'ai-workflow-bash:top(🐳) $ ls')
+        terminal.feed(b'\b\b')
+        self.assertTrue(terminal.prompt_showing())
+    
+        # A wide character that does not fit in the last cell wraps whole
+        self.terminal.feed(('x' * 19 + '界!').encode())
+        self.assertEqual(self.terminal.display()[:2], ['x' * 19, '界!'])
+        self.assertEqual(self.terminal.cursor(), (3, 1))
+    
+    def test_last_lines_spans_scrollback(self):
+        """last_lines reaches back into scrollback and skips blank screen rows"""
+        self.terminal.feed(b'\r\n'.join(str(n).encode() for n in range(8)))
+        self.assertEqual(self.terminal.last_lines(6), ['2', '3', '4', '5', '6', '7'])
+    
+        self.terminal.feed(b'\x1b[H\x1b[2Jonly')
+        self.assertEqual(self.terminal.last_lines(2), ['7', 'only'])
+    
+    def test_control_mode_output(self):
+        """%output lines are unescaped and routed by pane id"""
+        terminals = vt_module.PaneTerminals(fixtures.temp_dir(self), sizes={'top': (20, 4)})
+        terminals.pane_ids['%1'] = 'top'
+        terminals.feed_control_line(b'%output %1 hi\\015\\012there\\033[1;3H!')
+        self.assertEqual(terminals.terminal('top').display()[:2], ['hi!', 'there'])
+
+
+class TestLiveStreams(fixtures.LiveSessionTestCase):
+    """Test that replayed pipe-pane streams match tmux's own screen"""
+    
+    def tmux(self, *args):
+        return subprocess.run(['tmux'] + list(args), env=self.env, capture_output=True,
+                              text=True, check=True).stdout
+    
+    def capture(self, target):
+        """tmux's view of the pane: rows (trailing blanks trimmed) and cursor"""
+        output = self.tmux('display-message', '-p', '-t', target, '#{cursor_x} #{cursor_y}', ';',
+                           'capture-pane', '-p', '-t', target)
+        header, _, body = output.partition('\n')
+        x, y = (int(value) for value in header.split())
+        return [row.rstrip() for row in body.split('\n')], (x, y)
+    
+    def test_screen_matches_capture_pane(self):
+        """After commands run, the emulator and tmux agree on rows and cursor"""
+        terminals = vt_module.PaneTerminals.from_tmux(state_dir=self.state_dir)
+    
+        target = 'ai-workflow:0.1'
+        self.tmux('send-keys', '-t', target, 'seq 1 40; printf "tab\\there\\n"; echo done-$((2 * 21))', 'Enter')
+    
+        deadline = time.time() + 10
+        while time.time() < deadline:
+            rows, cursor = self.capture(target)
+            if 'done-42' in rows and terminals.prompt_showing('top'):
+                screen, vt_cursor = terminals.read_screen('top')
+                if screen == rows[:len(screen)] and vt_cursor == cursor:
+                    break
+            time.sleep(0.1)
+    
+        screen, vt_cursor = terminals.read_screen('top')
+        self.assertIn('done-42', screen)
+        self.assertEqual(screen, rows[:len(screen)])
+        self.assertEqual(vt_cursor, cursor)
+        self.assertIn('40', terminals.last_lines('top', 8))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -7,10 +7,13 @@ Tests all components: setup, recovery, parsing, and safety protocols
 
 import unittest
 import subprocess
-import tempfile
 import os
 import json
+import re
+import shutil
+import socket
 import sys
+import threading
 from unittest.mock import patch, MagicMock
 
 # Add the parent directory to path to import phi3-simulator
@@ -22,6 +25,14 @@ phi3_spec = importlib.util.spec_from_file_location("phi3_simulator", "../phi3-si
 phi3_module = importlib.util.module_from_spec(phi3_spec)
 phi3_spec.loader.exec_module(phi3_module)
 
+client_spec = importlib.util.spec_from_file_location("phi3_client", "../phi3-client.py")
+client_module = importlib.util.module_from_spec(client_spec)
+client_spec.loader.exec_module(client_module)
+
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
 class TestPhi3Simulator(unittest.TestCase):
     """Test the phi3 natural language parsing and output cleaning"""
     
@@ -88,7 +99,7 @@ class TestPhi3Simulator(unittest.TestCase):
         }
         
         result = self.simulator.generate_tmux_command(parsed)
-        expected = "tmux send-keys -t ryan-workflow:0.0 \"ls -la ; echo ; echo 'program execution done. exit_code=$?'\" Enter"
+        expected = "tmux send-keys -t ai-workflow:0.0 \"ls -la ; echo ; echo 'program execution done. exit_code=$?'\" Enter"
         self.assertEqual(result, expected)
     
     def test_generate_tmux_command_build(self):
@@ -101,12 +112,12 @@ class TestPhi3Simulator(unittest.TestCase):
         }
         
         result = self.simulator.generate_tmux_command(parsed)
-        expected = "tmux send-keys -t ryan-workflow:0.1 \"timeout 300 make clean ; echo ; echo 'program execution done. exit_code=$?'\" Enter"
+        expected = "tmux send-keys -t ai-workflow:0.1 \"timeout 300 make clean ; echo ; echo 'program execution done. exit_code=$?'\" Enter"
         self.assertEqual(result, expected)
     
     def test_clean_tmux_output_success(self):
         """Test cleaning successful command output"""
-        raw_output = """ryan-workflow-bash:top $ make test
+        raw_output = """ai-workflow-bash:top $ make test
 Running tests...
 All tests passed
 program execution done. exit_code=0"""
@@ -117,7 +128,7 @@ program execution done. exit_code=0"""
         self.assertEqual(result['exit_code'], 0)
         self.assertEqual(result['summary'], 'Command completed successfully')
         self.assertIn('Running tests...', result['cleaned_output'])
-        self.assertNotIn('ryan-workflow-bash:', result['cleaned_output'])
+        self.assertNotIn('ai-workflow-bash:', result['cleaned_output'])
     
     def test_clean_tmux_output_error(self):
         """Test cleaning failed command output"""
@@ -144,6 +155,245 @@ program execution done. exit_code=124"""
         self.assertEqual(result['exit_code'], 124)
         self.assertEqual(result['summary'], 'Command timed out')
 
+class TestTaggedMarkers(unittest.TestCase):
+    """Test per-command marker ids and output demultiplexing"""
+    
+    def setUp(self):
+        self.simulator = phi3_module.Phi3Simulator()
+    
+    def test_parsed_requests_get_unique_marker_ids(self):
+        """Every parsed request carries its own marker id"""
+        first = self.simulator.parse_natural_language("Run ls in the left pane")
+        second = self.simulator.parse_natural_language("Run ls in the left pane")
+        
+        self.assertRegex(first['marker_id'], r'^[0-9a-f]{8}$')
+        self.assertNotEqual(first['marker_id'], second['marker_id'])
+    
+    def test_generate_tagged_command(self):
+        """Tagged commands print their id and real exit status"""
+        parsed = {
+            'pane': 'top',
+            'command': 'make clean',
+            'timeout_category': 'build',
+            'timeout_seconds': 300,
+            'marker_id': 'abc123'
+        }
+        
+        result = self.simulator.generate_tmux_command(parsed)
+        self.assertIn('timeout 300 make clean ; printf', result)
+        self.assertIn('exit_code=%s id=%s', result)
+        self.assertTrue(result.endswith(" $? abc123' Enter"))
+    
+    def test_split_pipelined_output(self):
+        """Output of back-to-back commands is attributed by marker id"""
+        raw_output = """ai-workflow-bash:left $ echo one ; printf "\\nprogram execution done. exit_code=%s id=%s\\n" $? aaa111
+one
+
+program execution done. exit_code=0 id=aaa111
+ai-workflow-bash:left $ false ; printf "\\nprogram execution done. exit_code=%s id=%s\\n" $? bbb222
+
+program execution done. exit_code=1 id=bbb222
+ai-workflow-bash:left $ echo three ; printf "\\nprogram execution done. exit_code=%s id=%s\\n" $? ccc333"""
+        
+        outputs = self.simulator.split_command_outputs(raw_output)
+        self.assertEqual(set(outputs), {'aaa111', 'bbb222'})
+        
+        first = self.simulator.clean_tmux_output(raw_output, marker_id='aaa111')
+        second = self.simulator.clean_tmux_output(raw_output, marker_id='bbb222')
+        pending = self.simulator.clean_tmux_output(raw_output, marker_id='ccc333')
+        
+        self.assertEqual((first['exit_code'], first['cleaned_output']), (0, 'one'))
+        self.assertEqual((second['output_type'], second['line_count']), ('error', 0))
+        self.assertEqual(pending['output_type'], 'unknown')
+    
+    def test_untagged_output_before_first_command(self):
+        """Earlier untagged output in the scrollback is not attributed to the command"""
+        raw_output = """ai-workflow-bash:left $ make
+cc: error: foo.c: No such file or directory
+make: *** [all] Error 1
+ai-workflow-bash:left $ echo ok ; printf "\\nprogram execution done. exit_code=%s id=%s\\n" $? ddd444
+ok
+
+program execution done. exit_code=0 id=ddd444
+ai-workflow-bash:left $ """
+        
+        result = self.simulator.clean_tmux_output(raw_output, marker_id='ddd444')
+        self.assertEqual(result['cleaned_output'], 'ok')
+        self.assertEqual(result['output_type'], 'success')
+        self.assertNotIn('make', self.simulator.split_command_outputs(raw_output)['ddd444'])
+
+
+class TestPaneCommandQueue(fixtures.PrivateTmuxTestCase):
+    """Test the per-pane command queue against a real tmux pane"""
+    
+    def setUp(self):
+        super().setUp()
+        subprocess.run(['tmux', 'new-session', '-d', '-s', 'queue-test', '-x', '200', '-y', '50',
+                        'bash --norc --noprofile'], check=True)
+        self.simulator = phi3_module.Phi3Simulator()
+        self.simulator.pane_mapping['left'] = 'queue-test:0.0'
+    
+    def test_pipelined_commands_demultiplexed(self):
+        """Several commands in flight at once each get their own result"""
+        completed = []
+        queue = phi3_module.PaneCommandQueue(self.simulator, 'left', pipeline_depth=3,
+                                             on_complete=completed.append)
+        ids = [queue.submit('echo first'),
+               queue.submit('sh -c "exit 3"'),
+               queue.submit('echo third'),
+               queue.submit('echo fourth')]
+        
+        results = queue.run_all(timeout=10)
+        
+        self.assertEqual(list(results), ids)
+        self.assertEqual(results[ids[0]]['cleaned_output'], 'first')
+        self.assertEqual(results[ids[1]]['exit_code'], 3)
+        self.assertEqual(results[ids[2]]['cleaned_output'], 'third')
+        self.assertEqual(results[ids[3]]['output_type'], 'success')
+        self.assertEqual(len(completed), 4)
+
+class TestResultTypes(unittest.TestCase):
+    """Test the slot-backed parse and clean results"""
+    
+    def setUp(self):
+        self.simulator = phi3_module.Phi3Simulator()
+    
+    def test_dict_compatibility(self):
+        """Results read, compare and update like the dicts they replaced"""
+        parsed = self.simulator.parse_natural_language("Run make clean in the top pane")
+        self.assertIsInstance(parsed, phi3_module.ParsedCommand)
+        self.assertFalse(hasattr(parsed, '__dict__'))
+        self.assertEqual(list(parsed)[:3], ['original_request', 'pane', 'command'])
+        self.assertEqual(parsed.get('pane'), 'top')
+        self.assertIsNone(parsed.get('started'))
+        self.assertEqual(parsed, dict(parsed.items()))
+        
+        cleaned = self.simulator.clean_tmux_output("ok\nprogram execution done. exit_code=0\n")
+        cleaned.update({'pane': 'left', 'finished': 1.5})
+        cleaned['exit_code'] = 3
+        self.assertEqual(cleaned.exit_code, 3)
+        self.assertEqual(cleaned['finished'], 1.5)
+        self.assertEqual(len(cleaned), 7)
+        del cleaned['pane']
+        self.assertNotIn('pane', cleaned)
+        with self.assertRaises(TypeError):
+            del cleaned['summary']
+    
+    def test_serialization(self):
+        """Compact JSON carries every field and added key"""
+        cleaned = self.simulator.clean_tmux_output("ok\nprogram execution done. exit_code=0\n")
+        cleaned['marker_id'] = 'abc123'
+        line = cleaned.to_json()
+        self.assertNotIn('\n', line)
+        self.assertNotIn(', ', line)
+        self.assertEqual(json.loads(line), cleaned.to_dict())
+        self.assertEqual(json.loads(json.dumps({'result': cleaned}, default=phi3_module.json_default)),
+                         {'result': cleaned.to_dict()})
+    
+    def test_plain_json_dumps_needs_conversion(self):
+        """Results are no longer dicts: json.dumps needs to_dict(), dict() or json_default"""
+        cleaned = self.simulator.clean_tmux_output("ok\nprogram execution done. exit_code=0\n")
+        self.assertNotIsInstance(cleaned, dict)
+        with self.assertRaises(TypeError):
+            json.dumps(cleaned)
+        self.assertEqual(json.loads(json.dumps(dict(cleaned))), cleaned.to_dict())
+    
+    def test_batch_mode(self):
+        """--batch answers daemon-format requests with one compact line each"""
+        requests = '{"op": "parse", "request": "Run ls in the left pane"}\n{"op": "nope"}\n'
+        result = subprocess.run([sys.executable, '../phi3-simulator.py', '--batch'], input=requests,
+                                capture_output=True, text=True, check=True)
+        responses = [json.loads(line) for line in result.stdout.splitlines()]
+        self.assertEqual(responses[0]['result']['command'], 'ls')
+        self.assertFalse(responses[1]['ok'])
+    
+    def test_batch_coprocess_loop(self):
+        """A bash loop talks to one --batch coprocess, one answer per request"""
+        script = f"""
+            coproc PHI3 {{ {sys.executable} ../phi3-simulator.py --batch; }}
+            for pane in left top bottom; do
+                printf '{{"op": "parse", "request": "Run ls in the %s pane"}}\\n' "$pane" >&"${{PHI3[1]}}"
+                read -r response <&"${{PHI3[0]}}"
+                echo "$response"
+            done
+        """
+        env = {name: value for name, value in os.environ.items() if name != 'PYTHONUNBUFFERED'}
+        result = subprocess.run(['bash', '-c', script], capture_output=True, text=True, timeout=10, env=env)
+        panes = [json.loads(line)['result']['pane'] for line in result.stdout.splitlines()]
+        self.assertEqual(panes, ['left', 'top', 'bottom'])
+
+class TestPhi3Daemon(unittest.TestCase):
+    """Test the resident simulator and its client"""
+    
+    def setUp(self):
+        self.socket_path = os.path.join(fixtures.temp_dir(self), 'phi3.sock')
+        self.server = phi3_module.make_server(self.socket_path)
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.client = client_module.Phi3Client(self.socket_path)
+    
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+    
+    def test_requests_served_by_daemon(self):
+        """Parse, generate and clean all go over one daemon connection"""
+        parsed = self.client.call('parse', request='Run make clean in the top pane')
+        self.assertEqual(parsed['command'], 'make clean')
+        
+        generated = self.client.call('generate', request='Run make clean in the top pane')
+        self.assertIn('make clean', generated['tmux_command'])
+        self.assertEqual(generated['parsed']['pane'], 'top')
+        
+        raw = 'building\n\nprogram execution done. exit_code=2 id=0a1b2c3d\n'
+        cleaned = self.client.call('clean', raw_output=raw, marker_id='0a1b2c3d')
+        self.assertEqual(cleaned['exit_code'], 2)
+        
+        self.assertEqual(self.client.call('ping')['pid'], os.getpid())
+        self.assertIsNone(self.client.simulator)
+    
+    def test_error_response(self):
+        """A failed request raises without dropping the connection"""
+        with self.assertRaises(RuntimeError):
+            self.client.call('compile', request='x')
+        self.assertEqual(self.client.call('parse', request='Run ls in the left pane')['pane'], 'left')
+        self.assertIsNone(self.client.simulator)
+    
+    def test_in_process_fallback(self):
+        """Without a daemon the client gives the same answers in-process"""
+        client = client_module.Phi3Client(self.socket_path + '.missing')
+        expected = self.client.call('generate', request='Run pytest in the bottom pane')
+        result = client.call('generate', request='Run pytest in the bottom pane')
+        expected['parsed'].pop('marker_id')
+        result['parsed'].pop('marker_id')
+        self.assertEqual(result['parsed'], expected['parsed'])
+        self.assertIn('pytest', result['tmux_command'])
+        self.assertIsNotNone(client.simulator)
+    
+    def test_live_daemon_is_not_replaced(self):
+        """A second server refuses a socket a daemon still answers on"""
+        with self.assertRaises(OSError):
+            phi3_module.make_server(self.socket_path)
+        self.assertEqual(self.client.call('ping')['pid'], os.getpid())
+    
+    def test_stale_socket_is_replaced(self):
+        """A socket file nobody listens on is removed and rebound"""
+        stale_path = self.socket_path + '.stale'
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        stale.bind(stale_path)
+        stale.close()
+        server = phi3_module.make_server(stale_path)
+        server.server_close()
+    
+    @unittest.skipUnless(shutil.which('socat'), 'socat not installed')
+    def test_socat_request(self):
+        """Shell loops can skip Python entirely by writing to the socket"""
+        result = subprocess.run(['socat', '-', f'UNIX-CONNECT:{self.socket_path}'],
+                                input='{"op": "parse", "request": "Run ls in the top pane"}\n',
+                                capture_output=True, text=True, timeout=5)
+        self.assertEqual(json.loads(result.stdout)['result']['pane'], 'top')
+
 class TestBase64Safety(unittest.TestCase):
     """Test base64 encoding safety protocols"""
     
@@ -233,6 +483,171 @@ class TestTmuxIntegration(unittest.TestCase):
         self.assertIn('left pane', left_output)
         self.assertIn('right pane', right_output)
 
+class TestSessionBootstrap(fixtures.PrivateTmuxTestCase):
+    """Test the batched session bootstrap in setup-workflow.sh"""
+    
+    def setUp(self):
+        # Isolated tmux server so the test never touches a real session
+        super().setUp()
+        self.script_path = os.path.abspath("../../setup-workflow.sh")
+    
+    def source_and_run(self, snippet, cwd=None):
+        return subprocess.run(['bash', '-c', f'source "{self.script_path}" && {snippet}'],
+                              env=self.env, capture_output=True, text=True, cwd=cwd)
+    
+    def test_batch_is_single_tmux_invocation(self):
+        """The whole layout is one chained tmux command"""
+        result = self.source_and_run('build_session_batch native && printf "%s\\n" "${SESSION_BATCH[@]}"')
+        args = result.stdout.splitlines()
+        
+        self.assertEqual(args[:4], ['new-session', '-d', '-s', 'ai-workflow'])
+        self.assertEqual(args.count('send-keys'), 3)
+        self.assertIn("export PS1='ai-workflow-bash:top $ '", args)
+    
+    def test_docker_batch_streams_into_workspace(self):
+        """Docker panes write their streams where the host can read them"""
+        self.env.pop('AI_WORKFLOW_STATE_DIR', None)
+        repo_root = os.path.dirname(self.script_path)
+        result = self.source_and_run('build_session_batch docker && printf "%s\\n" "${SESSION_BATCH[@]}" '
+                                     '&& echo "state=$SESSION_STATE_DIR"', cwd=repo_root)
+        args = result.stdout.splitlines()
+        
+        self.assertIn("source '/workspace/shell-integration.sh'", args)
+        self.assertTrue(any(arg.endswith("--stream '/workspace/.ai-workflow/ai-workflow/top.stream'")
+                            for arg in args))
+        self.assertEqual(args[-1], f'state={repo_root}/.ai-workflow/ai-workflow')
+    
+    def test_docker_batch_without_scripts_in_workspace(self):
+        """From another project the container has no scripts to source or pipe into"""
+        result = self.source_and_run('build_session_batch docker && printf "%s\\n" "${SESSION_BATCH[@]}"',
+                                     cwd=fixtures.temp_dir(self))
+        args = result.stdout.splitlines()
+        
+        self.assertNotIn('pipe-pane', args)
+        self.assertFalse(any(arg.startswith('source ') for arg in args))
+        self.assertEqual(args.count('send-keys'), 3)
+        self.assertIn('Readiness signaling and the output journal are off', result.stdout)
+    
+    def test_batch_creates_three_pane_layout(self):
+        """Applying the batch yields the 3-pane session with mouse mode"""
+        result = self.source_and_run('create_tmux_session native')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        
+        panes = subprocess.check_output(['tmux', 'list-panes', '-t', 'ai-workflow'], env=self.env).decode()
+        mouse = subprocess.check_output(['tmux', 'show-options', '-t', 'ai-workflow', 'mouse'], env=self.env).decode()
+        
+        self.assertEqual(len(panes.splitlines()), 3)
+        self.assertIn('mouse on', mouse)
+    
+    def test_cold_start_reports_time(self):
+        """--cold-start recreates the session and reports milliseconds"""
+        result = subprocess.run(['bash', self.script_path, '--native', '--cold-start'],
+                                env=self.env, capture_output=True, text=True)
+        
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertRegex(result.stdout, r'Cold start \(native\): \d+ ms')
+
+class TestDockerStateCache(unittest.TestCase):
+    """Test the warm pool and fingerprint cache using the fake docker CLI"""
+    
+    def setUp(self):
+        self.work_dir = fixtures.temp_dir(self)
+        bin_dir = os.path.join(self.work_dir, 'bin')
+        os.makedirs(bin_dir)
+        os.symlink(os.path.abspath('../fake-docker'), os.path.join(bin_dir, 'docker'))
+        
+        self.log_path = os.path.join(self.work_dir, 'docker.log')
+        self.env = dict(os.environ,
+                        PATH=bin_dir + os.pathsep + os.environ['PATH'],
+                        HOME=self.work_dir,
+                        XDG_CACHE_HOME=os.path.join(self.work_dir, 'cache'),
+                        FAKE_DOCKER_STATE=os.path.join(self.work_dir, 'docker.json'),
+                        FAKE_DOCKER_LOG=self.log_path)
+        self.script_path = os.path.abspath("../../setup-workflow.sh")
+    
+    def run_setup(self, snippet, cwd=None, **env):
+        open(self.log_path, 'w').close()
+        result = subprocess.run(['bash', '-c', f'source "{self.script_path}" && {snippet}'],
+                                env=dict(self.env, **env), cwd=cwd or self.work_dir,
+                                capture_output=True, text=True)
+        with open(self.log_path) as f:
+            return result, f.read().splitlines()
+    
+    def test_second_setup_uses_cache(self):
+        """An unchanged environment costs a single docker inspect"""
+        result, calls = self.run_setup('prepare_docker_environment')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('build -t ai-workflow:latest .', [c.split(' ', 1)[1] for c in calls])
+        
+        result, calls = self.run_setup('prepare_docker_environment')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn('skipping checks', result.stdout)
+        self.assertEqual(len(calls), 1)
+        self.assertIn(' inspect ', calls[0])
+        self.assertTrue(calls[0].endswith(' ai-workflow-dev ai-workflow:latest'))
+    
+    def test_rebuilt_image_invalidates_cache(self):
+        """A rebuilt image is noticed by the same single inspect and the container recreated"""
+        self.run_setup('prepare_docker_environment')
+        subprocess.run(['docker', 'build', '-t', 'ai-workflow:latest', '.'], env=self.env, check=True)
+        
+        result, calls = self.run_setup('prepare_docker_environment')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertNotIn('skipping checks', result.stdout)
+        self.assertIn('outdated image', result.stdout)
+        
+        state = subprocess.check_output(['docker', 'inspect', '--format', '{{.Image}}', 'ai-workflow-dev'],
+                                        env=self.env, text=True).strip()
+        image = subprocess.check_output(['docker', 'inspect', '--format', '{{.Id}}', 'ai-workflow:latest'],
+                                        env=self.env, text=True).strip()
+        self.assertEqual(state, image)
+    
+    def test_credential_change_invalidates_cache(self):
+        """Changing AWS credentials forces the full path and a re-copy"""
+        self.run_setup('prepare_docker_environment')
+        
+        os.makedirs(os.path.join(self.work_dir, '.aws'))
+        with open(os.path.join(self.work_dir, '.aws', 'credentials'), 'w') as f:
+            f.write('[default]\n')
+        
+        result, calls = self.run_setup('prepare_docker_environment')
+        self.assertNotIn('skipping checks', result.stdout)
+        self.assertTrue(any(' cp ' in call and 'credentials' in call for call in calls))
+    
+    def test_new_container_claimed_from_pool(self):
+        """With a warm pool the container is renamed instead of run"""
+        self.run_setup('build_docker_image && refill_pool', AI_WORKFLOW_POOL_SIZE='2')
+        
+        result, calls = self.run_setup('start_docker_container && wait', AI_WORKFLOW_POOL_SIZE='2')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        
+        renames = [call for call in calls if ' rename ' in call]
+        self.assertEqual(len(renames), 1)
+        self.assertTrue(renames[0].endswith(' ai-workflow-dev'))
+        
+        pool = subprocess.check_output(['docker', 'ps', '--filter', 'name=^ai-workflow-dev-pool-'],
+                                       env=self.env, text=True).split()
+        self.assertEqual(len(pool), 2)
+    
+    def test_pool_container_from_other_workspace_not_claimed(self):
+        """Pool containers mount their workspace, so another project runs its own"""
+        self.run_setup('build_docker_image && refill_pool', AI_WORKFLOW_POOL_SIZE='1')
+        other_workspace = os.path.join(self.work_dir, 'other-project')
+        os.makedirs(other_workspace)
+        
+        result, calls = self.run_setup('start_docker_container && wait', cwd=other_workspace,
+                                       AI_WORKFLOW_POOL_SIZE='1')
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertFalse(any(' rename ' in call for call in calls))
+        self.assertTrue(any(' run ' in call and '--name ai-workflow-dev ' in call for call in calls))
+        
+        # Each workspace keeps its own warm container
+        for workspace in (self.work_dir, other_workspace):
+            pool = subprocess.check_output(['docker', 'ps', '--filter', 'name=^ai-workflow-dev-pool-',
+                                            '--filter', f'label=ai-workflow.workspace={workspace}'],
+                                           env=self.env, text=True).split()
+            self.assertEqual(len(pool), 1, workspace)
+
 class TestRecoveryProtocols(unittest.TestCase):
     """Test emergency recovery procedures"""
     
@@ -270,6 +685,66 @@ class TestRecoveryProtocols(unittest.TestCase):
             
             self.assertEqual(target, expected_target)
 
+class TestParallelRecovery(fixtures.PrivateTmuxTestCase):
+    """Test readiness-probed emergency recovery across all panes"""
+    
+    def setUp(self):
+        super().setUp()
+        self.set_env(TMUX_RECOVER_STEP_DEADLINE='3', AI_WORKFLOW_MODE=None)
+        shell = 'bash --norc --noprofile'
+        subprocess.run(['tmux', 'new-session', '-d', '-s', 'ai-workflow', shell, ';',
+                        'set-option', '-g', 'default-command', shell, ';',
+                        'split-window', '-h', ';',
+                        'split-window', '-v', '-t', 'ai-workflow:0.1'], env=self.env, check=True)
+    
+    def test_all_status_runs_in_pane_order(self):
+        """Non-emergency actions stay sequential with a blank line between panes"""
+        result = subprocess.run(['bash', '../../tmux-recover', 'all', 'status'],
+                                env=self.env, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stdout)
+        names = re.findall(r'Current state of (\w+) pane', result.stdout)
+        self.assertEqual(names, ['left', 'top', 'bottom'])
+        self.assertTrue(result.stdout.endswith('\n\n'))
+    
+    def test_all_emergency_recovers_hung_panes_concurrently(self):
+        """Hung commands in every pane are recovered well under the old 9s"""
+        import time
+        
+        for i in range(3):
+            subprocess.run(['tmux', 'send-keys', '-t', f'ai-workflow:0.{i}', 'sleep 100', 'Enter'],
+                           env=self.env, check=True)
+        
+        start_time = time.time()
+        result = subprocess.run(['bash', '../../tmux-recover', 'all', 'emergency'],
+                                env=self.env, capture_output=True, text=True)
+        elapsed = time.time() - start_time
+        
+        self.assertEqual(result.returncode, 0, result.stdout)
+        self.assertLess(elapsed, 3.0)
+        
+        # Each pane's report is printed whole and in pane order
+        reports = [block for block in result.stdout.split('\n\n') if 'Executing' in block]
+        self.assertEqual(len(reports), 3)
+        for report, name in zip(reports, ['left', 'top', 'bottom']):
+            self.assertIn(f'Emergency recovery complete for {name} pane', report)
+            self.assertEqual(report.count('Executing'), 1)
+        
+        for i, name in enumerate(['left', 'top', 'bottom']):
+            screen = subprocess.check_output(['tmux', 'capture-pane', '-t', f'ai-workflow:0.{i}', '-p'],
+                                             env=self.env, text=True)
+            self.assertEqual(screen.strip(), f'ai-workflow-bash:{name} $')
+    
+    def test_emergency_restores_docker_prompt(self):
+        """Inside the container the restored prompt keeps setup's (🐳) indicator"""
+        subprocess.run(['tmux', 'send-keys', '-t', 'ai-workflow:0.0', 'sleep 100', 'Enter'],
+                       env=self.env, check=True)
+        result = subprocess.run(['bash', '../../tmux-recover', 'left', 'emergency'],
+                                env=dict(self.env, AI_WORKFLOW_MODE='docker'), capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stdout)
+        screen = subprocess.check_output(['tmux', 'capture-pane', '-t', 'ai-workflow:0.0', '-p'],
+                                         env=self.env, text=True)
+        self.assertEqual(screen.strip(), 'ai-workflow-bash:left(🐳) $')
+
 class TestSafetyProtocols(unittest.TestCase):
     """Test safety rule enforcement"""
     
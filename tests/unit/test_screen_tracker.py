@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for screen-tracker.py
+Covers row diffs on scripted screens and change detection on a real pane
+"""
+
+import unittest
+import subprocess
+
+import importlib.util
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+tracker_spec = importlib.util.spec_from_file_location("screen_tracker", "../../screen-tracker.py")
+tracker_module = importlib.util.module_from_spec(tracker_spec)
+tracker_spec.loader.exec_module(tracker_module)
+
+
+class TestScreenDiff(unittest.TestCase):
+    """Test row diffs against screens supplied by a fake reader"""
+    
+    def setUp(self):
+        self.screens = []
+        self.tracker = tracker_module.ScreenTracker(reader=lambda pane: self.screens.pop(0))
+    
+    def test_first_read_is_full(self):
+        """The first snapshot reports every non-blank row"""
+        self.screens.append((['mysql> select 1;', '', 'mysql> '], (7, 2)))
+        diff = self.tracker.changes('top')
+        self.assertTrue(diff['full'])
+        self.assertEqual(diff['rows'], [[0, 'mysql> select 1;'], [2, 'mysql> ']])
+        self.assertEqual(diff['cursor'], [7, 2])
+    
+    def test_only_changed_rows_reported(self):
+        """A one-line change yields one row plus the new cursor"""
+        self.screens.append((['>>> 1 + 1', '2', '>>> ', ''], (4, 2)))
+        self.screens.append((['>>> 1 + 1', '2', '>>> x', ''], (5, 2)))
+        self.screens.append((['>>> 1 + 1', '2', '>>> x', ''], (5, 2)))
+        self.tracker.changes('left')
+    
+        diff = self.tracker.changes('left')
+        self.assertFalse(diff['full'])
+        self.assertEqual(diff['rows'], [[2, '>>> x']])
+        self.assertTrue(diff['cursor_moved'])
+    
+        diff = self.tracker.changes('left')
+        self.assertEqual(diff['rows'], [])
+        self.assertFalse(diff['cursor_moved'])
+    
+    def test_resize_reports_full_screen(self):
+        """A different row count cannot be diffed and is sent in full"""
+        self.screens.append((['a', 'b'], (0, 0)))
+        self.screens.append((['a', 'b', 'c'], (0, 0)))
+        self.tracker.changes('left')
+        diff = self.tracker.changes('left')
+        self.assertTrue(diff['full'])
+        self.assertEqual(len(diff['rows']), 3)
+    
+    def test_wait_merges_changes_until_match(self):
+        """Changes across polls are merged until the pattern appears"""
+        self.screens.extend([
+            (['$ npm start', '', ''], (0, 1)),
+            (['$ npm start', 'compiling', ''], (0, 2)),
+            (['$ npm start', 'compiled', 'listening on 3000'], (0, 2)),
+        ])
+        diff = self.tracker.wait_for_change('bottom', pattern=r'listening on \d+', interval=0)
+        self.assertEqual(diff['rows'], [[1, 'compiled'], [2, 'listening on 3000']])
+        self.assertTrue(diff['cursor_moved'])
+    
+    def test_wait_reads_live_screen_before_matching(self):
+        """A stale snapshot that matched does not end the wait for the next prompt"""
+        self.screens.append((['mysql> ', ''], (7, 0)))
+        self.tracker.changes('top')
+        busy = (['mysql> select sleep(10);', ''], (0, 1))
+        self.tracker.reader = lambda pane: busy
+        self.assertIsNone(self.tracker.wait_for_change('top', pattern=r'^mysql>\s*$', timeout=0.2, interval=0.05))
+        
+        self.tracker.reader = lambda pane: (['mysql> select sleep(10);', 'mysql> '], (7, 1))
+        diff = self.tracker.wait_for_change('top', pattern=r'^mysql>\s*$', timeout=0.2, interval=0.05)
+        self.assertEqual(diff['rows'], [[1, 'mysql> ']])
+    
+    def test_wait_times_out_without_change(self):
+        """An unchanged screen returns None at the deadline"""
+        self.tracker.reader = lambda pane: (['idle'], (0, 0))
+        self.assertIsNone(self.tracker.wait_for_change('top', timeout=0.2, interval=0.05))
+
+
+class TestLivePane(fixtures.PrivateTmuxTestCase):
+    """Test screen reads and waits against a private tmux server"""
+    
+    def setUp(self):
+        super().setUp()
+        subprocess.run(['tmux', 'new-session', '-d', '-s', 'ai-workflow', '-x', '80', '-y', '10',
+                        'bash --norc --noprofile'], check=True)
+        self.tracker = tracker_module.ScreenTracker()
+    
+    def test_screen_has_pane_height_and_cursor(self):
+        """One read returns every row of the pane and the cursor position"""
+        diff = self.tracker.changes('left')
+        self.assertEqual(diff['height'], 10)
+        self.assertEqual(len(self.tracker.screen('left')), 10)
+        self.assertEqual(len(diff['cursor']), 2)
+    
+    def test_wait_for_output(self):
+        """Typed output is reported as changed rows once it matches"""
+        self.tracker.wait_for_change('left', pattern=r'[$#]$', timeout=5)
+        subprocess.run(['tmux', 'send-keys', '-t', 'ai-workflow:0.0', 'echo screen-$((6 * 7))', 'Enter'],
+                       check=True)
+        diff = self.tracker.wait_for_change('left', pattern='^screen-42$', timeout=5)
+        self.assertIsNotNone(diff)
+        self.assertIn('screen-42', [text for _, text in diff['rows']])
+        self.assertLess(len(diff['rows']), diff['height'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+
+"""
+Unit tests for workflow-sessions.py session sharding
+Each test runs real sessions on private tmux servers under a temp HOME
+"""
+
+import unittest
+import subprocess
+import os
+import signal
+import time
+
+import importlib.util
+fixtures_spec = importlib.util.spec_from_file_location("tmux_fixtures", "tmux_fixtures.py")
+fixtures = importlib.util.module_from_spec(fixtures_spec)
+fixtures_spec.loader.exec_module(fixtures)
+
+sessions_spec = importlib.util.spec_from_file_location("workflow_sessions", "../../workflow-sessions.py")
+sessions_module = importlib.util.module_from_spec(sessions_spec)
+sessions_spec.loader.exec_module(sessions_module)
+
+
+class TestSessionManager(unittest.TestCase):
+    """Test creation, placement and health across tmux servers"""
+    
+    def setUp(self):
+        self.home = fixtures.temp_dir(self)
+        # Plain bash in every pane keeps pane_current_command predictable
+        with open(os.path.join(self.home, '.tmux.conf'), 'w') as f:
+            f.write('set -g default-command "bash --norc --noprofile"\n')
+        
+        fixtures.set_env(self, HOME=self.home, TMUX=None, TMUX_TMPDIR=self.home,
+                         XDG_CACHE_HOME=os.path.join(self.home, 'cache'),
+                         AI_WORKFLOW_STATE_DIR=os.path.join(self.home, 'state'))
+        
+        self.manager = sessions_module.SessionManager(probe_timeout=1.0)
+        self.stopped_pids = []
+    
+    def tearDown(self):
+        for pid in self.stopped_pids:
+            os.kill(pid, signal.SIGCONT)
+        for name, session in list(self.manager.sessions().items()):
+            fixtures.kill_server(self.manager.tmux_argv(session))
+            self.manager.remove(name)
+    
+    def tmux(self, session, *args):
+        return subprocess.run(self.manager.tmux_argv(session) + list(args),
+                              capture_output=True, text=True, check=True).stdout
+    
+    def test_sessions_run_on_separate_servers(self):
+        """Each session gets its own socket and its own three panes"""
+        first = self.manager.create()
+        second = self.manager.create()
+        
+        self.assertNotEqual(first['socket'], second['socket'])
+        self.assertEqual(len(self.tmux(first, 'list-sessions').splitlines()), 1)
+        self.assertEqual(len(self.tmux(second, 'list-panes', '-s', '-t', second['name']).splitlines()), 3)
+    
+    def test_place_prefers_least_loaded(self):
+        """Work goes to the session with fewer busy panes"""
+        busy = self.manager.create()
+        idle = self.manager.create()
+        self.tmux(busy, 'send-keys', '-t', f"{busy['name']}:0.0", 'sleep 30', 'Enter')
+        
+        deadline = time.time() + 5
+        while self.manager.probe(busy)['busy_panes'] == 0 and time.time() < deadline:
+            time.sleep(0.05)
+        
+        self.assertEqual(self.manager.place()['name'], idle['name'])
+    
+    def test_place_creates_session_when_full(self):
+        """A new shard is created when every session is at capacity"""
+        self.manager.max_busy_panes = 0
+        self.manager.create()
+        
+        placed = self.manager.place()
+        self.assertEqual(len(self.manager.sessions()), 2)
+        self.assertIn(placed['name'], self.manager.sessions())
+    
+    def test_place_at_limit_uses_least_loaded(self):
+        """At the session limit a full but healthy session is used instead of failing"""
+        self.manager.max_busy_panes = 0
+        self.manager.max_sessions = 1
+        only = self.manager.create()
+        
+        self.assertEqual(self.manager.place()['name'], only['name'])
+        self.assertEqual(list(self.manager.sessions()), [only['name']])
+    
+    def test_dead_sessions_are_unregistered(self):
+        """A session whose server died stops taking a slot"""
+        self.manager.max_sessions = 2
+        self.manager.setup_grace = 0
+        dead = self.manager.create()
+        alive = self.manager.create()
+        fixtures.kill_server(self.manager.tmux_argv(dead))
+        
+        health = self.manager.health()
+        self.assertEqual((health['missing'], health['removed']), ([dead['name']], [dead['name']]))
+        self.assertEqual(list(self.manager.sessions()), [alive['name']])
+        
+        fixtures.kill_server(self.manager.tmux_argv(alive))
+        placed = self.manager.place()
+        self.assertEqual(list(self.manager.sessions()), [placed['name']])
+        self.assertNotEqual(placed['name'], alive['name'])
+    
+    def test_new_sessions_are_not_unregistered(self):
+        """A session still in setup is kept though its server is not up yet"""
+        dead = self.manager.create()
+        fixtures.kill_server(self.manager.tmux_argv(dead))
+        self.assertEqual(self.manager.health()['removed'], [])
+        self.assertIn(dead['name'], self.manager.sessions())
+    
+    def test_health_reports_wedged_server(self):
+        """A stopped tmux server is reported as wedged without blocking the rest"""
+        wedged = self.manager.create()
+        self.manager.create()
+        
+        pid = int(self.tmux(wedged, 'display-message', '-p', '#{pid}'))
+        os.kill(pid, signal.SIGSTOP)
+        self.stopped_pids.append(pid)
+        
+        health = self.manager.health()
+        self.assertEqual(health['sessions'], 2)
+        self.assertEqual(health['healthy'], 1)
+        self.assertEqual(health['wedged'], [wedged['name']])
+        self.assertEqual(health['total_panes'], 3)
+    
+    def test_simulator_targets_session_socket(self):
+        """Phi3Simulator from the manager addresses the right server"""
+        session = self.manager.create()
+        simulator = self.manager.simulator(session['name'])
+        
+        parsed = simulator.parse_natural_language("Run ls in the top pane")
+        command = simulator.generate_tmux_command(parsed)
+        self.assertTrue(command.startswith(f"tmux -L {session['socket']} send-keys -t {session['name']}:0.1 "))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+
+"""
+Shared fixtures for the unit tests
+Temp dirs removed after each test, a private tmux server per test, and a live
+session created by setup-workflow.sh. Test modules load this file by path like
+the scripts they test.
+"""
+
+import unittest
+import subprocess
+import tempfile
+import shutil
+import signal
+import os
+import time
+from typing import Dict, List, Optional
+
+SETUP_SCRIPT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'setup-workflow.sh'))
+PANE_SHELL = 'bash --norc --noprofile'
+
+
+def temp_dir(test: unittest.TestCase) -> str:
+    """Temp dir removed when the test finishes"""
+    path = tempfile.mkdtemp()
+    test.addCleanup(shutil.rmtree, path, ignore_errors=True)
+    return path
+
+
+def set_env(test: unittest.TestCase, **values):
+    """Set (or with None, unset) environment variables until the test finishes"""
+    for name, value in values.items():
+        test.addCleanup(_restore_env, name, os.environ.get(name))
+        if value is None:
+            os.environ.pop(name, None)
+        else:
+            os.environ[name] = value
+
+
+def _restore_env(name, value):
+    if value is None:
+        os.environ.pop(name, None)
+    else:
+        os.environ[name] = value
+
+
+def server_processes(tmux: List[str] = ['tmux'], env: Optional[Dict[str, str]] = None) -> List[int]:
+    """The tmux server and its descendants: pane shells and pipe-pane recorders"""
+    result = subprocess.run(tmux + ['display-message', '-p', '#{pid}'], env=env,
+                            capture_output=True, text=True)
+    pids, pending = [], result.stdout.split()
+    while pending:
+        pid = pending.pop()
+        pids.append(int(pid))
+        pending += subprocess.run(['pgrep', '-P', pid], capture_output=True, text=True).stdout.split()
+    return pids
+
+
+def kill_server(tmux: List[str] = ['tmux'], env: Optional[Dict[str, str]] = None, timeout: float = 5.0):
+    """Kill the tmux server, its panes and pipe-pane recorders
+
+    Panes and recorders outlive kill-server briefly and write on the way out,
+    which would recreate files in a temp dir removed in the meantime. They are
+    killed outright and waited for first; tests do not need their last flush.
+    """
+    server, *children = server_processes(tmux, env) or [None]
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    wait_for_exit(children, timeout)
+    subprocess.run(tmux + ['kill-server'], env=env, capture_output=True, check=False)
+
+
+def running(pid: int) -> bool:
+    """True until the process has exited; a zombie awaiting its reaper has"""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            return f.read().rpartition(')')[2].split()[0] != 'Z'
+    except OSError:
+        return True    # no procfs: wait for the reaper
+
+
+def wait_for_exit(pids: List[int], timeout: float = 5.0):
+    deadline = time.time() + timeout
+    for pid in pids:
+        while running(pid) and time.time() < deadline:
+            time.sleep(0.01)
+
+
+class PrivateTmuxTestCase(unittest.TestCase):
+    """Runs each test against its own tmux server (own TMUX_TMPDIR)
+
+    os.environ points at the private server for the duration of the test, so
+    tmux calls made in-process and by subprocesses reach it. `self.env` is a
+    copy of that environment for subprocess calls that add their own.
+    """
+
+    def setUp(self):
+        self.temp_dir = temp_dir(self)
+        self.tmux_dir = os.path.join(self.temp_dir, 'tmux')
+        os.makedirs(self.tmux_dir)
+        # $TMUX overrides TMUX_TMPDIR and would reach the enclosing server
+        self.set_env(TMUX_TMPDIR=self.tmux_dir, TMUX=None)
+        self.addCleanup(kill_server)
+
+    def set_env(self, **values):
+        """set_env() for this test, refreshing self.env"""
+        set_env(self, **values)
+        self.env = dict(os.environ)
+
+
+class LiveSessionTestCase(PrivateTmuxTestCase):
+    """Runs each test against a session created by setup-workflow.sh
+
+    Panes run plain bash, so they do not depend on the user's rc files, and
+    every pane is at its prompt when the test starts. Streams and journals go
+    to `self.state_dir`.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.state_dir = os.path.join(self.temp_dir, 'state')
+        self.set_env(AI_WORKFLOW_STATE_DIR=self.state_dir)
+        # A keepalive session sets the pane shell before setup creates its panes
+        subprocess.run(['tmux', 'new-session', '-d', '-s', 'keepalive', ';',
+                        'set-option', '-g', 'default-command', PANE_SHELL], check=True)
+        subprocess.run(['bash', '-c', f'source "{SETUP_SCRIPT}" && create_tmux_session native'],
+                       check=True, capture_output=True)
+        self.wait_for_prompts()
+
+    def wait_for_prompts(self, timeout=10):
+        """Wait until every pane shows its ai-workflow prompt"""
+        deadline = time.time() + timeout
+        for index, pane in enumerate(('left', 'top', 'bottom')):
+            while time.time() < deadline:
+                screen = subprocess.run(['tmux', 'capture-pane', '-p', '-t', f'ai-workflow:0.{index}'],
+                                        capture_output=True, text=True).stdout
+                if screen.rstrip().endswith(f'ai-workflow-bash:{pane} $'):
+                    break
+                time.sleep(0.05)
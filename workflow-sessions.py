@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+
+"""
+workflow-sessions.py - Shard ai-workflow sessions across isolated tmux servers
+Each session runs on its own tmux server (`tmux -L <socket>`), optionally inside
+its own container, so one busy or wedged server only affects its own agents.
+New work is placed on the least-loaded healthy session.
+"""
+
+import concurrent.futures
+import fcntl
+import json
+import os
+import subprocess
+import sys
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+SETUP_SCRIPT = os.path.join(ROOT_DIR, 'setup-workflow.sh')
+sys.path.insert(0, ROOT_DIR)
+from workflow_common import load_phi3_module
+
+# Commands that mean a pane is idle at its prompt
+SHELL_COMMANDS = {'bash', 'zsh', 'sh', 'dash', 'fish'}
+
+
+class SessionManager:
+    """Creates, tracks and places work on sharded workflow sessions"""
+
+    def __init__(self, registry_path: Optional[str] = None, max_sessions: int = 16,
+                 max_busy_panes: int = 3, probe_timeout: float = 2.0, setup_grace: float = 300.0):
+        cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')),
+                                 'ai-workflow')
+        self.registry_path = registry_path or os.environ.get(
+            'AI_WORKFLOW_REGISTRY', os.path.join(cache_dir, 'sessions.json'))
+        self.max_sessions = max_sessions
+        self.max_busy_panes = max_busy_panes    # a session this busy counts as full
+        self.probe_timeout = probe_timeout      # tmux calls slower than this = wedged
+        self.setup_grace = setup_grace          # a session this new may still be in setup
+
+    @contextmanager
+    def _registry(self):
+        """Locked read-modify-write access to the registry shared by all agents"""
+        os.makedirs(os.path.dirname(self.registry_path), exist_ok=True)
+        with open(self.registry_path + '.lock', 'w') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                with open(self.registry_path) as f:
+                    sessions = json.load(f)
+            except (FileNotFoundError, ValueError):
+                sessions = {}
+            yield sessions
+            tmp_path = self.registry_path + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(sessions, f, indent=2)
+            os.replace(tmp_path, self.registry_path)
+
+    def sessions(self) -> Dict[str, Dict]:
+        with self._registry() as sessions:
+            return dict(sessions)
+
+    def tmux_argv(self, session: Dict) -> List[str]:
+        """argv prefix reaching the session's tmux server"""
+        argv = ['tmux', '-L', session['socket']]
+        if session.get('container'):
+            argv = ['docker', 'exec', session['container']] + argv
+        return argv
+
+    def create(self, name: Optional[str] = None, container: Optional[str] = None) -> Dict:
+        """Create a new session on its own tmux server (and container, if given)"""
+        with self._registry() as sessions:
+            if len(sessions) >= self.max_sessions:
+                raise RuntimeError(f"Session limit reached ({self.max_sessions})")
+            if name is None:
+                index = len(sessions)
+                while f'ai-workflow-{index}' in sessions:
+                    index += 1
+                name = f'ai-workflow-{index}'
+            if name in sessions:
+                raise ValueError(f"Session {name} already exists")
+            session = {
+                'name': name,
+                'socket': f'aiw-{name}',
+                'container': container,
+                'created': time.time()
+            }
+            sessions[name] = session
+
+        argv = ['bash', SETUP_SCRIPT, '--no-attach', '--session', name, '--socket', session['socket']]
+        argv += ['--docker', '--container', container] if container else ['--native']
+        result = subprocess.run(argv, capture_output=True, text=True)
+        if result.returncode != 0:
+            with self._registry() as sessions:
+                sessions.pop(name, None)
+            raise RuntimeError(f"setup-workflow.sh failed for {name}: {result.stderr or result.stdout}")
+        return session
+
+    def remove(self, name: str):
+        """Kill the session's tmux server and forget it"""
+        with self._registry() as sessions:
+            session = sessions.pop(name, None)
+        if session:
+            subprocess.run(self.tmux_argv(session) + ['kill-server'],
+                           capture_output=True, timeout=self.probe_timeout)
+
+    def probe(self, session: Dict) -> Dict:
+        """Health and load of one session: busy panes are those not at a shell"""
+        status = {'name': session['name'], 'socket': session['socket'],
+                  'container': session.get('container')}
+        start = time.time()
+        try:
+            result = subprocess.run(
+                self.tmux_argv(session) + ['list-panes', '-s', '-t', session['name'],
+                                           '-F', '#{pane_current_command}'],
+                capture_output=True, text=True, timeout=self.probe_timeout)
+        except subprocess.TimeoutExpired:
+            status.update(health='wedged', busy_panes=None, total_panes=None)
+            return status
+
+        status['latency'] = time.time() - start
+        if result.returncode != 0:
+            status.update(health='missing', busy_panes=None, total_panes=None)
+            return status
+
+        commands = result.stdout.split()
+        status.update(health='ok', total_panes=len(commands),
+                      busy_panes=sum(1 for command in commands if command not in SHELL_COMMANDS))
+        return status
+
+    def probe_all(self) -> List[Dict]:
+        """Probe every session concurrently so a wedged server costs one timeout"""
+        sessions = list(self.sessions().values())
+        if not sessions:
+            return []
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(32, len(sessions))) as executor:
+            return list(executor.map(self.probe, sessions))
+
+    def prune(self, statuses: List[Dict]) -> List[Dict]:
+        """Unregister sessions whose tmux server is gone; returns the statuses kept
+
+        Sessions registered less than `setup_grace` seconds ago are kept, as
+        create() registers a session before its server is started.
+        """
+        missing = {status['name'] for status in statuses if status['health'] == 'missing'}
+        pruned = set()
+        if missing:
+            with self._registry() as sessions:
+                for name in missing:
+                    if name in sessions and time.time() - sessions[name].get('created', 0) > self.setup_grace:
+                        del sessions[name]
+                        pruned.add(name)
+        return [status for status in statuses if status['name'] not in pruned]
+
+    def place(self, container: Optional[str] = None) -> Dict:
+        """Pick the least-loaded healthy session, creating one if all are full
+
+        Dead sessions are unregistered first. At the session limit the
+        least-loaded healthy session is used even if it is full.
+        """
+        healthy = [status for status in self.prune(self.probe_all()) if status['health'] == 'ok']
+        candidates = [status for status in healthy if status['busy_panes'] < self.max_busy_panes]
+        if not candidates and (not healthy or len(self.sessions()) < self.max_sessions):
+            return self.create(container=container)
+        best = min(candidates or healthy, key=lambda status: (status['busy_panes'], status['latency']))
+        return self.sessions()[best['name']]
+
+    def health(self) -> Dict:
+        """Aggregate health across all sessions
+
+        Sessions reported as missing are unregistered (after `setup_grace`).
+        """
+        statuses = self.probe_all()
+        kept = {status['name'] for status in self.prune(statuses)}
+        healthy = [status for status in statuses if status['health'] == 'ok']
+        return {
+            'sessions': len(statuses),
+            'healthy': len(healthy),
+            'wedged': [status['name'] for status in statuses if status['health'] == 'wedged'],
+            'missing': [status['name'] for status in statuses if status['health'] == 'missing'],
+            'removed': [status['name'] for status in statuses if status['name'] not in kept],
+            'busy_panes': sum(status['busy_panes'] for status in healthy),
+            'total_panes': sum(status['total_panes'] for status in healthy),
+            'details': statuses
+        }
+
+    def simulator(self, name: str):
+        """Phi3Simulator bound to one session's panes and tmux server"""
+        session = self.sessions()[name]
+        if session.get('container'):
+            raise ValueError("Phi3Simulator drives native tmux servers only")
+        return load_phi3_module().Phi3Simulator(session=name, socket=session['socket'])
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] in ('-h', '--help'):
+        print("Usage: ./workflow-sessions.py <command> [args]")
+        print()
+        print("Commands:")
+        print("  create [name] [--container C]  Create a session on its own tmux server")
+        print("  list                           Show registered sessions")
+        print("  place [--container C]          Print the least-loaded session (creates one if full)")
+        print("  health                         Aggregate health across all sessions")
+        print("  remove <name>                  Kill a session's server and unregister it")
+        return
+
+    manager = SessionManager()
+    command, args = sys.argv[1], sys.argv[2:]
+    container = None
+    if '--container' in args:
+        index = args.index('--container')
+        container = args[index + 1]
+        del args[index:index + 2]
+
+    try:
+        if command == 'create':
+            print(json.dumps(manager.create(args[0] if args else None, container), indent=2))
+        elif command == 'list':
+            print(json.dumps(manager.sessions(), indent=2))
+        elif command == 'place':
+            print(json.dumps(manager.place(container), indent=2))
+        elif command == 'health':
+            print(json.dumps(manager.health(), indent=2))
+        elif command == 'remove' and args:
+            manager.remove(args[0])
+        else:
+            print(f"Error: unknown command {command}")
+            sys.exit(1)
+    except (RuntimeError, ValueError) as e:
+        # Session limit reached with no healthy session, or setup failed
+        print(f"Error: {e}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
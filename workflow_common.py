@@ -0,0 +1,114 @@
+"""
+workflow_common.py - Helpers shared by the ai-workflow pane tools
+The pane tools are hyphenated scripts; they put this directory on sys.path
+and import what they share from here: the ANSI escape pattern, loading the
+other scripts (tests/phi3-simulator.py included) and pane streams.
+
+Pane streams: `pane-journal.py record --stream` writes each pane's raw output
+to <state_dir>/<pane>.stream, capped at $AI_WORKFLOW_STREAM_LIMIT bytes. A
+full stream is renamed to <pane>.stream.1 (replacing the previous one) and a
+new one started. StreamFollower reads a stream incrementally across those
+rotations.
+"""
+
+import importlib.util
+import os
+import re
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+STREAM_LIMIT = 8 * 1024 * 1024
+# CSI, OSC (BEL or ST terminated) and two-byte escape sequences
+ANSI_ESCAPE = re.compile(r'\x1b(?:\[[0-?]*[ -/]*[@-~]|\][^\x07\x1b]*(?:\x07|\x1b\\)|[@-Z\\-_])')
+
+
+def load_module(name: str, path: str):
+    """Import one of the hyphenated scripts by its path relative to ROOT_DIR"""
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT_DIR, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def load_phi3_module():
+    """Import tests/phi3-simulator.py (hyphenated, so not importable by name)"""
+    return load_module('phi3_simulator', os.path.join('tests', 'phi3-simulator.py'))
+
+
+class StreamWriter:
+    """Appends to a pane stream, rotating it to <path>.1 at the size limit"""
+
+    def __init__(self, path: str, limit: int = STREAM_LIMIT):
+        self.path = path
+        self.limit = limit
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.file = open(path, 'ab')
+        self.size = self.file.tell()
+
+    def append(self, data: bytes):
+        if self.size and self.size + len(data) > self.limit:
+            self.file.close()
+            os.replace(self.path, self.path + '.1')
+            self.file = open(self.path, 'ab')
+            self.size = 0
+        self.file.write(data)
+        self.file.flush()
+        self.size += len(data)
+
+    def close(self):
+        self.file.close()
+
+
+class StreamFollower:
+    """Reads what was appended to a pane stream since the last read
+
+    A rotation is followed by finishing the previous file (now <path>.1)
+    before starting on the new one, so no output is lost between reads.
+    `restarted` is set when the stream was truncated or replaced in a way
+    that breaks that continuity.
+    """
+
+    def __init__(self, path: str, from_end: bool = False):
+        self.path = path
+        self.inode = None
+        self.offset = 0
+        self.restarted = False
+        if from_end:
+            try:
+                stat = os.stat(path)
+                self.inode, self.offset = stat.st_ino, stat.st_size
+            except FileNotFoundError:
+                pass
+
+    def _rest_of_rotated(self) -> bytes:
+        try:
+            with open(self.path + '.1', 'rb') as f:
+                if os.fstat(f.fileno()).st_ino == self.inode:
+                    f.seek(self.offset)
+                    return f.read()
+        except FileNotFoundError:
+            pass
+        self.restarted = True    # rotated more than once since the last read
+        return b''
+
+    def read(self) -> bytes:
+        self.restarted = False
+        try:
+            f = open(self.path, 'rb')
+        except FileNotFoundError:
+            return b''
+        with f:
+            stat = os.fstat(f.fileno())
+            data = b''
+            if self.inode is not None and stat.st_ino != self.inode:
+                data = self._rest_of_rotated()
+                self.offset = 0
+            elif stat.st_size < self.offset:
+                self.restarted = True    # truncated in place
+                self.offset = 0
+            self.inode = stat.st_ino
+            if stat.st_size > self.offset:
+                f.seek(self.offset)
+                new = f.read(stat.st_size - self.offset)
+                self.offset += len(new)
+                data = data + new if data else new
+        return data